@@ -5,3 +5,16 @@ class AuthConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "auth"
     label = "custom_auth"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from .db import apply_sqlite_pragmas
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid="apply_sqlite_pragmas")
+
+        if settings.QWEN_EAGER_LOAD:
+            from .model_registry import registry
+
+            registry.warm_up()
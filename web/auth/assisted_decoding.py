@@ -0,0 +1,197 @@
+import threading
+import time
+
+from .cancellation import GenerationCancelled, cancellation_stats
+from .inference_client import inference_client, remote_inference_enabled
+from .model_registry import registry
+from .prefix_cache import prefix_cache
+from .telemetry import record_generation
+
+
+class PromptLookupStats:
+    """Running totals for prompt-lookup decoding across the process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.steps = 0
+        self.drafted = 0
+        self.accepted = 0
+        self.generated_tokens = 0
+
+    def record(self, steps, drafted, accepted, generated_tokens):
+        with self._lock:
+            self.generations += 1
+            self.steps += steps
+            self.drafted += drafted
+            self.accepted += accepted
+            self.generated_tokens += generated_tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "generations": self.generations,
+                "steps": self.steps,
+                "drafted_tokens": self.drafted,
+                "accepted_tokens": self.accepted,
+                "acceptance_rate": self.accepted / self.drafted if self.drafted else 0.0,
+                "tokens_per_step": self.generated_tokens / self.steps if self.steps else 0.0,
+            }
+
+
+prompt_lookup_stats = PromptLookupStats()
+
+
+def find_draft(tokens, max_ngram_size, num_draft_tokens):
+    """Propose the tokens that followed the first earlier occurrence of the trailing n-gram"""
+    for ngram_size in range(max_ngram_size, 0, -1):
+        if len(tokens) <= ngram_size:
+            continue
+        pattern = tokens[-ngram_size:]
+        # The earliest match (usually in the prompt) has the longest continuation;
+        # the trailing n-gram itself is skipped
+        for start in range(len(tokens) - ngram_size):
+            if tokens[start:start + ngram_size] == pattern:
+                draft = tokens[start + ngram_size:start + ngram_size + num_draft_tokens]
+                if draft:
+                    return draft
+    return []
+
+
+def prompt_lookup_generate(model, input_ids, max_new_tokens, eos_token_ids, max_ngram_size=3,
+                           num_draft_tokens=10, past_key_values=None, streamer=None, cancel=None):
+    """Greedy decoding that drafts tokens from n-gram matches in the prompt.
+
+    When the output copies the input (rewriting a mentor's draft, keeping
+    code identifiers in a translation) the continuation of a matching n-gram
+    is proposed as a draft, and one forward pass over the draft checks how
+    many of those tokens greedy decoding would have produced anyway. The
+    output is the same as plain greedy decoding; only the number of forward
+    passes changes. Works on a single sequence. Decoding stops early once
+    ``cancel`` (a cancel token) is set.
+
+    Returns the new token ids and a dict with the draft/acceptance counts
+    and the seconds until the first new token.
+    """
+    import torch
+    from transformers import DynamicCache
+
+    started = time.monotonic()
+    if past_key_values is None:
+        past_key_values = DynamicCache()
+    eos_token_ids = set(eos_token_ids)
+    tokens = input_ids[0].tolist()
+    prompt_length = len(tokens)
+    steps = drafted = accepted = 0
+    if streamer is not None:
+        # Streamers expect the prompt first (and skip it with skip_prompt=True)
+        streamer.put(input_ids.cpu())
+
+    with torch.inference_mode():
+        # Prefill whatever the cache doesn't already hold
+        cached = past_key_values.get_seq_length()
+        outputs = model(input_ids[:, cached:], past_key_values=past_key_values, use_cache=True)
+        next_token = int(outputs.logits[0, -1].argmax())
+        first_token_seconds = time.monotonic() - started
+        steps += 1
+
+        while True:
+            tokens.append(next_token)
+            if streamer is not None:
+                streamer.put(torch.tensor([next_token]))
+            generated = len(tokens) - prompt_length
+            if next_token in eos_token_ids or generated >= max_new_tokens:
+                break
+            if cancel is not None and cancel.cancelled:
+                cancellation_stats.record_stopped_row(generated, max_new_tokens)
+                print(f"Generation cancelled (prompt lookup): stopped after {generated} of {max_new_tokens} tokens")
+                break
+
+            draft = find_draft(tokens, max_ngram_size, num_draft_tokens)[:max_new_tokens - generated - 1]
+
+            # The last token is not in the cache yet; verify it together with the draft
+            candidate = torch.tensor([[next_token] + draft], device=input_ids.device)
+            outputs = model(candidate, past_key_values=past_key_values, use_cache=True)
+            predictions = outputs.logits[0].argmax(-1).tolist()
+            steps += 1
+
+            matched = 0
+            while matched < len(draft) and draft[matched] == predictions[matched]:
+                matched += 1
+            drafted += len(draft)
+            accepted += matched
+
+            # Keep the cache for the verified tokens only
+            rejected = len(draft) - matched
+            if rejected:
+                past_key_values.crop(-rejected)
+
+            for token in draft[:matched]:
+                tokens.append(token)
+                if streamer is not None:
+                    streamer.put(torch.tensor([token]))
+                if token in eos_token_ids:
+                    break
+            else:
+                next_token = predictions[matched]
+                continue
+            break
+
+    if streamer is not None:
+        streamer.end()
+
+    new_tokens = tokens[prompt_length:]
+    prompt_lookup_stats.record(steps, drafted, accepted, len(new_tokens))
+    return new_tokens, {
+        "steps": steps, "drafted": drafted, "accepted": accepted, "first_token_seconds": first_token_seconds
+    }
+
+
+def eos_token_ids(model, tokenizer):
+    """All token ids that end a generation for this model"""
+    eos = model.generation_config.eos_token_id
+    if eos is None:
+        eos = tokenizer.eos_token_id
+    return eos if isinstance(eos, list) else [eos]
+
+
+def generate_with_prompt_lookup(prompt, max_new_tokens, streamer=None, cancel=None):
+    """Greedy prompt-lookup generation for one chat-formatted prompt"""
+    if remote_inference_enabled():
+        return inference_client.prompt_lookup(prompt, max_new_tokens, cancel)
+    model, tokenizer, device = registry.get()
+    if not model or not tokenizer:
+        return None
+
+    started = time.monotonic()
+    model_inputs = tokenizer([prompt], return_tensors="pt").to(device)
+    past_key_values = prefix_cache.match(model, model_inputs.input_ids)
+    telemetry = {
+        "prompt_length": model_inputs.input_ids.shape[1],
+        "prefix_cache_hit": past_key_values is not None,
+    }
+    try:
+        new_tokens, stats = prompt_lookup_generate(
+            model,
+            model_inputs.input_ids,
+            max_new_tokens,
+            eos_token_ids(model, tokenizer),
+            past_key_values=past_key_values,
+            streamer=streamer,
+            cancel=cancel
+        )
+    except Exception:
+        record_generation("prompt_lookup", "failed", duration=time.monotonic() - started, **telemetry)
+        raise
+    cancelled = cancel is not None and cancel.cancelled
+    record_generation(
+        "prompt_lookup",
+        "cancelled" if cancelled else "ok",
+        new_tokens=len(new_tokens),
+        first_token=stats["first_token_seconds"],
+        duration=time.monotonic() - started,
+        **telemetry
+    )
+    if cancelled:
+        raise GenerationCancelled(cancel.reason)
+    return tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
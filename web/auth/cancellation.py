@@ -0,0 +1,164 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import connection
+
+
+class GenerationCancelled(Exception):
+    """The caller of an AI request went away before its output was ready"""
+
+
+class CancellationStats:
+    """Running totals of cancelled AI requests and of the generations they cut short"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.stopped_rows = 0
+        self.tokens_generated = 0
+        self.tokens_skipped = 0
+
+    def record_request(self, reason):
+        with self._lock:
+            self.requests[reason] = self.requests.get(reason, 0) + 1
+
+    def record_stopped_row(self, generated, budget):
+        with self._lock:
+            self.stopped_rows += 1
+            self.tokens_generated += generated
+            self.tokens_skipped += max(budget - generated, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "stopped_generations": self.stopped_rows,
+                "tokens_generated_before_stop": self.tokens_generated,
+                "tokens_skipped": self.tokens_skipped,
+            }
+
+
+cancellation_stats = CancellationStats()
+
+
+class CancelToken:
+    """Set once by whoever stops waiting for a request (client disconnect, timeout).
+
+    Generation code polls ``cancelled``: the scheduler drops queued prompts
+    and a stopping criterion ends rows that are already being decoded.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        self._event.set()
+        cancellation_stats.record_request(reason)
+        print(f"AI request cancelled ({reason}): {cancellation_stats.snapshot()}")
+
+
+class SharedCancellation:
+    """Cancellation of a generation shared by coalesced callers.
+
+    Cancelled only once every caller that joined has cancelled; a caller
+    without a token (a sync view, a background task) keeps it running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = []
+        self._uncancellable = False
+
+    def join(self, token):
+        with self._lock:
+            if token is None:
+                self._uncancellable = True
+            else:
+                self._tokens.append(token)
+
+    @property
+    def cancelled(self):
+        with self._lock:
+            if self._uncancellable or not self._tokens:
+                return False
+            return all(token.cancelled for token in self._tokens)
+
+    @property
+    def reason(self):
+        with self._lock:
+            return self._tokens[-1].reason if self._tokens else None
+
+
+def wait_for_result(future, cancel=None, timeout=None, poll_interval=0.05):
+    """future.result(timeout), giving up with GenerationCancelled as soon as cancel is set"""
+    if cancel is None:
+        return future.result(timeout=timeout)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        if cancel.cancelled:
+            # Drops it if no worker has started it; a running generation stops at its next step
+            future.cancel()
+            raise GenerationCancelled(cancel.reason)
+        wait = poll_interval if deadline is None else min(poll_interval, deadline - time.monotonic())
+        if wait <= 0:
+            raise FutureTimeout()
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            continue
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def inference_executor():
+    """Threads that run blocking AI calls for async views; AI_VIEW_WORKERS bounds them"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.AI_VIEW_WORKERS, thread_name_prefix="ai-view")
+        return _executor
+
+
+def _call_with_token(fn, args, kwargs, cancel):
+    try:
+        if cancel.cancelled:
+            # The client left while this call was still queued for a worker
+            raise GenerationCancelled(cancel.reason)
+        return fn(*args, cancel=cancel, **kwargs)
+    finally:
+        connection.close()
+
+
+async def run_cancellable(fn, *args, timeout=None, **kwargs):
+    """Await fn(*args, cancel=token, **kwargs) run on the inference executor.
+
+    The token is cancelled when the awaiting view is cancelled (under ASGI,
+    Django does this when the client disconnects) or when ``timeout``
+    seconds pass, which raises TimeoutError.
+    """
+    cancel = CancelToken()
+    loop = asyncio.get_running_loop()
+    call = loop.run_in_executor(inference_executor(), functools.partial(_call_with_token, fn, args, kwargs, cancel))
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except TimeoutError:
+        cancel.cancel("timeout")
+        raise
+    except asyncio.CancelledError:
+        cancel.cancel("disconnect")
+        raise
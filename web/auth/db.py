@@ -0,0 +1,16 @@
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created hook: tune each new SQLite connection with settings.SQLITE_PRAGMAS.
+
+    WAL lets readers run alongside the single writer, busy_timeout makes a
+    writer wait for the lock instead of failing, synchronous=NORMAL is safe
+    under WAL and saves an fsync per commit, and mmap_size serves reads from
+    the page cache.
+    """
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
@@ -0,0 +1,319 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+from .cancellation import inference_executor
+from .inference_client import inference_client, remote_inference_enabled
+from .model_registry import registry
+from .models import Question
+from .translation_cache import text_hash
+
+
+# One background thread so embedding on save never competes with itself for the model
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-questions")
+
+
+def question_text(title, content):
+    return f"{title}\n{content}"
+
+
+def embed_texts(texts, batch_size=16):
+    """Unit-length float32 embeddings (one row per text) from mean-pooled Qwen hidden states.
+
+    Returns None when the model is unavailable.
+    """
+    if remote_inference_enabled():
+        return inference_client.embed(texts, batch_size)
+
+    import torch
+
+    model, tokenizer, device = registry.get()
+    if not model or not tokenizer:
+        return None
+
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        inputs = tokenizer(
+            texts[start:start + batch_size],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=settings.EMBEDDING_MAX_TOKENS
+        ).to(device)
+        with torch.inference_mode():
+            # The decoder alone: the language-model head isn't needed for embeddings
+            hidden = model.base_model(input_ids=inputs.input_ids, attention_mask=inputs.attention_mask).last_hidden_state
+
+        mask = inputs.attention_mask.clone()
+        # The first token acts as an attention sink with outsized activations;
+        # leaving it out of the mean keeps it from dominating every embedding
+        first = mask.argmax(dim=1)
+        rows = torch.arange(mask.shape[0], device=mask.device)
+        mask[rows, first] = (mask.sum(dim=1) == 1).to(mask.dtype)
+
+        mask = mask.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        batches.append(torch.nn.functional.normalize(pooled.float(), dim=-1).cpu().numpy())
+    return np.concatenate(batches).astype(np.float32, copy=False)
+
+
+class EmbeddingIndex:
+    """Question embeddings in one contiguous float32 matrix, memory-mapped from disk.
+
+    Row ``i`` holds the embedding of question ``i``; ids that were never
+    embedded (or were deleted) are zero rows, which score 0 against any
+    query. Nearest questions are found with a single matrix-vector product.
+    The file is named after the model revision, so switching models starts
+    an empty index (see ``manage.py rebuild_question_embeddings``).
+
+    Every process maps the same file. Rows are written in place; when the
+    matrix has to grow it is copied to a larger file that replaces the old
+    one, and other processes re-map it on their next call. Writers take a
+    file lock, so a row written by one process while another grows the file
+    is never left behind in the old copy.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._file_id = None
+        self.searches = 0
+
+    @property
+    def directory(self):
+        return self._directory or settings.EMBEDDING_INDEX_DIR
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"questions-{registry.revision}.npy")
+
+    def _current(self):
+        """The mapped matrix, re-mapped if another process replaced the file; must hold the lock"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._matrix, self._file_id = None, None
+            return None
+        file_id = (self.path, stat.st_ino, stat.st_size)
+        if file_id != self._file_id:
+            self._matrix = np.load(self.path, mmap_mode="r+")
+            self._file_id = file_id
+        return self._matrix
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the thread lock and an exclusive lock on a file next to the matrix"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{self.path}.lock", "a") as lock_file:
+                if fcntl is not None:
+                    # Released when the file is closed
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _replace(self, rows, dim, fill):
+        """Write a zeroed (rows, dim) matrix, let ``fill`` populate it and swap it in; must hold the write lock"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(rows, dim))
+        fill(matrix)
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, self.path)
+        self._file_id = None
+        return self._current()
+
+    def add(self, question_id, vector):
+        """Store (or overwrite) the embedding of one question"""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._write_lock():
+            matrix = self._current()
+            if matrix is None or matrix.shape[1] != vector.shape[0]:
+                matrix = self._replace(max(1024, question_id + 1), vector.shape[0], lambda new: None)
+            elif question_id >= matrix.shape[0]:
+                old = matrix
+
+                def copy_rows(new):
+                    new[:len(old)] = old
+
+                matrix = self._replace(max(2 * len(old), question_id + 1), old.shape[1], copy_rows)
+            matrix[question_id] = vector
+
+    def remove(self, question_id):
+        if not os.path.exists(self.path):
+            # Nothing indexed yet: don't create the directory or the lock file
+            return
+        with self._write_lock():
+            matrix = self._current()
+            if matrix is not None and question_id < matrix.shape[0]:
+                matrix[question_id] = 0
+
+    def rebuild(self, max_id, dim, batches):
+        """Replace the whole index with rows from an iterable of (question ids, embeddings) batches"""
+        def write_batches(matrix):
+            for ids, vectors in batches:
+                matrix[ids] = vectors
+
+        with self._write_lock():
+            self._replace(max(1024, max_id + 1), dim, write_batches)
+
+    def search(self, vector, k=5, min_score=0.0):
+        """Up to k (question id, cosine similarity) pairs, best first"""
+        with self._lock:
+            matrix = self._current()
+            self.searches += 1
+        if matrix is None or matrix.shape[1] != len(vector):
+            return []
+
+        # All rows are unit length (or zero), so one matmul gives every cosine similarity
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0 and scores[i] >= min_score]
+
+    def stats(self):
+        with self._lock:
+            matrix = self._current()
+            return {
+                "rows": 0 if matrix is None else matrix.shape[0],
+                "dimensions": 0 if matrix is None else matrix.shape[1],
+                "searches": self.searches,
+            }
+
+
+question_index = EmbeddingIndex()
+
+# Embeddings computed for the duplicate check, reused when the question is then saved
+_recent_vectors = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def remember_vector(text, vector, limit=256):
+    with _recent_lock:
+        _recent_vectors[text_hash(text)] = vector
+        while len(_recent_vectors) > limit:
+            _recent_vectors.popitem(last=False)
+
+
+def embed_question_text(text, timeout=None):
+    """Embedding of one question's text, or None when the model is unavailable.
+
+    With a timeout the embedding runs on the inference executor and None is
+    returned once ``timeout`` seconds pass, or straight away when the model
+    would first have to be loaded into this process.
+    """
+    with _recent_lock:
+        vector = _recent_vectors.get(text_hash(text))
+    if vector is None:
+        if timeout is None:
+            vectors = embed_texts([text])
+        elif not remote_inference_enabled() and not registry.is_ready:
+            return None
+        else:
+            try:
+                vectors = inference_executor().submit(embed_texts, [text]).result(timeout=timeout)
+            except FutureTimeout:
+                print(f"Question embedding timed out after {timeout}s")
+                return None
+        if vectors is None:
+            return None
+        vector = vectors[0]
+        remember_vector(text, vector)
+    return vector
+
+
+def similar_answered_questions(title, content, limit=None, min_score=None, timeout=None):
+    """Answered questions whose embeddings are close to the given text, with their similarity, best first.
+
+    Returns nothing if the text can't be embedded within ``timeout`` (see embed_question_text).
+    """
+    limit = limit or settings.DUPLICATE_SUGGESTIONS
+    min_score = settings.DUPLICATE_SIMILARITY if min_score is None else min_score
+
+    vector = embed_question_text(question_text(title, content), timeout)
+    if vector is None:
+        return []
+
+    # Look further than `limit`: some near matches may still be unanswered
+    matches = question_index.search(vector, k=limit * 4, min_score=min_score)
+    if not matches:
+        return []
+    answered = Question.objects.filter(id__in=[question_id for question_id, _ in matches], status='answered').in_bulk()
+    return [(answered[question_id], score) for question_id, score in matches if question_id in answered][:limit]
+
+
+def queue_embedding(question):
+    """Embed a new or edited question after commit"""
+    if not settings.EMBED_ON_SAVE:
+        return
+    question_id = question.pk
+    transaction.on_commit(lambda: _executor.submit(embed_question, question_id))
+
+
+def remove_embedding(question):
+    """Clear the row of a deleted question.
+
+    With EMBED_ON_SAVE off the row is left as it is: search results are
+    matched against the Question table, so deleted ids never come back.
+    """
+    if not settings.EMBED_ON_SAVE:
+        return
+    question_index.remove(question.pk)
+
+
+def embed_question(question_id):
+    try:
+        question = Question.objects.filter(pk=question_id).values_list('title', 'content').first()
+        if question is None:
+            return
+        vector = embed_question_text(question_text(*question))
+        if vector is not None:
+            question_index.add(question_id, vector)
+    except Exception as e:
+        print(f"Question embedding error: {e}")
+    finally:
+        connection.close()
+
+
+def rebuild_question_embeddings(batch_size=16):
+    """Embed every question from scratch; returns the number embedded, or None without a model"""
+    model, _, _ = registry.get()
+    if not model:
+        return None
+
+    count = 0
+    questions = Question.objects.order_by('id').values_list('id', 'title', 'content')
+
+    def batches():
+        rows = []
+        for row in questions.iterator(chunk_size=batch_size * 16):
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield embed_batch(rows)
+                rows = []
+        if rows:
+            yield embed_batch(rows)
+
+    def embed_batch(rows):
+        nonlocal count
+        vectors = embed_texts([question_text(title, content) for _, title, content in rows], batch_size=batch_size)
+        if vectors is None:
+            raise RuntimeError("AI model is not available")
+        count += len(rows)
+        return [question_id for question_id, _, _ in rows], vectors
+
+    max_id = Question.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    question_index.rebuild(max_id, model.config.hidden_size, batches())
+    return count
@@ -0,0 +1,145 @@
+import re
+import time
+
+from django.conf import settings
+
+
+# Output tokens per source token, by target language. Qwen's tokenizer is
+# compact for English and Chinese but splits Devanagari into many tokens, so
+# a Hindi translation needs far more tokens than its English source. The
+# ratios are generous: a budget only caps runaway output, EOS ends the rest.
+TOKENS_PER_SOURCE_TOKEN = {
+    'chinese': 1.5,
+    'japanese': 2.0,
+    'hindi': 4.0,
+    'english': 1.5,
+}
+DEFAULT_TOKENS_PER_SOURCE_TOKEN = 3.0
+
+# Room for closing punctuation, quotes and the end-of-turn token
+BUDGET_MARGIN_TOKENS = 16
+
+# Zero-width, so joining the pieces gives the text back ("1,000" is not a break)
+CLAUSE_BREAK = re.compile(r"(?<=[,;:])(?=\s)|(?<=[，；：、])")
+
+
+def count_tokens(tokenizer, text):
+    return len(tokenizer(text, add_special_tokens=False).input_ids)
+
+
+def translation_token_budget(source_tokens, target_language):
+    """max_new_tokens for translating a text of source_tokens tokens"""
+    ratio = TOKENS_PER_SOURCE_TOKEN.get(target_language.lower(), DEFAULT_TOKENS_PER_SOURCE_TOKEN)
+    return min(int(source_tokens * ratio) + BUDGET_MARGIN_TOKENS, settings.QWEN_TRANSLATION_MAX_TOKENS)
+
+
+def answer_token_budget(draft_tokens=0):
+    """max_new_tokens for an AI answer; enhancing a draft is bounded by the draft's length"""
+    if not draft_tokens:
+        return settings.QWEN_ANSWER_MAX_TOKENS
+    # An enhanced answer expands the draft, typically to two or three times its length
+    return min(max(3 * draft_tokens, 256), settings.QWEN_ANSWER_MAX_TOKENS)
+
+
+def split_into_chunks(tokenizer, text, max_tokens):
+    """Split text into pieces of at most max_tokens tokens, preferring clause and then word boundaries"""
+    if count_tokens(tokenizer, text) <= max_tokens:
+        return [text]
+
+    for pattern in (CLAUSE_BREAK, re.compile(r"(?<=\s)")):
+        pieces = [piece for piece in pattern.split(text) if piece]
+        if len(pieces) > 1:
+            break
+    else:
+        # No boundary at all (e.g. a long run of CJK characters without punctuation)
+        ids = tokenizer(text, add_special_tokens=False).input_ids
+        return [tokenizer.decode(ids[start:start + max_tokens]) for start in range(0, len(ids), max_tokens)]
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and count_tokens(tokenizer, current + piece) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+
+    result = []
+    for chunk in chunks:
+        # A single clause may still be too long; split it further
+        result.extend(split_into_chunks(tokenizer, chunk.strip(), max_tokens))
+    return [chunk for chunk in result if chunk]
+
+
+class RowTokenBudget:
+    """Stopping criterion that ends each row of a batch at its own max_new_tokens.
+
+    ``generate`` only takes one max_new_tokens for the whole batch (the
+    largest budget is passed); rows that reach their own budget are marked
+    done here and padded from then on.
+    """
+
+    def __init__(self, prompt_length, budgets):
+        import torch
+
+        self.prompt_length = prompt_length
+        self.budgets = torch.tensor(budgets)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        generated = input_ids.shape[1] - self.prompt_length
+        return (generated >= self.budgets).to(input_ids.device)
+
+
+class StopAtNewline:
+    """Stopping criterion for single-line sources: a row is done once its output starts a new line.
+
+    The translation of one sentence is one line; anything after a line
+    break is commentary the model adds ("Note: ...").
+    """
+
+    def __init__(self, tokenizer, rows):
+        import torch
+
+        self.tokenizer = tokenizer
+        self.rows = torch.tensor(rows, dtype=torch.bool)
+        self.started = torch.zeros(len(rows), dtype=torch.bool)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool)
+        for row in torch.nonzero(self.rows).flatten().tolist():
+            text = self.tokenizer.decode(input_ids[row, -1:])
+            if "\n" in text and (self.started[row] or text.split("\n")[0].strip()):
+                done[row] = True
+            elif text.strip():
+                self.started[row] = True
+        return done.to(input_ids.device)
+
+
+class FirstTokenTime:
+    """Stopping criterion that never stops a row; it notes when the first new token was produced"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.seconds = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        if self.seconds is None:
+            self.seconds = time.monotonic() - self.started
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+
+class CancelledRows:
+    """Stopping criterion that ends the rows whose caller has gone away (see auth/cancellation.py)"""
+
+    def __init__(self, cancels):
+        self.cancels = cancels
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        return torch.tensor([cancel is not None and cancel.cancelled for cancel in self.cancels], device=input_ids.device)
@@ -0,0 +1,299 @@
+import json
+import select
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+from django.conf import settings
+
+from .cancellation import GenerationCancelled, SharedCancellation
+
+
+# Every message is one frame: kind, JSON header length and blob length, then
+# the compact JSON header and the raw blob (float32 embeddings travel as bytes)
+FRAME_HEADER = struct.Struct("!BII")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
+REQUEST = 1
+RESULT = 2
+CHUNK = 3
+ERROR = 4
+
+
+class ProtocolError(Exception):
+    """A malformed or truncated frame"""
+
+
+class InferenceUnavailable(Exception):
+    """The inference server could not be reached"""
+
+
+class InferenceError(Exception):
+    """The inference server failed to run a request"""
+
+
+def send_frame(sock, kind, header, blob=b""):
+    body = json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode()
+    sock.sendall(FRAME_HEADER.pack(kind, len(body), len(blob)) + body)
+    if blob:
+        sock.sendall(blob)
+
+
+def _recv_exactly(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None if received == 0 else b""
+        received += count
+    return bytes(buffer)
+
+
+def recv_frame(sock):
+    """(kind, header, blob) of the next frame, or None if the peer closed the connection"""
+    prefix = _recv_exactly(sock, FRAME_HEADER.size)
+    if prefix is None:
+        return None
+    if not prefix:
+        raise ProtocolError("Connection closed inside a frame")
+    kind, header_length, blob_length = FRAME_HEADER.unpack(prefix)
+    if header_length + blob_length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {header_length + blob_length} bytes is too large")
+    body = _recv_exactly(sock, header_length) if header_length else b"{}"
+    blob = _recv_exactly(sock, blob_length) if blob_length else b""
+    if not body or (blob_length and not blob):
+        raise ProtocolError("Connection closed inside a frame")
+    return kind, json.loads(body), blob
+
+
+_serving = False
+
+
+def serve_locally():
+    """Mark this process as the inference server: it runs the model itself even with INFERENCE_SOCKET set"""
+    global _serving
+    _serving = True
+
+
+def remote_inference_enabled():
+    """True in web workers when an inference server owns the model (INFERENCE_SOCKET is set)"""
+    return bool(settings.INFERENCE_SOCKET) and not _serving
+
+
+class RemoteModel:
+    """Stands in for the model in processes that leave the weights to the inference server"""
+
+    def __init__(self, config):
+        self.config = config
+
+    def eval(self):
+        return self
+
+
+class InferenceClient:
+    """Pooled connections to the inference server (``manage.py run_inference_server``).
+
+    A connection carries one request at a time and goes back to the pool
+    once its result has been read. A request whose caller cancels or times
+    out closes its connection instead; the server sees the connection drop
+    and cancels the generation.
+    """
+
+    def __init__(self, path=None, pool_size=None, poll_interval=0.05):
+        self._path = path
+        self._pool_size = pool_size
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._idle = []
+        self._templates = set()
+        self._server_id = None
+        self.requests = 0
+        self.connects = 0
+        self.failures = 0
+
+    @property
+    def path(self):
+        return self._path or settings.INFERENCE_SOCKET
+
+    @property
+    def pool_size(self):
+        return self._pool_size or settings.INFERENCE_POOL_SIZE
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise InferenceUnavailable(f"Inference server at {self.path} is not reachable: {e}") from e
+        with self._lock:
+            self.connects += 1
+        return sock
+
+    def _acquire(self):
+        """A connection and whether it was reused from the pool"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, sock):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+    def _recv(self, sock, cancel, deadline):
+        """The next frame, giving up when cancel is set or the deadline passes"""
+        while True:
+            if cancel is not None and cancel.cancelled:
+                raise GenerationCancelled(cancel.reason)
+            wait = self.poll_interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise FutureTimeout()
+            readable, _, _ = select.select([sock], [], [], wait)
+            if readable:
+                frame = recv_frame(sock)
+                if frame is None:
+                    raise ConnectionResetError("Inference server closed the connection")
+                return frame
+
+    def frames(self, op, args, blob=b"", cancel=None, timeout=None):
+        """Send one request and yield its frames: any CHUNK frames, then the RESULT"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self.requests += 1
+
+        sock, reused = self._acquire()
+        try:
+            try:
+                send_frame(sock, REQUEST, {"op": op, **args}, blob)
+                frame = self._recv(sock, cancel, deadline)
+            except FutureTimeout:
+                raise
+            except (OSError, ProtocolError):
+                if not reused:
+                    raise
+                # A pooled connection may have outlived a server restart; retry once on a new one
+                sock.close()
+                sock = self._connect()
+                send_frame(sock, REQUEST, {"op": op, **args}, blob)
+                frame = self._recv(sock, cancel, deadline)
+
+            while True:
+                kind, header, frame_blob = frame
+                if kind == ERROR:
+                    self._release(sock)
+                    sock = None
+                    raise InferenceError(header.get("error", "Inference request failed"))
+                if kind == RESULT:
+                    self._release(sock)
+                    sock = None
+                    self._check_server(header.get("server"))
+                    yield kind, header, frame_blob
+                    return
+                yield kind, header, frame_blob
+                frame = self._recv(sock, cancel, deadline)
+        except FutureTimeout:
+            # TimeoutError is an OSError; it is the caller's timeout, not a broken connection
+            raise
+        except (OSError, ProtocolError) as e:
+            with self._lock:
+                self.failures += 1
+            raise InferenceUnavailable(f"Inference request failed: {e}") from e
+        finally:
+            # Still set when the request didn't finish (cancelled, timed out, abandoned
+            # stream): closing it tells the server to stop generating
+            if sock is not None:
+                sock.close()
+
+    def request(self, op, args, blob=b"", cancel=None, timeout=None):
+        """(header, blob) of the result of a request that doesn't stream"""
+        for kind, header, result_blob in self.frames(op, args, blob, cancel, timeout):
+            if kind == RESULT:
+                return header, result_blob
+        raise InferenceError(f"No result for {op}")
+
+    def _check_server(self, server_id):
+        # A restarted server has lost the prompt prefixes sent to its predecessor
+        with self._lock:
+            if server_id != self._server_id:
+                self._server_id = server_id
+                self._templates.clear()
+
+    def generate(self, scheduler, prompts, budgets, cancels=None, timeout=None):
+        """Outputs of prompts run through one of the server's batch schedulers"""
+        cancel = None
+        if cancels and all(prompt_cancel is not None for prompt_cancel in cancels):
+            # One request carries every prompt, so it stops once all of them are cancelled
+            cancel = SharedCancellation()
+            for prompt_cancel in cancels:
+                cancel.join(prompt_cancel)
+        header, _ = self.request(
+            "generate", {"scheduler": scheduler, "prompts": prompts, "budgets": budgets}, cancel=cancel, timeout=timeout
+        )
+        return header["outputs"]
+
+    def prompt_lookup(self, prompt, max_new_tokens, cancel=None):
+        header, _ = self.request("prompt_lookup", {"prompt": prompt, "max_new_tokens": max_new_tokens}, cancel=cancel)
+        return header["output"]
+
+    def stream(self, prompt, max_new_tokens, prompt_lookup=False, generate_kwargs=None, cancel=None):
+        """Yield text chunks as the server decodes them"""
+        args = {
+            "prompt": prompt,
+            "max_new_tokens": max_new_tokens,
+            "prompt_lookup": prompt_lookup,
+            "generate_kwargs": generate_kwargs or {},
+        }
+        for kind, header, _ in self.frames("stream", args, cancel=cancel):
+            if kind == CHUNK:
+                yield header["text"]
+
+    def embed(self, texts, batch_size=16):
+        """Float32 embeddings (one row per text), or None when the server has no model"""
+        header, blob = self.request("embed", {"texts": texts, "batch_size": batch_size})
+        if header["shape"] is None:
+            return None
+        return np.frombuffer(blob, dtype=np.float32).reshape(header["shape"])
+
+    def add_template(self, prompt):
+        """Have the server cache a prompt template's shared prefix (once per server run)"""
+        with self._lock:
+            if prompt in self._templates:
+                return
+        self.request("add_template", {"prompt": prompt})
+        with self._lock:
+            self._templates.add(prompt)
+
+    def metrics(self, timeout=2):
+        """The server's telemetry in the Prometheus text format"""
+        header, _ = self.request("metrics", {}, timeout=timeout)
+        return header["text"]
+
+    def health(self, timeout=2):
+        try:
+            header, _ = self.request("health", {}, timeout=timeout)
+        except (InferenceUnavailable, InferenceError, FutureTimeout) as e:
+            return {"reachable": False, "ready": False, "socket": self.path, "error": str(e) or "timed out"}
+        with self._lock:
+            pool = {"idle_connections": len(self._idle), "requests": self.requests, "connects": self.connects, "failures": self.failures}
+        return {"reachable": True, "socket": self.path, **header, "client": pool}
+
+
+inference_client = InferenceClient()
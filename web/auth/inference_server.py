@@ -0,0 +1,201 @@
+import os
+import select
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .assisted_decoding import generate_with_prompt_lookup, prompt_lookup_stats
+from .cancellation import CancelToken, GenerationCancelled, cancellation_stats
+from .embeddings import embed_texts
+from .inference_client import CHUNK, ERROR, REQUEST, RESULT, ProtocolError, recv_frame, send_frame, serve_locally
+from .model_registry import registry
+from .prefix_cache import prefix_cache
+from .scheduler import answer_scheduler, translation_scheduler
+from .streaming import stream_generate
+from .telemetry import render_metrics
+
+
+SCHEDULERS = {scheduler.name: scheduler for scheduler in (translation_scheduler, answer_scheduler)}
+
+
+class ClientGone(Exception):
+    """The client closed its connection while its request was running"""
+
+
+class InferenceServer:
+    """Owns the model and serves generate/embed requests from web workers over a Unix socket.
+
+    Each connection gets a thread that reads one request at a time and runs
+    it on a bounded pool. Requests from every web worker meet in the same
+    batch schedulers, so they are batched together. While a request runs,
+    its connection is watched: a client that closes it (cancelled or timed
+    out) cancels the generation.
+    """
+
+    def __init__(self, path, threads=32, poll_interval=0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._socket = None
+        self.connections = 0
+        self.requests = 0
+
+    def bind(self):
+        """Listen on the socket path, replacing a stale socket file left by a previous run"""
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"Another inference server is listening on {self.path}")
+            finally:
+                probe.close()
+
+        serve_locally()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.path)
+        # Only processes of the same user (or group) may use the model
+        os.chmod(self.path, 0o660)
+        self._socket.listen(128)
+
+    def serve_forever(self):
+        if self._socket is None:
+            self.bind()
+        try:
+            while True:
+                try:
+                    conn, _ = self._socket.accept()
+                except OSError:
+                    # The listening socket was closed by shutdown()
+                    return
+                threading.Thread(target=self._serve_connection, args=(conn,), name="inference-connection", daemon=True).start()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _serve_connection(self, conn):
+        with self._lock:
+            self.connections += 1
+        try:
+            while True:
+                frame = recv_frame(conn)
+                if frame is None:
+                    return
+                kind, header, blob = frame
+                if kind != REQUEST:
+                    raise ProtocolError(f"Expected a request frame, got kind {kind}")
+                with self._lock:
+                    self.requests += 1
+                self._handle(conn, header, blob)
+        except ClientGone:
+            pass
+        except (OSError, ProtocolError) as e:
+            print(f"Inference connection error: {e}")
+        finally:
+            conn.close()
+            with self._lock:
+                self.connections -= 1
+
+    def _handle(self, conn, header, blob):
+        op = header.get("op")
+        cancel = CancelToken()
+        if op == "stream":
+            self._stream(conn, header, cancel)
+            return
+
+        handler = getattr(self, f"op_{op}", None)
+        if handler is None:
+            send_frame(conn, ERROR, {"error": f"Unknown operation: {op}"})
+            return
+
+        future = self._executor.submit(handler, header, blob, cancel)
+        while not wait([future], timeout=self.poll_interval).done:
+            readable, _, _ = select.select([conn], [], [], 0)
+            if readable:
+                # Clients send nothing while waiting, so this is the connection closing
+                cancel.cancel("disconnect")
+                raise ClientGone()
+
+        try:
+            result, result_blob = future.result()
+        except GenerationCancelled:
+            raise ClientGone()
+        except Exception as e:
+            print(f"Inference {op} error: {e}")
+            send_frame(conn, ERROR, {"error": str(e)})
+            return
+        send_frame(conn, RESULT, {**result, "server": self.instance_id}, result_blob)
+
+    def _stream(self, conn, header, cancel):
+        chunks = stream_generate(
+            header["prompt"],
+            header["max_new_tokens"],
+            prompt_lookup=header.get("prompt_lookup", False),
+            cancel=cancel,
+            **header.get("generate_kwargs", {})
+        )
+        try:
+            for chunk in chunks:
+                send_frame(conn, CHUNK, {"text": chunk})
+        except OSError:
+            # The client went away; closing the generator stops decoding
+            chunks.close()
+            raise ClientGone()
+        except Exception as e:
+            print(f"Inference stream error: {e}")
+            send_frame(conn, ERROR, {"error": str(e)})
+            return
+        send_frame(conn, RESULT, {"server": self.instance_id})
+
+    def op_generate(self, header, blob, cancel):
+        scheduler = SCHEDULERS[header["scheduler"]]
+        prompts = header["prompts"]
+        outputs = scheduler.submit_many(prompts, max_new_tokens=header["budgets"], cancel=[cancel] * len(prompts))
+        return {"outputs": outputs}, b""
+
+    def op_prompt_lookup(self, header, blob, cancel):
+        output = generate_with_prompt_lookup(header["prompt"], header["max_new_tokens"], cancel=cancel)
+        return {"output": output}, b""
+
+    def op_embed(self, header, blob, cancel):
+        vectors = embed_texts(header["texts"], batch_size=header.get("batch_size", 16))
+        if vectors is None:
+            return {"shape": None}, b""
+        return {"shape": list(vectors.shape)}, vectors.tobytes()
+
+    def op_add_template(self, header, blob, cancel):
+        model, tokenizer, device = registry.get()
+        if model and tokenizer:
+            prefix_cache.add_template(model, tokenizer, device, header["prompt"])
+        return {}, b""
+
+    def op_metrics(self, header, blob, cancel):
+        return {"text": render_metrics(requests=False)}, b""
+
+    def op_health(self, header, blob, cancel):
+        with self._lock:
+            connections, requests = self.connections, self.requests
+        return {
+            **registry.health(),
+            "revision": registry.revision,
+            "connections": connections,
+            "requests": requests,
+            "batches": {
+                name: {"batches_run": scheduler.batches_run, "prompts_run": scheduler.prompts_run}
+                for name, scheduler in SCHEDULERS.items()
+            },
+            "prefix_cache": prefix_cache.stats(),
+            "prompt_lookup": prompt_lookup_stats.snapshot(),
+            "cancellations": cancellation_stats.snapshot(),
+        }, b""
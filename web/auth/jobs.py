@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import AIAnswerJob
+
+
+def claim_next_job(worker_name):
+    """Atomically move the oldest queued job to running and return it.
+
+    The conditional UPDATE only succeeds for one worker, so several workers
+    can poll the same table without a broker or row locks.
+    """
+    while True:
+        job = AIAnswerJob.objects.filter(status='queued').order_by('created_at').first()
+        if job is None:
+            return None
+        claimed = AIAnswerJob.objects.filter(id=job.id, status='queued').update(
+            status='running',
+            started_at=timezone.now(),
+            worker=worker_name
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # Another worker took it first; try the next one
+
+
+def run_job(job):
+    """Generate the answer for a claimed job and record the outcome"""
+    # Imported here so the worker shares the resident model and schedulers
+    from .views import generate_ai_answer
+
+    try:
+        ai_answer = generate_ai_answer(job.question.title, job.question.content, job.context_prompt, draft=job.draft)
+    except Exception as e:
+        ai_answer = None
+        job.error = str(e)
+
+    if ai_answer:
+        job.status = 'done'
+        job.result = ai_answer
+    else:
+        job.status = 'failed'
+        job.error = job.error or 'Failed to generate AI answer.'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+def fail_job(job_id, error):
+    """Mark a job failed after an unexpected error; a job deleted with its question is left alone"""
+    return AIAnswerJob.objects.filter(id=job_id, status='running').update(
+        status='failed',
+        error=str(error),
+        finished_at=timezone.now()
+    )
+
+
+def requeue_stale_jobs(older_than_seconds):
+    """Put back jobs left running by a worker that died mid-generation"""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    return AIAnswerJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='queued',
+        started_at=None,
+        worker=''
+    )
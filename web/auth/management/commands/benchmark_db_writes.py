@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from auth.models import Question
+
+
+# Environment for each profile; the baseline is the old settings (rollback
+# journal, deferred transactions, a new connection per request)
+PROFILES = {
+    "baseline": {"SQLITE_TUNING": "0", "DB_CONN_MAX_AGE": "0"},
+    "tuned": {"SQLITE_TUNING": "1", "DB_CONN_MAX_AGE": "60"},
+}
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent question-posting throughput on SQLite with and without the tuned database profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent writer threads")
+        parser.add_argument("--writes", type=int, default=200, help="Questions posted per worker")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--profile", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["profile"]:
+            # Child process: settings were built from this profile's environment
+            self.stdout.write(json.dumps(self.measure(options["workers"], options["writes"])))
+            return
+
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark compares SQLite profiles; run it with DATABASE_PROFILE=sqlite")
+
+        report = {"workers": options["workers"], "writes_per_worker": options["writes"], "profiles": {}}
+        for profile, profile_env in PROFILES.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {**os.environ, **profile_env, "SQLITE_PATH": os.path.join(tmp, "bench.sqlite3"),
+                       "PRETRANSLATE_ON_SAVE": "0"}
+                self.stderr.write(f"Measuring {profile} profile...")
+                self.run_child(["migrate", "-v", "0"], env)
+                completed = self.run_child(
+                    ["benchmark_db_writes", "--profile", profile,
+                     "--workers", str(options["workers"]), "--writes", str(options["writes"])],
+                    env
+                )
+                report["profiles"][profile] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        baseline, tuned = report["profiles"]["baseline"], report["profiles"]["tuned"]
+        report["speedup"] = (
+            round(tuned["writes_per_second"] / baseline["writes_per_second"], 2)
+            if baseline["writes_per_second"] else None
+        )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        for profile, result in report["profiles"].items():
+            self.stdout.write(
+                f"{profile:8} {result['writes_per_second']:8.1f} writes/s | "
+                f"p95 {result['p95_ms']:7.1f} ms | {result['locked_errors']} 'database is locked' errors | "
+                f"journal_mode={result['journal_mode']}"
+            )
+        self.stdout.write(f"Speed-up: x{report['speedup']}")
+
+    def run_child(self, arguments, env):
+        completed = subprocess.run(
+            [sys.executable, sys.argv[0], *arguments],
+            capture_output=True, text=True, env=env
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"{' '.join(arguments)} failed:\n{completed.stderr}")
+        return completed
+
+    def measure(self, workers, writes):
+        """Post questions from several threads the way the student view does"""
+        students = [User.objects.create(username=f"bench-student-{i}") for i in range(workers)]
+        with connection.cursor() as cursor:
+            journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+        close_old_connections()
+
+        latencies = []
+        locked_errors = 0
+        lock = threading.Lock()
+
+        def worker(student):
+            nonlocal locked_errors
+            for i in range(writes):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        Question.objects.create(
+                            student=student,
+                            title=f"Benchmark question {i}",
+                            content="How do I make concurrent writes faster?",
+                            category="programming"
+                        )
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    with lock:
+                        locked_errors += 1
+                finally:
+                    # End of a "request": honours CONN_MAX_AGE like request_finished does
+                    close_old_connections()
+            connection.close()
+
+        threads = [threading.Thread(target=worker, args=(student,)) for student in students]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "journal_mode": journal_mode,
+            "writes": len(latencies),
+            "locked_errors": locked_errors,
+            "seconds": round(elapsed, 3),
+            "writes_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else None,
+        }
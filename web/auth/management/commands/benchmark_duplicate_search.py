@@ -0,0 +1,98 @@
+import json
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from auth.embeddings import EmbeddingIndex, embed_texts, question_text
+from auth.inference_client import serve_locally
+from auth.model_registry import registry
+
+
+SAMPLE_QUESTION = question_text(
+    "Why does my recursive function hit the maximum recursion depth?",
+    "I wrote a function that walks a nested dict and Python raises RecursionError on large inputs."
+)
+
+
+class Command(BaseCommand):
+    help = "Measure top-k cosine search over a memory-mapped question embedding matrix"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Synthetic question embeddings")
+        parser.add_argument("--dim", type=int, help="Embedding size (default: the model's hidden size, or 1536)")
+        parser.add_argument("--k", type=int, default=5, help="Neighbours per search")
+        parser.add_argument("--runs", type=int, default=50, help="Timed searches")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        # Measure the model in this process, even where web workers use an inference server
+        serve_locally()
+        rows, k, runs = options["rows"], options["k"], options["runs"]
+        report = {"rows": rows, "k": k}
+
+        # Time a real embedding when the model loads; it dominates the cost of the duplicate check
+        model, _, _ = registry.get()
+        dim = options["dim"] or (model.config.hidden_size if model else 1536)
+        report["dim"] = dim
+        if model:
+            embed_texts([SAMPLE_QUESTION])
+            timings = []
+            for _ in range(5):
+                started = time.perf_counter()
+                embed_texts([SAMPLE_QUESTION])
+                timings.append((time.perf_counter() - started) * 1000)
+            report["embed_p50_ms"] = round(statistics.median(timings), 2)
+
+        rng = np.random.default_rng(0)
+
+        def batches(batch_size=10000):
+            for start in range(0, rows, batch_size):
+                vectors = rng.standard_normal((min(batch_size, rows - start), dim), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                yield np.arange(start + 1, start + 1 + len(vectors)), vectors
+
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            EmbeddingIndex(tmp).rebuild(rows, dim, batches())
+            report["build_seconds"] = round(time.perf_counter() - started, 2)
+
+            # A fresh instance maps the file like a newly started worker would
+            index = EmbeddingIndex(tmp)
+            query = rng.standard_normal(dim, dtype=np.float32)
+            query /= np.linalg.norm(query)
+            started = time.perf_counter()
+            index.search(query, k)
+            report["first_search_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                index.search(query, k)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            report["search_p50_ms"] = round(statistics.median(timings), 2)
+            report["search_p95_ms"] = round(timings[int(len(timings) * 0.95) - 1], 2)
+
+            # Baseline: one dot product per row from Python, as a per-question loop would do
+            matrix = np.load(index.path, mmap_mode="r")
+            started = time.perf_counter()
+            scores = [float(np.dot(row, query)) for row in matrix]
+            sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+            report["row_loop_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            report["index_megabytes"] = round(matrix.nbytes / 2 ** 20, 1)
+            del matrix
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        if "embed_p50_ms" in report:
+            self.stdout.write(f"embedding one question: p50 {report['embed_p50_ms']} ms")
+        self.stdout.write(
+            f"{rows} x {dim} float32 ({report['index_megabytes']} MB) built in {report['build_seconds']}s | "
+            f"top-{k} matmul p50 {report['search_p50_ms']} ms p95 {report['search_p95_ms']} ms "
+            f"(first search after mapping {report['first_search_ms']} ms) | per-row loop {report['row_loop_ms']} ms"
+        )
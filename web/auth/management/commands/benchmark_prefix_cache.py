@@ -0,0 +1,102 @@
+import json
+import statistics
+import time
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.inference_client import serve_locally
+from auth.model_registry import registry
+from auth.prefix_cache import prefix_cache, PROMPT_MARKER
+from auth.views import build_answer_prompt, build_translation_prompt, cache_answer_prefix, cache_prompt_prefix
+
+
+SAMPLE_QUESTIONS = [
+    ("What is a list comprehension?", "How do I write one in Python?"),
+    ("Career advice", "Should I learn Java or Python first?"),
+    ("Git merge conflict", "How do I resolve a merge conflict?"),
+    ("Recursion", "Why does my recursive function never stop?"),
+    ("Project idea", "What is a good first web project?"),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure prefill latency (time to first token) with and without the prompt prefix cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per prompt and mode")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        # Measure the model in this process, even where web workers use an inference server
+        serve_locally()
+        model, tokenizer, device = registry.get()
+        if not model:
+            raise CommandError(f"AI model is not available: {registry.error}")
+
+        cache_answer_prefix(model, tokenizer, device)
+        cache_prompt_prefix(model, tokenizer, device, build_translation_prompt(tokenizer, PROMPT_MARKER, "hindi"))
+
+        prompts = {
+            "answer": [build_answer_prompt(tokenizer, title, content) for title, content in SAMPLE_QUESTIONS],
+            "translation": [build_translation_prompt(tokenizer, title, "hindi") for title, _ in SAMPLE_QUESTIONS],
+        }
+
+        report = {"device": str(device), "runs": options["runs"], "results": {}}
+        for kind, kind_prompts in prompts.items():
+            timings = {"uncached": [], "prefix_cached": []}
+            prompt_tokens = []
+            cached_tokens = []
+            for prompt in kind_prompts:
+                model_inputs = tokenizer([prompt], return_tensors="pt").to(device)
+                prompt_tokens.append(model_inputs.input_ids.shape[1])
+                # Warm-up run so allocator and kernel setup are not timed
+                self.first_token_seconds(model, tokenizer, model_inputs, False)
+                for _ in range(options["runs"]):
+                    timings["uncached"].append(self.first_token_seconds(model, tokenizer, model_inputs, False))
+                    timings["prefix_cached"].append(self.first_token_seconds(model, tokenizer, model_inputs, True))
+                past_key_values = prefix_cache.match(model, model_inputs.input_ids)
+                cached_tokens.append(past_key_values.get_seq_length() if past_key_values is not None else 0)
+
+            uncached_ms = statistics.median(timings["uncached"]) * 1000
+            cached_ms = statistics.median(timings["prefix_cached"]) * 1000
+            report["results"][kind] = {
+                "mean_prompt_tokens": statistics.mean(prompt_tokens),
+                "mean_cached_tokens": statistics.mean(cached_tokens),
+                "uncached_median_ms": round(uncached_ms, 2),
+                "prefix_cached_median_ms": round(cached_ms, 2),
+                "speedup": round(uncached_ms / cached_ms, 2) if cached_ms else None,
+            }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Device: {report['device']}, {report['runs']} runs per prompt")
+        for kind, result in report["results"].items():
+            self.stdout.write(
+                f"{kind:12} prompt {result['mean_prompt_tokens']:.0f} tok "
+                f"(cached {result['mean_cached_tokens']:.0f}) | "
+                f"uncached {result['uncached_median_ms']:.1f} ms | "
+                f"prefix cached {result['prefix_cached_median_ms']:.1f} ms | "
+                f"x{result['speedup']}"
+            )
+
+    def first_token_seconds(self, model, tokenizer, model_inputs, use_prefix_cache):
+        """Time prefill plus the first decoded token, including the cache lookup and copy"""
+        started = time.perf_counter()
+        kwargs = {}
+        if use_prefix_cache:
+            past_key_values = prefix_cache.match(model, model_inputs.input_ids)
+            if past_key_values is not None:
+                kwargs["past_key_values"] = past_key_values
+        with torch.inference_mode():
+            model.generate(
+                model_inputs.input_ids,
+                attention_mask=model_inputs.attention_mask,
+                max_new_tokens=1,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+                **kwargs
+            )
+        return time.perf_counter() - started
@@ -0,0 +1,142 @@
+import json
+import time
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.assisted_decoding import eos_token_ids, prompt_lookup_generate
+from auth.inference_client import serve_locally
+from auth.model_registry import registry
+from auth.views import build_answer_prompt
+
+
+# (title, content, mentor draft) triples for the "enhance answer" path
+SAMPLE_DRAFTS = [
+    (
+        "What is a list comprehension?",
+        "How do I write one in Python?",
+        "A list comprehension builds a new list from an iterable in one line, for example "
+        "squares = [x * x for x in range(10)]. You can add a condition at the end: "
+        "evens = [x for x in numbers if x % 2 == 0]. Use them for simple transformations "
+        "and switch to a regular for loop when the logic gets long.",
+    ),
+    (
+        "Git merge conflict",
+        "How do I resolve a merge conflict?",
+        "Run git status to see the conflicted files. Open each file and look for the "
+        "<<<<<<< HEAD, ======= and >>>>>>> markers. Keep the lines you want, delete the "
+        "markers, then run git add on the file and git commit to finish the merge.",
+    ),
+    (
+        "Recursion",
+        "Why does my recursive function never stop?",
+        "Every recursive function needs a base case that returns without calling itself. "
+        "Check that each recursive call moves closer to that base case, for example "
+        "factorial(n - 1) instead of factorial(n). Otherwise Python raises RecursionError.",
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare plain greedy decoding with prompt-lookup decoding on enhance-answer prompts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-new-tokens", type=int, default=256, help="Tokens to generate per prompt")
+        parser.add_argument("--ngram-size", type=int, default=3, help="Longest n-gram to look up")
+        parser.add_argument("--draft-tokens", type=int, default=10, help="Draft tokens proposed per step")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        # Measure the model in this process, even where web workers use an inference server
+        serve_locally()
+        model, tokenizer, device = registry.get()
+        if not model:
+            raise CommandError(f"AI model is not available: {registry.error}")
+
+        eos = eos_token_ids(model, tokenizer)
+        totals = {"greedy_seconds": 0.0, "lookup_seconds": 0.0, "tokens": 0, "drafted": 0, "accepted": 0, "steps": 0}
+        identical = 0
+        results = []
+
+        for title, content, draft in SAMPLE_DRAFTS:
+            prompt = build_answer_prompt(tokenizer, title, content, draft)
+            input_ids = tokenizer([prompt], return_tensors="pt").input_ids.to(device)
+
+            # Warm-up run so allocator and kernel setup are not timed
+            self.greedy(model, tokenizer, input_ids, 4, eos)
+
+            started = time.perf_counter()
+            greedy_tokens = self.greedy(model, tokenizer, input_ids, options["max_new_tokens"], eos)
+            greedy_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            lookup_tokens, stats = prompt_lookup_generate(
+                model,
+                input_ids,
+                options["max_new_tokens"],
+                eos,
+                max_ngram_size=options["ngram_size"],
+                num_draft_tokens=options["draft_tokens"]
+            )
+            lookup_seconds = time.perf_counter() - started
+
+            same = lookup_tokens == greedy_tokens
+            identical += same
+            totals["greedy_seconds"] += greedy_seconds
+            totals["lookup_seconds"] += lookup_seconds
+            totals["tokens"] += len(lookup_tokens)
+            for key in ("drafted", "accepted", "steps"):
+                totals[key] += stats[key]
+            results.append({
+                "title": title,
+                "prompt_tokens": input_ids.shape[1],
+                "new_tokens": len(lookup_tokens),
+                "greedy_tok_s": round(len(greedy_tokens) / greedy_seconds, 2),
+                "lookup_tok_s": round(len(lookup_tokens) / lookup_seconds, 2),
+                "acceptance_rate": round(stats["accepted"] / stats["drafted"], 3) if stats["drafted"] else 0.0,
+                "identical_output": same,
+            })
+
+        report = {
+            "device": str(device),
+            "max_new_tokens": options["max_new_tokens"],
+            "results": results,
+            "greedy_tok_s": round(totals["tokens"] / totals["greedy_seconds"], 2),
+            "lookup_tok_s": round(totals["tokens"] / totals["lookup_seconds"], 2),
+            "speedup": round(totals["greedy_seconds"] / totals["lookup_seconds"], 2),
+            "acceptance_rate": round(totals["accepted"] / totals["drafted"], 3) if totals["drafted"] else 0.0,
+            "tokens_per_step": round(totals["tokens"] / totals["steps"], 2),
+            "identical_outputs": f"{identical}/{len(SAMPLE_DRAFTS)}",
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Device: {report['device']}, up to {report['max_new_tokens']} new tokens per prompt")
+        for result in results:
+            self.stdout.write(
+                f"{result['title'][:30]:30} {result['new_tokens']:4} tok | "
+                f"greedy {result['greedy_tok_s']:7.1f} tok/s | "
+                f"lookup {result['lookup_tok_s']:7.1f} tok/s | "
+                f"accepted {result['acceptance_rate']:.0%} | "
+                f"{'same' if result['identical_output'] else 'DIFFERENT'}"
+            )
+        self.stdout.write(
+            f"Overall: x{report['speedup']} ({report['greedy_tok_s']} -> {report['lookup_tok_s']} tok/s), "
+            f"acceptance {report['acceptance_rate']:.0%}, {report['tokens_per_step']} tokens per forward pass, "
+            f"identical outputs {report['identical_outputs']}"
+        )
+
+    def greedy(self, model, tokenizer, input_ids, max_new_tokens, eos):
+        """Plain greedy decoding with generate, returning the new token ids"""
+        with torch.inference_mode():
+            output = model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                eos_token_id=eos,
+                pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else eos[0]
+            )
+        return output[0, input_ids.shape[1]:].tolist()
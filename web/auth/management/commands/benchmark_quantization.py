@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import torch
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.inference_client import serve_locally
+from auth.model_registry import ModelRegistry
+from auth.views import build_answer_prompt, build_translation_prompt
+
+
+PROMPT_SET = [
+    ("translation", "What is the difference between a list and a tuple?", "hindi"),
+    ("translation", "Please explain how recursion works with an example.", "chinese"),
+    ("translation", "I am stuck on my final year project.", "japanese"),
+    ("answer", "How do I start learning data structures?", "I know basic Python and want to prepare for interviews."),
+    ("answer", "Should I use Django or Flask?", "I want to build a small blog with user accounts."),
+]
+
+
+def resident_memory_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best we can do without /proc (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Command(BaseCommand):
+    help = "Compare tokens/sec, memory and output agreement of the int8 CPU mode against the unquantized model"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-new-tokens", type=int, default=64)
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--mode", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        # Measure the model in this process, even where web workers use an inference server
+        serve_locally()
+        if options["mode"]:
+            # Child process: measure a single mode in a clean interpreter
+            self.stdout.write(json.dumps(self.measure(options["mode"], options["max_new_tokens"])))
+            return
+
+        runs = {}
+        for mode in ("none", "int8"):
+            self.stderr.write(f"Measuring quantization={mode}...")
+            completed = subprocess.run(
+                [sys.executable, sys.argv[0], "benchmark_quantization", "--mode", mode,
+                 "--max-new-tokens", str(options["max_new_tokens"])],
+                capture_output=True, text=True, env=os.environ.copy()
+            )
+            if completed.returncode != 0:
+                raise CommandError(f"Benchmark for {mode} failed:\n{completed.stderr}")
+            runs[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        report = {
+            "max_new_tokens": options["max_new_tokens"],
+            "modes": {mode: {k: v for k, v in run.items() if k != "outputs"} for mode, run in runs.items()},
+            "agreement": self.agreement(runs["none"]["outputs"], runs["int8"]["outputs"]),
+        }
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        for mode, result in report["modes"].items():
+            self.stdout.write(
+                f"{mode:5} load {result['load_seconds']:.1f}s | RSS {result['resident_mb']:.0f} MB | "
+                f"{result['tokens_per_second']:.1f} tok/s"
+            )
+        agreement = report["agreement"]
+        self.stdout.write(
+            f"int8 vs none: {agreement['token_agreement']:.1%} of greedy tokens match, "
+            f"{agreement['exact_matches']}/{agreement['prompts']} outputs identical, "
+            f"first divergence after {agreement['mean_matching_prefix']:.1f} tokens on average"
+        )
+
+    def measure(self, mode, max_new_tokens):
+        """Load the model in one mode and time greedy generation over the prompt set"""
+        rss_before = resident_memory_mb()
+        registry = ModelRegistry(quantization=mode)
+        model, tokenizer, device = registry.get()
+        if not model:
+            raise CommandError(f"AI model is not available: {registry.error}")
+
+        generated_tokens = 0
+        generate_seconds = 0.0
+        outputs = []
+        for kind, text, extra in PROMPT_SET:
+            if kind == "translation":
+                prompt = build_translation_prompt(tokenizer, text, extra)
+            else:
+                prompt = build_answer_prompt(tokenizer, text, extra)
+            model_inputs = tokenizer([prompt], return_tensors="pt").to(device)
+
+            started = time.perf_counter()
+            with torch.inference_mode():
+                generated_ids = model.generate(
+                    model_inputs.input_ids,
+                    attention_mask=model_inputs.attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.pad_token_id
+                )
+            generate_seconds += time.perf_counter() - started
+
+            new_ids = generated_ids[0, model_inputs.input_ids.shape[1]:].tolist()
+            generated_tokens += len(new_ids)
+            outputs.append(new_ids)
+
+        return {
+            "device": str(device),
+            "load_seconds": registry.load_seconds,
+            "resident_mb": resident_memory_mb() - rss_before,
+            "generated_tokens": generated_tokens,
+            "tokens_per_second": generated_tokens / generate_seconds if generate_seconds else 0.0,
+            "outputs": outputs,
+        }
+
+    def agreement(self, reference, candidate):
+        """Compare greedy token sequences position by position"""
+        matching = 0
+        total = 0
+        prefixes = []
+        for ref_ids, cand_ids in zip(reference, candidate):
+            total += max(len(ref_ids), len(cand_ids))
+            matching += sum(1 for a, b in zip(ref_ids, cand_ids) if a == b)
+            prefix = 0
+            for a, b in zip(ref_ids, cand_ids):
+                if a != b:
+                    break
+                prefix += 1
+            prefixes.append(prefix)
+        return {
+            "prompts": len(reference),
+            "exact_matches": sum(1 for a, b in zip(reference, candidate) if a == b),
+            "token_agreement": matching / total if total else 1.0,
+            "mean_matching_prefix": sum(prefixes) / len(prefixes) if prefixes else 0.0,
+        }
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from auth.models import Answer, Question
+from auth.search import SEARCH_TABLE, fts_query, rebuild_search_index, search_question_ids
+
+
+VOCABULARY = (
+    "python java django flask react list tuple dict set loop recursion function class object "
+    "inheritance decorator generator iterator exception error bug test deploy docker git merge "
+    "branch commit database query index join sql api request response json async thread process "
+    "memory performance career interview resume project idea internship algorithm sorting graph "
+    "tree array string pointer variable scope closure lambda module package install virtualenv"
+).split()
+
+# Filler words make the topic words follow a Zipf-like frequency, as in real text
+FILLER = [f"term{i}" for i in range(5000)]
+
+QUERIES = ["recursion", "django query", "merge conflict", "decor", "async thread performance", "term2500"]
+
+
+class Command(BaseCommand):
+    help = "Measure full-text search latency against an icontains scan on a synthetic question table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Questions to generate")
+        parser.add_argument("--runs", type=int, default=20, help="Timed runs per query")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["child"]:
+            self.stdout.write(json.dumps(self.measure(options["rows"], options["runs"])))
+            return
+
+        # Seeding 100k rows into the real database is not an option; use a throwaway SQLite file
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "DATABASE_PROFILE": "sqlite", "SQLITE_PATH": os.path.join(tmp, "search.sqlite3"),
+                   "PRETRANSLATE_ON_SAVE": "0"}
+            for arguments in (["migrate", "-v", "0"],
+                              ["benchmark_search", "--child", "--rows", str(options["rows"]), "--runs", str(options["runs"])]):
+                self.stderr.write(f"Running {arguments[0]}...")
+                completed = subprocess.run([sys.executable, sys.argv[0], *arguments], capture_output=True, text=True, env=env)
+                if completed.returncode != 0:
+                    raise CommandError(f"{' '.join(arguments)} failed:\n{completed.stderr}")
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        self.stdout.write(
+            f"{report['rows']} questions, {report['answers']} answers | "
+            f"seeded in {report['seed_seconds']}s, indexed in {report['index_seconds']}s"
+        )
+        for query, result in report["queries"].items():
+            self.stdout.write(
+                f"{query:26} {result['matching_questions']:6} matches | "
+                f"fts p50 {result['fts_p50_ms']:7.2f} ms p95 {result['fts_p95_ms']:7.2f} ms | "
+                f"icontains p50 {result['icontains_p50_ms']:8.2f} ms"
+            )
+
+    def measure(self, rows, runs):
+        rng = random.Random(0)
+        words = VOCABULARY + FILLER
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+
+        def sentence(length):
+            return " ".join(rng.choices(words, weights, k=length))
+
+        started = time.perf_counter()
+        students = User.objects.bulk_create([User(username=f"search-student-{i}") for i in range(200)])
+        mentor = User.objects.create(username="search-mentor")
+        Question.objects.bulk_create((
+            Question(student=students[i % len(students)], title=sentence(6), content=sentence(40),
+                     category="programming")
+            for i in range(rows)
+        ), batch_size=2000)
+        question_ids = list(Question.objects.values_list("id", flat=True))
+        Answer.objects.bulk_create((
+            Answer(question_id=rng.choice(question_ids), mentor=mentor, content=sentence(60))
+            for _ in range(rows // 2)
+        ), batch_size=2000)
+        seed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuild_search_index()
+        index_seconds = time.perf_counter() - started
+
+        results = {}
+        for query in QUERIES:
+            search_question_ids(query)  # warm-up
+            fts = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                ids, _ = search_question_ids(query)
+                fts.append((time.perf_counter() - started) * 1000)
+
+            # What a naive search would do: scan for every word, newest first
+            condition = Q()
+            for word in query.split():
+                condition &= Q(title__icontains=word) | Q(content__icontains=word)
+            scan = []
+            for _ in range(max(runs // 4, 1)):
+                started = time.perf_counter()
+                list(Question.objects.filter(condition).order_by("-created_at").values_list("id", flat=True)[:20])
+                scan.append((time.perf_counter() - started) * 1000)
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [fts_query(query)])
+                matches = cursor.fetchone()[0]
+
+            fts.sort()
+            results[query] = {
+                "matching_questions": matches,
+                "matches_on_page": len(ids),
+                "fts_p50_ms": round(statistics.median(fts), 2),
+                "fts_p95_ms": round(fts[int(len(fts) * 0.95) - 1], 2),
+                "icontains_p50_ms": round(statistics.median(scan), 2),
+            }
+
+        return {
+            "rows": rows,
+            "answers": rows // 2,
+            "seed_seconds": round(seed_seconds, 1),
+            "index_seconds": round(index_seconds, 1),
+            "queries": results,
+        }
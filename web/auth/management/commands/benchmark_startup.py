@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Time `manage.py check` and a cold start to the first generated token in fresh interpreters"
+    # System checks import the URLconf, which the child process times itself
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Fresh processes to time for each measurement")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--started-at", type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["started_at"] is not None:
+            # Child process: everything so far (interpreter, Django setup) counts as startup
+            self.stdout.write(json.dumps(self.measure(options["started_at"])))
+            return
+
+        checks = []
+        inferences = []
+        for run in range(options["runs"]):
+            self.stderr.write(f"Run {run + 1}/{options['runs']}...")
+            started = time.perf_counter()
+            self.run_child(["check"])
+            checks.append(time.perf_counter() - started)
+            completed = self.run_child(["benchmark_startup", "--started-at", repr(time.time())])
+            inferences.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+        report = {
+            "runs": options["runs"],
+            "check_seconds": self.summary(checks),
+            "first_inference": {
+                key: self.summary([run[key] for run in inferences])
+                for key in ("startup_seconds", "urls_seconds", "load_seconds", "first_token_seconds", "total_seconds")
+            },
+            "torch_imported_by_urls": any(run["torch_imported_by_urls"] for run in inferences),
+        }
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        first = report["first_inference"]
+        self.stdout.write(f"manage.py check     {report['check_seconds']['median']:6.2f}s (median)")
+        self.stdout.write(
+            f"first inference     {first['total_seconds']['median']:6.2f}s (median): "
+            f"startup {first['startup_seconds']['median']:.2f}s | URLconf {first['urls_seconds']['median']:.2f}s | "
+            f"model load {first['load_seconds']['median']:.2f}s | first token {first['first_token_seconds']['median']:.2f}s"
+        )
+        if report["torch_imported_by_urls"]:
+            self.stderr.write("torch was imported by the URLconf; every web worker pays for it at boot")
+
+    def run_child(self, arguments):
+        completed = subprocess.run(
+            [sys.executable, sys.argv[0], *arguments],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"{' '.join(arguments)} failed:\n{completed.stderr}")
+        return completed
+
+    def measure(self, started_at):
+        """Seconds from process start to the first streamed token of a translation"""
+        startup = time.time() - started_at
+
+        # What a web worker imports at boot; the ML stack should not be part of it
+        started = time.perf_counter()
+        import projectname.urls  # noqa: F401
+        urls_seconds = time.perf_counter() - started
+        torch_imported = "torch" in sys.modules
+
+        from auth.inference_client import serve_locally
+        from auth.model_registry import registry
+        from auth.streaming import stream_generate
+        from auth.views import build_translation_prompt
+
+        # Measure the model in this process, even where web workers use an inference server
+        serve_locally()
+        model, tokenizer, device = registry.get()
+        if not model:
+            raise CommandError(f"AI model is not available: {registry.error}")
+
+        started = time.perf_counter()
+        prompt = build_translation_prompt(tokenizer, "How do I reverse a list in Python?", "hindi")
+        chunks = stream_generate(prompt, 8)
+        next(chunks, None)
+        first_token_seconds = time.perf_counter() - started
+        # Let the generation thread finish before the interpreter exits
+        for _ in chunks:
+            pass
+
+        return {
+            "startup_seconds": startup,
+            "urls_seconds": urls_seconds,
+            "torch_imported_by_urls": torch_imported,
+            "load_seconds": registry.load_seconds,
+            "first_token_seconds": first_token_seconds,
+            "total_seconds": time.time() - started_at,
+        }
+
+    def summary(self, values):
+        return {"median": statistics.median(values), "min": min(values), "max": max(values)}
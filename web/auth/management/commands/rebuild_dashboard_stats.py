@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from auth.stats import rebuild_answer_counts, rebuild_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Recount the denormalized answer counts and the mentor dashboard stats"
+
+    def handle(self, *args, **options):
+        drifted = rebuild_answer_counts()
+        self.stdout.write(f"Answer counts rebuilt ({drifted} questions had drifted)")
+
+        stats = rebuild_dashboard_stats()
+        self.stdout.write(
+            f"Dashboard stats rebuilt: {stats.total_questions} questions "
+            f"({stats.pending_questions} pending, {stats.answered_questions} answered, "
+            f"{stats.closed_questions} closed), {stats.active_students} active students"
+        )
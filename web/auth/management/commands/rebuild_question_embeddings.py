@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.embeddings import question_index, rebuild_question_embeddings
+
+
+class Command(BaseCommand):
+    help = "Embed every question for duplicate detection, e.g. after switching models or bulk imports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=16, help="Questions per forward pass")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_question_embeddings(batch_size=options["batch_size"])
+        if count is None:
+            raise CommandError("AI model is not available")
+        self.stdout.write(
+            f"Embedded {count} questions in {time.perf_counter() - started:.1f}s ({question_index.path})"
+        )
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Re-index every question and its answers for full-text search"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_search_index()
+        self.stdout.write(f"Indexed {count} questions in {time.perf_counter() - started:.1f}s")
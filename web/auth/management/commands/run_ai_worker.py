@@ -0,0 +1,83 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from auth.jobs import claim_next_job, fail_job, run_job, requeue_stale_jobs
+from auth.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = "Process queued AI answer jobs with a local pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=2, help="Number of jobs to run at once")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--stale-after", type=int, default=900, help="Requeue jobs left running longer than this many seconds")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs(options["stale_after"])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        self.stdout.write("Loading AI model...")
+        registry.get()
+        if not registry.is_ready:
+            self.stderr.write(f"AI model is not available: {registry.error}")
+
+        base_name = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f"{base_name}:{index}", options["poll_interval"], options["once"]),
+                name=f"ai-worker-{index}",
+                daemon=True
+            )
+            for index in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(self.style.SUCCESS(f"AI worker running with {len(threads)} thread(s)"))
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping AI worker")
+
+    def work(self, worker_name, poll_interval, once):
+        """Claim and run jobs until told to stop"""
+        try:
+            while True:
+                close_old_connections()
+                job = None
+                try:
+                    job = claim_next_job(worker_name)
+                    if job is None:
+                        if once:
+                            return
+                        time.sleep(poll_interval)
+                        continue
+
+                    job = run_job(job)
+                    self.stdout.write(
+                        f"[{worker_name}] job {job.id} {job.status} "
+                        f"(waited {job.wait_seconds:.1f}s, ran {job.run_seconds:.1f}s)"
+                    )
+                except Exception as e:
+                    # A job deleted with its question mid-run, or a database
+                    # error: log it and keep the thread serving the queue
+                    self.stderr.write(f"[{worker_name}] job {job.id if job else '-'} error: {e}")
+                    if job is not None:
+                        try:
+                            fail_job(job.id, e)
+                        except Exception as fail_error:
+                            self.stderr.write(f"[{worker_name}] could not mark job {job.id} failed: {fail_error}")
+                    time.sleep(poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,45 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.inference_client import serve_locally
+from auth.inference_server import InferenceServer
+from auth.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = "Load the AI model once and serve generate/embed requests from every web worker over a Unix socket"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.INFERENCE_SOCKET, help="Unix socket path (defaults to INFERENCE_SOCKET)")
+        parser.add_argument("--threads", type=int, default=settings.INFERENCE_SERVER_THREADS, help="Requests to run at once")
+
+    def handle(self, *args, **options):
+        if not options["socket"]:
+            raise CommandError("Set INFERENCE_SOCKET or pass --socket")
+
+        # This process owns the model even though INFERENCE_SOCKET is set
+        serve_locally()
+        self.stdout.write("Loading AI model...")
+        registry.get()
+        if not registry.is_ready:
+            self.stderr.write(f"AI model is not available: {registry.error}")
+
+        server = InferenceServer(options["socket"], threads=options["threads"])
+        try:
+            server.bind()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Inference server {server.instance_id} listening on {options['socket']} "
+            f"with {options['threads']} thread(s)"
+        ))
+        # Process managers stop services with SIGTERM; close the socket as for Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping inference server")
+        finally:
+            server.shutdown()
@@ -0,0 +1,29 @@
+from .roles import resolve_user_role
+
+
+class UserRoleMiddleware:
+    """Resolve the user's role once per request and expose it as ``request.user_role``.
+
+    The role is kept in the session, so most requests don't touch
+    UserProfile at all. Saving or deleting a profile bumps a per-user version
+    in the cache, which makes other sessions of that user re-read the role;
+    USER_ROLE_MAX_AGE bounds how long a session copy is trusted when the cache
+    is not shared between processes.
+
+    Resolving the role loads the user, so ``request.auser`` (used by async
+    views and their login_required) is pointed at that same object rather
+    than fetching the user a second time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_role = resolve_user_role(request)
+        user = request.user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return self.get_response(request)
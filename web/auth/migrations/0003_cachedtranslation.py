@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0002_question_answer"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedTranslation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text_hash", models.CharField(max_length=64)),
+                ("language", models.CharField(max_length=20)),
+                ("model_revision", models.CharField(max_length=64)),
+                ("translated_text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Cached Translation",
+                "verbose_name_plural": "Cached Translations",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("text_hash", "language", "model_revision"),
+                        name="unique_cached_translation",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0004_aianswerjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentTranslation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "field",
+                    models.CharField(
+                        choices=[("title", "Title"), ("content", "Content")],
+                        max_length=10,
+                    ),
+                ),
+                ("language", models.CharField(max_length=20)),
+                ("source_hash", models.CharField(max_length=64)),
+                ("source_updated_at", models.DateTimeField()),
+                ("translated_text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "answer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="translations",
+                        to="custom_auth.answer",
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="translations",
+                        to="custom_auth.question",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Content Translation",
+                "verbose_name_plural": "Content Translations",
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("answer__isnull", True)),
+                        fields=("question", "field", "language"),
+                        name="unique_question_translation",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("question__isnull", True)),
+                        fields=("answer", "field", "language"),
+                        name="unique_answer_translation",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("answer__isnull", True), ("question__isnull", False)
+                            ),
+                            models.Q(
+                                ("answer__isnull", False), ("question__isnull", True)
+                            ),
+                            _connector="OR",
+                        ),
+                        name="content_translation_single_target",
+                    ),
+                ],
+            },
+        ),
+    ]
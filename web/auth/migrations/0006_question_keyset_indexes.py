@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0005_contenttranslation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="question_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="question_status_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 19:11
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_answer_counts(apps, schema_editor):
+    Question = apps.get_model("custom_auth", "Question")
+    Answer = apps.get_model("custom_auth", "Answer")
+    answers = Answer.objects.filter(question=OuterRef("pk")).values("question")
+    Question.objects.update(
+        answer_count=Coalesce(
+            Subquery(answers.annotate(count=Count("id")).values("count")), 0
+        ),
+        last_answered_at=Subquery(
+            answers.annotate(latest=Max("created_at")).values("latest")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0006_question_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total_questions", models.IntegerField(default=0)),
+                ("pending_questions", models.IntegerField(default=0)),
+                ("answered_questions", models.IntegerField(default=0)),
+                ("closed_questions", models.IntegerField(default=0)),
+                ("active_students", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Dashboard Stats",
+                "verbose_name_plural": "Dashboard Stats",
+            },
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="answer_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="last_answered_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_answer_counts, migrations.RunPython.noop),
+    ]
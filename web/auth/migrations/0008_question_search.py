@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from auth.search import create_search_table
+
+    create_search_table(schema_editor)
+
+    # Index the questions that already exist
+    Question = apps.get_model("custom_auth", "Question")
+    Answer = apps.get_model("custom_auth", "Answer")
+    answers = {}
+    for question_id, content in Answer.objects.order_by("created_at").values_list(
+        "question_id", "content"
+    ):
+        answers.setdefault(question_id, []).append(content)
+
+    from auth.search import POSTGRES_DOCUMENT, SEARCH_TABLE
+
+    rows = [
+        (question_id, title, content, "\n".join(answers.get(question_id, [])))
+        for question_id, title, content in Question.objects.values_list(
+            "id", "title", "content"
+        )
+    ]
+    if not rows:
+        return
+    if schema_editor.connection.vendor == "postgresql":
+        sql = f"INSERT INTO {SEARCH_TABLE} (question_id, document) VALUES (%s, {POSTGRES_DOCUMENT})"
+    else:
+        sql = f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, answers) VALUES (%s, %s, %s, %s)"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    from auth.search import drop_search_table
+
+    drop_search_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0007_question_answer_count_dashboardstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0008_question_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranslationMemorySegment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_hash", models.CharField(max_length=64)),
+                ("source_text", models.TextField()),
+                ("language", models.CharField(max_length=20)),
+                ("model_revision", models.CharField(max_length=64)),
+                ("translated_text", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Translation Memory Segment",
+                "verbose_name_plural": "Translation Memory Segments",
+                "indexes": [
+                    models.Index(
+                        fields=["language", "model_revision", "id"],
+                        name="memory_segment_sync_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source_hash", "language", "model_revision"),
+                        name="unique_memory_segment",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0009_translationmemorysegment"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aianswerjob",
+            name="draft",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 20:13
+
+from django.db import migrations
+
+
+def delete_source_language_translations(apps, schema_editor):
+    """English is the source language; its stored "translations" were never shown"""
+    ContentTranslation = apps.get_model("custom_auth", "ContentTranslation")
+    ContentTranslation.objects.filter(language="english").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("custom_auth", "0010_aianswerjob_draft"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="contenttranslation",
+            name="source_updated_at",
+        ),
+        migrations.RunPython(delete_source_language_translations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .inference_client import RemoteModel, remote_inference_enabled
+
+
+# Build the model on the meta device so weights are copied once into their
+# final tensors instead of into a randomly initialised model first. A
+# safetensors checkpoint is preferred (memory-mapped); a directory that only
+# has pytorch_model.bin still loads, through the slower pickle path.
+WEIGHT_LOADING = {"use_safetensors": None, "low_cpu_mem_usage": True}
+
+
+def quantize_int8(model):
+    """Swap the decoder's Linear layers for dynamically quantized int8 versions.
+
+    Weights are stored as int8 and activations are quantized on the fly,
+    which roughly quarters the memory of the projection layers and speeds
+    up CPU matmuls. The tied embedding/lm_head stays in float32 because it
+    is the most sensitive layer for output quality.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+class ModelRegistry:
+    """Process-wide holder for the Qwen model and tokenizer.
+
+    The weights are loaded once and shared by every request in the process.
+    A failed load is remembered so requests don't retry it until
+    ``retry_after`` seconds have passed or ``reload()`` is called.
+    """
+
+    def __init__(self, model_path=None, retry_after=None, quantization=None):
+        self._model_path = model_path
+        self._retry_after = retry_after
+        self._quantization = quantization
+        self._lock = threading.Lock()
+        self.model = None
+        self.tokenizer = None
+        self.device = None
+        self.error = None
+        self.loaded_at = None
+        self.failed_at = None
+        self.load_seconds = None
+        self.loading = False
+        self._revision = None
+
+    @property
+    def model_path(self):
+        return self._model_path or str(settings.QWEN_MODEL_PATH)
+
+    @property
+    def quantization(self):
+        return (self._quantization or settings.QWEN_QUANTIZATION).lower()
+
+    @property
+    def retry_after(self):
+        if self._retry_after is not None:
+            return self._retry_after
+        return settings.QWEN_LOAD_RETRY_SECONDS
+
+    @property
+    def revision(self):
+        """Short fingerprint of the model files, used to key cached outputs"""
+        if self._revision is None:
+            digest = hashlib.sha256(self.quantization.encode())
+            model_path = self.model_path
+            if os.path.isdir(model_path):
+                for name in sorted(os.listdir(model_path)):
+                    path = os.path.join(model_path, name)
+                    if name.endswith(".json"):
+                        with open(path, "rb") as f:
+                            digest.update(f.read())
+                    elif name.endswith((".safetensors", ".bin")):
+                        # Hashing gigabytes of weights is too slow; size and mtime are enough
+                        stat = os.stat(path)
+                        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            self._revision = digest.hexdigest()[:16]
+        return self._revision
+
+    @property
+    def is_ready(self):
+        return self.model is not None
+
+    def _failure_is_fresh(self):
+        return self.failed_at is not None and time.monotonic() - self.failed_at < self.retry_after
+
+    def get(self):
+        """Return (model, tokenizer, device), loading the model on first use"""
+        if self.is_ready:
+            return self.model, self.tokenizer, self.device
+        if self._failure_is_fresh():
+            return None, None, None
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            if not self.is_ready and not self._failure_is_fresh():
+                self._load()
+        return self.model, self.tokenizer, self.device
+
+    def _load(self):
+        """Load the weights; must be called with the lock held"""
+        self.loading = True
+        started = time.monotonic()
+        try:
+            import torch
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+
+            model_path = self.model_path
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model directory not found: {model_path}")
+
+            tokenizer = AutoTokenizer.from_pretrained(model_path)
+            # Batched generation needs prompts aligned on the right edge
+            tokenizer.padding_side = "left"
+            if remote_inference_enabled():
+                # The inference server holds the weights; this process only needs the
+                # tokenizer (prompt templates, token budgets) and the model config
+                from transformers import AutoConfig
+
+                model = RemoteModel(AutoConfig.from_pretrained(model_path))
+                device = None
+            elif self.quantization == "int8":
+                # Dynamic int8 kernels run on CPU and quantize from float32 weights
+                model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32, **WEIGHT_LOADING)
+                model = quantize_int8(model)
+                device = torch.device("cpu")
+            elif self.quantization == "none":
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_path,
+                    torch_dtype="auto",
+                    device_map="auto",
+                    **WEIGHT_LOADING
+                )
+                device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+            else:
+                raise ValueError(f"Unknown QWEN_QUANTIZATION mode: {self.quantization}")
+            model.eval()
+
+            # Publish the model last: readers check it without the lock
+            self.device = device
+            self.tokenizer = tokenizer
+            self.model = model
+            self.error = None
+            self.failed_at = None
+            self.loaded_at = time.time()
+        except Exception as e:
+            print(f"Error loading Qwen model: {e}")
+            self.model = None
+            self.tokenizer = None
+            self.device = None
+            self.error = str(e)
+            self.failed_at = time.monotonic()
+        finally:
+            self.load_seconds = time.monotonic() - started
+            self.loading = False
+
+    def reload(self):
+        """Drop the current model (or remembered failure) and load again"""
+        with self._lock:
+            self.model = None
+            self.tokenizer = None
+            self.device = None
+            self.failed_at = None
+            self._revision = None
+            self._load()
+        return self.is_ready
+
+    def warm_up(self, background=True):
+        """Load the model ahead of the first request"""
+        if not background:
+            self.get()
+            return None
+        thread = threading.Thread(target=self.get, name="qwen-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def health(self):
+        """Readiness details for the health endpoint"""
+        if self.is_ready:
+            status = "ready"
+        elif self.loading:
+            status = "loading"
+        elif self.error:
+            status = "failed"
+        else:
+            status = "not_loaded"
+        return {
+            "status": status,
+            "ready": self.is_ready,
+            "device": str(self.device) if self.device else None,
+            "quantization": self.quantization,
+            "remote": remote_inference_enabled(),
+            "error": self.error,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+        }
+
+
+registry = ModelRegistry()
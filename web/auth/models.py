@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -42,16 +44,31 @@ class Question(models.Model):
     content = models.TextField()
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Denormalized from Answer so dashboard cards don't count per question
+    answer_count = models.PositiveIntegerField(default=0)
+    last_answered_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.title} - {self.student.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so a change can be counted on save
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     class Meta:
         verbose_name = "Question"
         verbose_name_plural = "Questions"
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on the mentor dashboard, with and without a status filter
+            models.Index(fields=['-created_at', '-id'], name='question_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='question_status_created_idx'),
+        ]
 
 
 class Answer(models.Model):
@@ -69,3 +86,249 @@ class Answer(models.Model):
         verbose_name_plural = "Answers"
         ordering = ['created_at']
 
+
+
+class CachedTranslation(models.Model):
+    text_hash = models.CharField(max_length=64)
+    language = models.CharField(max_length=20)
+    model_revision = models.CharField(max_length=64)
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.text_hash[:12]} -> {self.language}"
+    
+    class Meta:
+        verbose_name = "Cached Translation"
+        verbose_name_plural = "Cached Translations"
+        constraints = [
+            models.UniqueConstraint(fields=['text_hash', 'language', 'model_revision'], name='unique_cached_translation'),
+        ]
+
+
+class TranslationMemorySegment(models.Model):
+    """One translated sentence, reused exactly or fuzzily by later translations"""
+    source_hash = models.CharField(max_length=64)
+    source_text = models.TextField()
+    language = models.CharField(max_length=20)
+    model_revision = models.CharField(max_length=64)
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.source_text[:40]} -> {self.language}"
+    
+    class Meta:
+        verbose_name = "Translation Memory Segment"
+        verbose_name_plural = "Translation Memory Segments"
+        constraints = [
+            models.UniqueConstraint(fields=['source_hash', 'language', 'model_revision'], name='unique_memory_segment'),
+        ]
+        indexes = [
+            # Workers load the segments other workers added since their last look
+            models.Index(fields=['language', 'model_revision', 'id'], name='memory_segment_sync_idx'),
+        ]
+
+
+class AIAnswerJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='ai_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_jobs')
+    context_prompt = models.TextField(blank=True)
+    # The mentor's own text inside context_prompt; it sets the answer's token budget
+    draft = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"AI answer for: {self.question.title} ({self.status})"
+    
+    @property
+    def wait_seconds(self):
+        if not self.started_at:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+    
+    @property
+    def run_seconds(self):
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+    
+    class Meta:
+        verbose_name = "AI Answer Job"
+        verbose_name_plural = "AI Answer Jobs"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class ContentTranslation(models.Model):
+    FIELD_CHOICES = [
+        ('title', 'Title'),
+        ('content', 'Content'),
+    ]
+    
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True, related_name='translations')
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE, null=True, blank=True, related_name='translations')
+    field = models.CharField(max_length=10, choices=FIELD_CHOICES)
+    language = models.CharField(max_length=20)
+    source_hash = models.CharField(max_length=64)
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        target = f"question {self.question_id}" if self.question_id else f"answer {self.answer_id}"
+        return f"{target} {self.field} -> {self.language}"
+    
+    class Meta:
+        verbose_name = "Content Translation"
+        verbose_name_plural = "Content Translations"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['question', 'field', 'language'],
+                condition=models.Q(answer__isnull=True),
+                name='unique_question_translation'
+            ),
+            models.UniqueConstraint(
+                fields=['answer', 'field', 'language'],
+                condition=models.Q(question__isnull=True),
+                name='unique_answer_translation'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(question__isnull=False, answer__isnull=True) | models.Q(question__isnull=True, answer__isnull=False),
+                name='content_translation_single_target'
+            ),
+        ]
+
+
+class DashboardStats(models.Model):
+    # Single row (pk=1) kept up to date as questions and answers change
+    total_questions = models.IntegerField(default=0)
+    pending_questions = models.IntegerField(default=0)
+    answered_questions = models.IntegerField(default=0)
+    closed_questions = models.IntegerField(default=0)
+    active_students = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.total_questions} questions, {self.active_students} students"
+    
+    class Meta:
+        verbose_name = "Dashboard Stats"
+        verbose_name_plural = "Dashboard Stats"
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_role(sender, instance, **kwargs):
+    """Sessions hold the user's role; make them re-read it after a change"""
+    from .roles import invalidate_user_role
+    invalidate_user_role(instance.user_id)
+
+
+@receiver(post_save, sender=Question)
+def count_question_save(sender, instance, created, raw=False, **kwargs):
+    """Keep the dashboard counters in step with new questions and status changes"""
+    if raw:
+        return
+    from .stats import question_created, question_status_changed
+    if created:
+        question_created(instance)
+    else:
+        old_status = getattr(instance, '_loaded_status', None)
+        if old_status and old_status != instance.status:
+            question_status_changed(old_status, instance.status)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Question)
+def count_question_delete(sender, instance, **kwargs):
+    from .stats import question_deleted
+    question_deleted(instance)
+
+
+@receiver(post_save, sender=Answer)
+def count_answer_save(sender, instance, created, raw=False, **kwargs):
+    """Bump the question's denormalized answer count"""
+    if created and not raw:
+        from .stats import answer_created
+        answer_created(instance)
+
+
+@receiver(post_delete, sender=Answer)
+def count_answer_delete(sender, instance, **kwargs):
+    from .stats import answer_deleted
+    answer_deleted(instance)
+
+
+@receiver(post_save, sender=Question)
+def index_question_save(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Keep the full-text search entry of a question current"""
+    if raw:
+        return
+    # Status and counter updates don't change the indexed text
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    from .search import index_question
+    index_question(instance, created=created)
+
+
+@receiver(post_delete, sender=Question)
+def index_question_delete(sender, instance, **kwargs):
+    from .search import remove_question
+    remove_question(instance.id)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def index_answer_change(sender, instance, raw=False, **kwargs):
+    """Answers are indexed with their question"""
+    if raw:
+        return
+    from .search import index_question
+    if Answer.question.is_cached(instance):
+        question = instance.question
+    else:
+        question = Question.objects.filter(id=instance.question_id).first()
+    if question is not None:
+        index_question(question)
+
+
+@receiver(post_save, sender=Question)
+def embed_question_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Queue a fresh embedding for duplicate detection when the question text changes"""
+    if raw:
+        return
+    if update_fields is not None and not {'title', 'content'} & set(update_fields):
+        return
+    from .embeddings import queue_embedding
+    queue_embedding(instance)
+
+
+@receiver(post_delete, sender=Question)
+def embed_question_delete(sender, instance, **kwargs):
+    from .embeddings import remove_embedding
+    remove_embedding(instance)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+def pretranslate_on_save(sender, instance, raw=False, **kwargs):
+    """Drop stale translations and queue fresh ones when a question or answer is saved"""
+    if raw:
+        return
+    from .pretranslation import queue_pretranslation
+    queue_pretranslation(instance)
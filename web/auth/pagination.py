@@ -0,0 +1,41 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(obj):
+    """Opaque cursor pointing just after obj in (-created_at, -id) order"""
+    raw = f"{obj.created_at.isoformat()}|{obj.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, obj_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(obj_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, cursor, page_size):
+    """One page of newest-first rows after the cursor, plus the cursor for the next page.
+
+    Unlike OFFSET pagination, the database seeks straight to the cursor
+    through the (created_at, id) index, so deep pages cost the same as the
+    first one and rows inserted meanwhile don't shift the pages.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, obj_id = position
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=obj_id))
+
+    # One extra row tells us whether there is a next page without a COUNT
+    rows = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -0,0 +1,95 @@
+import copy
+import threading
+
+
+# Stand-in for the request text when rendering a prompt template to find its shared prefix
+PROMPT_MARKER = "\ue000"
+
+
+class PrefixCache:
+    """Pre-computed KV caches for prompt prefixes shared by many requests.
+
+    The system message and instruction template are identical for every
+    translation or answer, so their keys/values are computed once per model
+    load. A request whose tokens start with a known prefix gets a copy of
+    that cache and only prefills its own text.
+    """
+
+    def __init__(self, min_tokens=8):
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._model = None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _reset_for(self, model):
+        """Drop entries computed by a previous model; must hold the lock"""
+        if self._model is not model:
+            self._model = model
+            self._entries = {}
+
+    def add(self, model, tokenizer, device, prefix_text):
+        """Compute and keep the KV cache for a prefix (no-op if already known)"""
+        with self._lock:
+            self._reset_for(model)
+            if prefix_text in self._entries:
+                return
+
+            import torch
+            from transformers import DynamicCache
+
+            prefix_ids = tokenizer(prefix_text, return_tensors="pt").input_ids.to(device)
+            with torch.inference_mode():
+                past_key_values = model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            self._entries[prefix_text] = (prefix_ids[0].tolist(), past_key_values)
+
+    def add_template(self, model, tokenizer, device, prompt):
+        """Cache everything in a rendered prompt that comes before PROMPT_MARKER"""
+        prefix_text = prompt.split(PROMPT_MARKER)[0]
+        if prefix_text != prompt:
+            self.add(model, tokenizer, device, prefix_text)
+
+    def match(self, model, input_ids):
+        """Return a private cache copy covering the longest shared prefix of input_ids, or None"""
+        ids = input_ids[0].tolist()
+        best_length, best_cache = 0, None
+
+        with self._lock:
+            if self._model is not model:
+                self.misses += 1
+                return None
+            for prefix_ids, past_key_values in self._entries.values():
+                # Token boundaries may differ where the prefix meets the request text
+                length = 0
+                for a, b in zip(prefix_ids, ids):
+                    if a != b:
+                        break
+                    length += 1
+                if length > best_length:
+                    best_length, best_cache = length, past_key_values
+
+            # generate needs at least one uncached token to start from
+            best_length = min(best_length, len(ids) - 1)
+            if best_cache is None or best_length < self.min_tokens:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        # Stored caches are never mutated, so copying outside the lock is safe
+        past_key_values = copy.deepcopy(best_cache)
+        extra_tokens = past_key_values.get_seq_length() - best_length
+        if extra_tokens:
+            past_key_values.crop(-extra_tokens)
+        return past_key_values
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prefixes": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+prefix_cache = PrefixCache()
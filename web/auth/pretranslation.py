@@ -0,0 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Answer, ContentTranslation, Question
+from .translation_cache import normalize_text, text_hash
+
+
+# Content is written in English, which the pages show untranslated
+SOURCE_LANGUAGE = 'english'
+TARGET_LANGUAGES = ['chinese', 'japanese', 'hindi']
+
+# One background thread so pre-translation never competes with itself for the model
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pretranslate")
+
+
+def translatable_fields(instance):
+    """Map of field name to source text for a question or answer"""
+    if isinstance(instance, Question):
+        return {'title': instance.title, 'content': instance.content}
+    return {'content': instance.content}
+
+
+def translations_of(instance):
+    if isinstance(instance, Question):
+        return ContentTranslation.objects.filter(question=instance)
+    return ContentTranslation.objects.filter(answer=instance)
+
+
+def invalidate_stale_translations(instance):
+    """Delete translations of text that has since been edited; returns the fresh ones"""
+    sources = translatable_fields(instance)
+    fresh = set()
+    stale_ids = []
+    for translation_id, field, language, source_hash in translations_of(instance).values_list('id', 'field', 'language', 'source_hash'):
+        if field in sources and source_hash == text_hash(sources[field]):
+            fresh.add((field, language))
+        else:
+            stale_ids.append(translation_id)
+    if stale_ids:
+        ContentTranslation.objects.filter(id__in=stale_ids).delete()
+    return fresh
+
+
+def queue_pretranslation(instance):
+    """Invalidate stale translations now and translate what is missing after commit"""
+    if not settings.PRETRANSLATE_ON_SAVE:
+        return
+    
+    sources = translatable_fields(instance)
+    fresh = invalidate_stale_translations(instance)
+    missing = [
+        (field, language)
+        for field, text in sources.items() if text.strip()
+        for language in TARGET_LANGUAGES if (field, language) not in fresh
+    ]
+    if not missing:
+        # e.g. only the status changed
+        return
+    
+    model_class, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _executor.submit(pretranslate, model_class, pk))
+
+
+def pretranslate(model_class, pk):
+    """Translate a saved question or answer into every target language and store the results"""
+    # Imported here so the worker shares the resident model and schedulers
+    from .views import translate_texts_with_qwen
+    
+    try:
+        instance = model_class.objects.filter(pk=pk).first()
+        if instance is None:
+            return
+        
+        sources = translatable_fields(instance)
+        fresh = invalidate_stale_translations(instance)
+        target = {'question': instance} if isinstance(instance, Question) else {'answer': instance}
+        
+        for language in TARGET_LANGUAGES:
+            fields = [field for field, text in sources.items() if text.strip() and (field, language) not in fresh]
+            if not fields:
+                continue
+            
+            translations = translate_texts_with_qwen([sources[field] for field in fields], language)
+            for field, translated_text in zip(fields, translations):
+                if not translated_text:
+                    continue
+                # Hashing the text we translated keeps an edit made meanwhile from looking fresh
+                ContentTranslation.objects.update_or_create(
+                    field=field,
+                    language=language,
+                    **target,
+                    defaults={
+                        'source_hash': text_hash(sources[field]),
+                        'translated_text': translated_text
+                    }
+                )
+    except Exception as e:
+        print(f"Pre-translation error: {e}")
+    finally:
+        connection.close()
+
+
+def pretranslated_texts(questions, answers=()):
+    """Fresh stored translations for the given rows as {language: {normalized source text: translation}}"""
+    sources = {}
+    for question in questions:
+        for field, text in translatable_fields(question).items():
+            sources[('question', question.id, field)] = text
+    for answer in answers:
+        sources[('answer', answer.id, 'content')] = answer.content
+    
+    if not sources:
+        return {}
+    
+    rows = ContentTranslation.objects.filter(
+        Q(question__in=[question.id for question in questions]) | Q(answer__in=[answer.id for answer in answers])
+    ).values_list('question_id', 'answer_id', 'field', 'language', 'source_hash', 'translated_text')
+    
+    texts = {}
+    for question_id, answer_id, field, language, source_hash, translated_text in rows:
+        key = ('question', question_id, field) if question_id else ('answer', answer_id, field)
+        text = sources.get(key)
+        if text is not None and source_hash == text_hash(text):
+            texts.setdefault(language, {})[normalize_text(text)] = translated_text
+    return texts
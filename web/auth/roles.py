@@ -0,0 +1,93 @@
+import hmac
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .models import UserProfile
+
+
+SESSION_ROLE_KEY = "_user_role"
+
+
+def role_version_key(user_id):
+    return f"user-role-version:{user_id}"
+
+
+def invalidate_user_role(user_id):
+    """Make every session of this user re-read its role on the next request"""
+    cache.set(role_version_key(user_id), time.time(), None)
+
+
+def remember_user_role(request, role):
+    """Store the role in the session, stamped with the current role version"""
+    request.session[SESSION_ROLE_KEY] = {
+        "role": role,
+        "version": cache.get(role_version_key(request.user.id)),
+        "checked_at": time.time(),
+    }
+    request.user_role = role
+
+
+def resolve_user_role(request):
+    """The user's role from the session, reading UserProfile only when the session copy is stale"""
+    if not request.user.is_authenticated:
+        return None
+
+    stored = request.session.get(SESSION_ROLE_KEY)
+    if (
+        stored
+        and stored.get("version") == cache.get(role_version_key(request.user.id))
+        and time.time() - stored.get("checked_at", 0) < settings.USER_ROLE_MAX_AGE
+    ):
+        return stored["role"]
+
+    role = UserProfile.objects.filter(user=request.user).values_list("role", flat=True).first()
+    remember_user_role(request, role)
+    return role
+
+
+def role_required(role):
+    """Only let logged-in users with the given role through; others go back home"""
+    def decorator(view):
+        @wraps(view)
+        @login_required
+        def wrapper(request, *args, **kwargs):
+            if not hasattr(request, "user_role"):
+                request.user_role = resolve_user_role(request)
+            user_role = request.user_role
+            if user_role is None:
+                messages.error(request, "User profile not found.")
+                return redirect("home")
+            if user_role != role:
+                messages.error(request, f"Access denied. {role.title()} role required.")
+                return redirect("home")
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def can_monitor(request):
+    """True for requests with the monitoring token, from an allowed IP, or by a staff user"""
+    token = settings.MONITORING_TOKEN
+    scheme, _, supplied = request.headers.get("Authorization", "").partition(" ")
+    if token and scheme.lower() == "bearer" and hmac.compare_digest(supplied.encode(), token.encode()):
+        return True
+    if request.META.get("REMOTE_ADDR") in settings.MONITORING_ALLOWED_IPS:
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def monitoring_required(view):
+    """Only let monitoring clients (see can_monitor) through; others get a 403"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not can_monitor(request):
+            return JsonResponse({"error": "Forbidden"}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
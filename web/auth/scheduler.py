@@ -0,0 +1,248 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .cancellation import GenerationCancelled, cancellation_stats, wait_for_result
+from .inference_client import inference_client, remote_inference_enabled
+from .model_registry import registry
+from .prefix_cache import prefix_cache
+from .telemetry import record_generation
+
+
+def sampling_kwargs():
+    """Decoding settings for AI requests; greedy when QWEN_DETERMINISTIC is on"""
+    if settings.QWEN_DETERMINISTIC:
+        return {'do_sample': False}
+    return {'temperature': 0.7, 'do_sample': True}
+
+
+class BatchScheduler:
+    """Collects concurrent prompts and runs them through one batched generate.
+
+    Requests are queued by ``submit``. A single worker thread takes the first
+    waiting prompt, keeps collecting more for up to ``max_wait_ms`` (or until
+    ``max_batch_size`` is reached), left-pads them into one batch and hands
+    each decoded output back to the request that asked for it.
+
+    A prompt submitted with a cancel token is dropped if the token is set
+    while it is still queued, and its row stops decoding if it is set during
+    the generate call; the caller gets GenerationCancelled.
+    """
+
+    def __init__(self, name, max_tokens_setting, max_batch_size=None, max_wait_ms=None, stop_at_newline=False,
+                 **generate_kwargs):
+        self.name = name
+        self.max_tokens_setting = max_tokens_setting
+        self.stop_at_newline = stop_at_newline
+        self._max_batch_size = max_batch_size
+        self._max_wait_ms = max_wait_ms
+        self.generate_kwargs = generate_kwargs
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self.batches_run = 0
+        self.prompts_run = 0
+        # Per-row token counts of the last batch, set by generate for the telemetry
+        # recorded in _run (both only ever run on the worker thread)
+        self.batch_telemetry = None
+
+    @property
+    def max_new_tokens(self):
+        """Budget for prompts submitted without one"""
+        return getattr(settings, self.max_tokens_setting)
+
+    @property
+    def max_batch_size(self):
+        return self._max_batch_size or settings.QWEN_BATCH_MAX_SIZE
+
+    @property
+    def max_wait_ms(self):
+        if self._max_wait_ms is not None:
+            return self._max_wait_ms
+        return settings.QWEN_BATCH_WAIT_MS
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"qwen-{self.name}-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, prompt, timeout=None, max_new_tokens=None, cancel=None):
+        """Queue a chat-formatted prompt and block until its output is ready"""
+        if remote_inference_enabled():
+            # The inference server's scheduler batches prompts from every web worker
+            return inference_client.generate(self.name, [prompt], [max_new_tokens or self.max_new_tokens], [cancel], timeout)[0]
+        future = Future()
+        self._queue.put((prompt, max_new_tokens or self.max_new_tokens, cancel, future, time.monotonic()))
+        self._ensure_worker()
+        try:
+            return wait_for_result(future, cancel, timeout)
+        except FutureTimeout:
+            # Drop it from the batch if the worker hasn't picked it up yet
+            future.cancel()
+            raise
+
+    def submit_many(self, prompts, timeout=None, max_new_tokens=None, cancel=None):
+        """Queue several prompts at once so they can share batches.
+
+        max_new_tokens is one budget per prompt and cancel one token (or None) per prompt.
+        """
+        budgets = max_new_tokens or [self.max_new_tokens] * len(prompts)
+        cancels = cancel or [None] * len(prompts)
+        if remote_inference_enabled():
+            return inference_client.generate(self.name, prompts, budgets, cancels, timeout)
+        futures = []
+        for prompt, budget, prompt_cancel in zip(prompts, budgets, cancels):
+            future = Future()
+            self._queue.put((prompt, budget, prompt_cancel, future, time.monotonic()))
+            futures.append(future)
+        self._ensure_worker()
+        try:
+            return [wait_for_result(future, prompt_cancel, timeout) for future, prompt_cancel in zip(futures, cancels)]
+        except (FutureTimeout, GenerationCancelled):
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _collect(self):
+        """Wait for one prompt, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Skip requests whose caller has already given up
+            running = []
+            for prompt, budget, cancel, future, enqueued_at in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if cancel is not None and cancel.cancelled:
+                    future.set_exception(GenerationCancelled(cancel.reason))
+                    continue
+                running.append((prompt, budget, cancel, future, enqueued_at))
+            batch = running
+            if not batch:
+                continue
+            started = time.monotonic()
+            self.batch_telemetry = None
+            try:
+                outputs = self.generate(
+                    [prompt for prompt, _, _, _, _ in batch],
+                    [budget for _, budget, _, _, _ in batch],
+                    [cancel for _, _, cancel, _, _ in batch]
+                )
+            except Exception as e:
+                print(f"Batched generation error ({self.name}): {e}")
+                self._record_batch(batch, started, failed=True)
+                for _, _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            self._record_batch(batch, started)
+            for (_, _, cancel, future, _), output in zip(batch, outputs):
+                if cancel is not None and cancel.cancelled:
+                    # The row was cut short; its partial output must not be used
+                    future.set_exception(GenerationCancelled(cancel.reason))
+                else:
+                    future.set_result(output)
+
+    def _record_batch(self, batch, started, failed=False):
+        """Telemetry for each prompt of a finished batch (see auth/telemetry.py)"""
+        duration = time.monotonic() - started
+        rows = self.batch_telemetry or [{}] * len(batch)
+        for (_, _, cancel, _, enqueued_at), row in zip(batch, rows):
+            if failed:
+                outcome = "failed"
+            elif cancel is not None and cancel.cancelled:
+                outcome = "cancelled"
+            else:
+                outcome = "ok"
+            record_generation(
+                self.name, outcome, queue_wait=started - enqueued_at, duration=duration, batch_size=len(batch), **row
+            )
+
+    def generate(self, prompts, budgets=None, cancels=None):
+        """Run one left-padded generate call over a list of prompts, each with its own token budget.
+
+        Rows whose cancel token is set stop at the next decoding step.
+        """
+        import torch
+
+        from .generation_limits import CancelledRows, FirstTokenTime, RowTokenBudget, StopAtNewline
+
+        first_token = FirstTokenTime()
+
+        model, tokenizer, device = registry.get()
+        if not model or not tokenizer:
+            return [None] * len(prompts)
+
+        model_inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(device)
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+        budgets = budgets or [self.max_new_tokens] * len(prompts)
+        generate_kwargs = {**sampling_kwargs(), **self.generate_kwargs}
+
+        # generate takes a single max_new_tokens; shorter budgets end their rows early
+        stopping_criteria = [first_token]
+        if min(budgets) < max(budgets):
+            stopping_criteria.append(RowTokenBudget(model_inputs.input_ids.shape[1], budgets))
+        if self.stop_at_newline:
+            stopping_criteria.append(StopAtNewline(tokenizer, [True] * len(prompts)))
+        if cancels and any(cancel is not None for cancel in cancels):
+            stopping_criteria.append(CancelledRows(cancels))
+        generate_kwargs['stopping_criteria'] = stopping_criteria
+        prefix_cache_hit = None
+        if len(prompts) == 1:
+            # Left padding shifts the shared prefix in multi-prompt batches, so only
+            # single prompts can start from a pre-computed prefix cache
+            past_key_values = prefix_cache.match(model, model_inputs.input_ids)
+            prefix_cache_hit = past_key_values is not None
+            if past_key_values is not None:
+                generate_kwargs['past_key_values'] = past_key_values
+
+        with torch.inference_mode():
+            generated_ids = model.generate(
+                model_inputs.input_ids,
+                attention_mask=model_inputs.attention_mask,
+                max_new_tokens=max(budgets),
+                pad_token_id=pad_token_id,
+                **generate_kwargs
+            )
+
+        # Every row is left-padded to the same width, so the new tokens start at the same offset
+        output_ids = generated_ids[:, model_inputs.input_ids.shape[1]:]
+        new_tokens = (output_ids != pad_token_id).sum(dim=1).tolist()
+        self.batch_telemetry = [
+            {"prompt_length": prompt_length, "new_tokens": generated, "first_token": first_token.seconds,
+             "prefix_cache_hit": prefix_cache_hit}
+            for prompt_length, generated in zip(model_inputs.attention_mask.sum(dim=1).tolist(), new_tokens)
+        ]
+
+        for row, cancel in enumerate(cancels or []):
+            if cancel is not None and cancel.cancelled:
+                cancellation_stats.record_stopped_row(new_tokens[row], budgets[row])
+                print(f"Generation cancelled ({self.name}): row stopped after {new_tokens[row]} of {budgets[row]} tokens")
+
+        self.batches_run += 1
+        self.prompts_run += len(prompts)
+        return [text.strip() for text in tokenizer.batch_decode(output_ids, skip_special_tokens=True)]
+
+
+# Separate queues so short translations never wait behind long answer generations.
+# Translations are submitted one sentence at a time, so their output is one line
+translation_scheduler = BatchScheduler("translation", "QWEN_TRANSLATION_MAX_TOKENS", stop_at_newline=True)
+answer_scheduler = BatchScheduler("answer", "QWEN_ANSWER_MAX_TOKENS")
@@ -0,0 +1,153 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Answer, Question
+
+
+# SQLite: FTS5 virtual table keyed by question id (rowid).
+# Postgres: a tsvector per question with a GIN index.
+SEARCH_TABLE = "custom_auth_question_search"
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, content, answers, tokenize = 'unicode61 remove_diacritics 2')",
+]
+POSTGRES_CREATE = [
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "question_id bigint PRIMARY KEY REFERENCES custom_auth_question (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+]
+DROP = [f"DROP TABLE IF EXISTS {SEARCH_TABLE}"]
+
+# Title matches count most, then the question body, then its answers
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', %s), 'A') || "
+    "setweight(to_tsvector('simple', %s), 'B') || "
+    "setweight(to_tsvector('simple', %s), 'C')"
+)
+
+
+def create_search_table(schema_editor):
+    statements = POSTGRES_CREATE if schema_editor.connection.vendor == "postgresql" else SQLITE_CREATE
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_table(schema_editor):
+    for statement in DROP:
+        schema_editor.execute(statement)
+
+
+def question_document(question):
+    """(title, content, answers) text indexed for a question"""
+    answers = "\n".join(Answer.objects.filter(question_id=question.id).values_list("content", flat=True))
+    return question.title, question.content, answers
+
+
+def index_question(question, created=False):
+    """Replace the search entry of one question (called whenever it or its answers change)"""
+    if created:
+        # A new question has no answers and no entry to replace yet
+        _insert_rows([(question.id, question.title, question.content, "")])
+        return
+    title, content, answers = question_document(question)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (question_id, document) VALUES (%s, {POSTGRES_DOCUMENT}) "
+                "ON CONFLICT (question_id) DO UPDATE SET document = EXCLUDED.document",
+                [question.id, title, content, answers]
+            )
+        else:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [question.id])
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, answers) VALUES (%s, %s, %s, %s)",
+                [question.id, title, content, answers]
+            )
+
+
+def remove_question(question_id):
+    with connection.cursor() as cursor:
+        column = "question_id" if connection.vendor == "postgresql" else "rowid"
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} = %s", [question_id])
+
+
+@transaction.atomic
+def rebuild_search_index(batch_size=1000):
+    """Re-index every question, e.g. after bulk imports that bypass signals; returns the row count"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    answers = {}
+    for question_id, content in Answer.objects.order_by("question_id", "created_at").values_list("question_id", "content"):
+        answers.setdefault(question_id, []).append(content)
+
+    count = 0
+    rows = []
+    for question_id, title, content in Question.objects.order_by("id").values_list("id", "title", "content").iterator(chunk_size=batch_size):
+        rows.append((question_id, title, content, "\n".join(answers.get(question_id, []))))
+        if len(rows) >= batch_size:
+            count += _insert_rows(rows)
+            rows = []
+    if rows:
+        count += _insert_rows(rows)
+    return count
+
+
+def _insert_rows(rows):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (question_id, document) VALUES (%s, {POSTGRES_DOCUMENT})", rows
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, content, answers) VALUES (%s, %s, %s, %s)", rows
+            )
+    return len(rows)
+
+
+def fts_query(query):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix"""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_question_ids(query, page=1, page_size=20):
+    """Ranked question ids for one page of results, and whether there is a next page"""
+    offset = (page - 1) * page_size
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            if not query.strip():
+                return [], False
+            cursor.execute(
+                f"SELECT question_id FROM {SEARCH_TABLE}, websearch_to_tsquery('simple', %s) AS query "
+                "WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, question_id DESC "
+                "LIMIT %s OFFSET %s",
+                [query, page_size + 1, offset]
+            )
+        else:
+            match = fts_query(query)
+            if not match:
+                return [], False
+            # bm25 is lower-is-better; weights follow the column order (title, content, answers)
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY bm25({SEARCH_TABLE}, 10.0, 4.0, 1.0), rowid DESC LIMIT %s OFFSET %s",
+                [match, page_size + 1, offset]
+            )
+        ids = [row[0] for row in cursor.fetchall()]
+    return ids[:page_size], len(ids) > page_size
+
+
+def search_questions(query, page=1, page_size=20):
+    """One page of ranked Question objects matching the query"""
+    ids, has_next = search_question_ids(query, page, page_size)
+    questions = Question.objects.select_related("student").in_bulk(ids)
+    return [questions[question_id] for question_id in ids if question_id in questions], has_next
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import Future
+
+from .cancellation import SharedCancellation, wait_for_result
+
+
+class SingleFlight:
+    """Coalesces identical AI requests that are in flight at the same time.
+
+    The first caller for a key (the leader) runs the computation; anyone who
+    asks for the same key before it finishes waits on the leader's future
+    instead of starting a second generation. Keys are forgotten as soon as
+    the result is delivered, so this is not a cache.
+
+    Each caller may bring a cancel token; the generation is only cancelled
+    once every caller waiting on it has cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cancellations = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def claim(self, key, cancel=None):
+        """Return (future, is_leader); the leader must call ``finish`` for the key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._cancellations[key].join(cancel)
+                self.followers += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._cancellations[key] = SharedCancellation()
+            self._cancellations[key].join(cancel)
+            self.leaders += 1
+            return future, True
+
+    def cancellation(self, key):
+        """The cancellation the leader should generate with: set once every caller for the key has cancelled"""
+        with self._lock:
+            return self._cancellations.get(key)
+
+    def finish(self, key, result=None, error=None):
+        """Deliver the leader's result (or exception) to every waiter"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+            self._cancellations.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, cancel=None, **kwargs):
+        """Run fn once per key among concurrent callers and share its result.
+
+        fn is called with ``cancel=`` the shared cancellation of the key.
+        """
+        future, leader = self.claim(key, cancel)
+        if not leader:
+            return wait_for_result(future, cancel)
+        try:
+            result = fn(*args, cancel=self.cancellation(key), **kwargs)
+        except Exception as e:
+            self.finish(key, error=e)
+            raise
+        self.finish(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.followers,
+            }
+
+
+ai_requests = SingleFlight()
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Answer, DashboardStats, Question
+
+
+STATUS_FIELDS = {
+    'pending': 'pending_questions',
+    'answered': 'answered_questions',
+    'closed': 'closed_questions',
+}
+
+
+def adjust_dashboard_stats(values=None, **deltas):
+    """Apply counter deltas (and absolute values) with a single UPDATE, creating the row on first use"""
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    updates.update(values or {})
+    if not updates:
+        return
+    if not DashboardStats.objects.filter(pk=1).update(updated_at=timezone.now(), **updates):
+        # No stats row yet; counting from scratch already includes this change
+        rebuild_dashboard_stats()
+
+
+def question_created(question):
+    deltas = {'total_questions': 1, STATUS_FIELDS.get(question.status, ''): 1}
+    if not Question.objects.filter(student_id=question.student_id).exclude(pk=question.pk).exists():
+        deltas['active_students'] = 1
+    deltas.pop('', None)
+    adjust_dashboard_stats(**deltas)
+
+
+def question_status_changed(old_status, new_status):
+    deltas = {}
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] = -1
+    if new_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[new_status]] = 1
+    adjust_dashboard_stats(**deltas)
+
+
+def question_deleted(question):
+    # Counts the status the row had when it was loaded, in case it was changed in memory
+    status = getattr(question, '_loaded_status', None) or question.status
+    deltas = {'total_questions': -1, STATUS_FIELDS.get(status, ''): -1}
+    deltas.pop('', None)
+    # A bulk delete signals every row after all of them are gone, so a
+    # "was this the student's last question" check would count a student
+    # once per deleted question; recount instead (deletes are rare)
+    active_students = Question.objects.values('student').distinct().count()
+    adjust_dashboard_stats(values={'active_students': active_students}, **deltas)
+
+
+def answer_created(answer):
+    Question.objects.filter(pk=answer.question_id).update(
+        answer_count=F('answer_count') + 1,
+        last_answered_at=answer.created_at
+    )
+
+
+def answer_deleted(answer):
+    latest = Answer.objects.filter(question=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    Question.objects.filter(pk=answer.question_id, answer_count__gt=0).update(
+        answer_count=F('answer_count') - 1,
+        last_answered_at=Subquery(latest)
+    )
+
+
+def get_dashboard_stats():
+    """The stats row, computed from scratch the first time it is needed"""
+    return DashboardStats.objects.filter(pk=1).first() or rebuild_dashboard_stats()
+
+
+@transaction.atomic
+def rebuild_dashboard_stats():
+    """Recount the dashboard stats from the Question table"""
+    counts = Question.objects.aggregate(
+        total_questions=Count('id'),
+        pending_questions=Count('id', filter=Q(status='pending')),
+        answered_questions=Count('id', filter=Q(status='answered')),
+        closed_questions=Count('id', filter=Q(status='closed')),
+        active_students=Count('student', distinct=True)
+    )
+    stats, _ = DashboardStats.objects.update_or_create(pk=1, defaults=counts)
+    return stats
+
+
+@transaction.atomic
+def rebuild_answer_counts():
+    """Recount answer_count/last_answered_at for every question; returns how many had drifted"""
+    drifted = Question.objects.annotate(
+        real_count=Count('answers'),
+        real_last=Max('answers__created_at')
+    ).exclude(
+        Q(answer_count=F('real_count')) & (Q(last_answered_at=F('real_last')) | Q(last_answered_at__isnull=True, real_last__isnull=True))
+    ).count()
+
+    answers = Answer.objects.filter(question=OuterRef('pk')).values('question')
+    Question.objects.update(
+        answer_count=Coalesce(Subquery(answers.annotate(count=Count('id')).values('count')), 0),
+        last_answered_at=Subquery(answers.annotate(latest=Max('created_at')).values('latest'))
+    )
+    return drifted
@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+
+from .cancellation import CancelToken
+from .generation_limits import CancelledRows, FirstTokenTime
+from .inference_client import inference_client, remote_inference_enabled
+from .model_registry import registry
+from .prefix_cache import prefix_cache
+from .assisted_decoding import prompt_lookup_generate, eos_token_ids
+from .telemetry import record_generation
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event carrying a JSON payload"""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+def stream_generate(prompt, max_new_tokens, prompt_lookup=False, cancel=None, **generate_kwargs):
+    """Yield decoded text chunks as the model produces them.
+
+    ``generate`` (or greedy prompt-lookup decoding) runs on a background
+    thread and pushes tokens into a ``TextIteratorStreamer``, which this
+    generator drains. Decoding stops once ``cancel`` is set, or when this
+    generator is closed before the end (the response was abandoned).
+    """
+    if cancel is None:
+        cancel = CancelToken()
+    if remote_inference_enabled():
+        yield from inference_client.stream(prompt, max_new_tokens, prompt_lookup, generate_kwargs, cancel)
+        return
+    import torch
+    from transformers import TextIteratorStreamer
+
+    model, tokenizer, device = registry.get()
+    if not model or not tokenizer:
+        raise RuntimeError("AI model is not available")
+
+    model_inputs = tokenizer([prompt], return_tensors="pt").to(device)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    past_key_values = prefix_cache.match(model, model_inputs.input_ids)
+    if past_key_values is not None:
+        generate_kwargs['past_key_values'] = past_key_values
+
+    errors = []
+    prompt_length = model_inputs.input_ids.shape[1]
+
+    def run():
+        started = time.monotonic()
+        first_token = FirstTokenTime()
+        outcome = "failed"
+        new_tokens = first_token_seconds = None
+        try:
+            if prompt_lookup:
+                new_ids, stats = prompt_lookup_generate(
+                    model,
+                    model_inputs.input_ids,
+                    max_new_tokens,
+                    eos_token_ids(model, tokenizer),
+                    past_key_values=generate_kwargs.get('past_key_values'),
+                    streamer=streamer,
+                    cancel=cancel
+                )
+                new_tokens, first_token_seconds = len(new_ids), stats["first_token_seconds"]
+            else:
+                with torch.inference_mode():
+                    generated_ids = model.generate(
+                        model_inputs.input_ids,
+                        attention_mask=model_inputs.attention_mask,
+                        max_new_tokens=max_new_tokens,
+                        pad_token_id=pad_token_id,
+                        streamer=streamer,
+                        stopping_criteria=[CancelledRows([cancel]), first_token],
+                        **generate_kwargs
+                    )
+                new_tokens, first_token_seconds = generated_ids.shape[1] - prompt_length, first_token.seconds
+            outcome = "cancelled" if cancel.cancelled else "ok"
+        except Exception as e:
+            errors.append(e)
+            # Unblock the consumer waiting on the streamer
+            streamer.end()
+        finally:
+            record_generation(
+                "stream",
+                outcome,
+                prompt_length=prompt_length,
+                new_tokens=new_tokens,
+                first_token=first_token_seconds,
+                duration=time.monotonic() - started,
+                prefix_cache_hit=past_key_values is not None
+            )
+
+    thread = threading.Thread(target=run, name="qwen-stream", daemon=True)
+    thread.start()
+
+    finished = False
+    try:
+        for chunk in streamer:
+            if chunk:
+                yield chunk
+        finished = True
+    finally:
+        if not finished:
+            cancel.cancel("disconnect")
+
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def sse_stream(chunks, **done_data):
+    """Turn text chunks into SSE frames, ending with a ``done`` or ``error`` event"""
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event({'token': chunk})
+        yield sse_event({'success': True, 'ai_answer': "".join(parts).strip(), **done_data}, event='done')
+    except Exception as e:
+        print(f"AI answer streaming error: {e}")
+        yield sse_event({'success': False, 'error': 'Failed to generate AI answer. Please try again.'}, event='error')
+
+
+async def aiter_sync(iterator, cancel=None):
+    """Drive a blocking iterator from the event loop without blocking it.
+
+    If the consumer stops early (Django cancels the response when the client
+    disconnects) ``cancel`` is set, so the generation behind it stops too.
+    """
+    sentinel = object()
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    finished = False
+    try:
+        while True:
+            chunk = await next_chunk(iterator, sentinel)
+            if chunk is sentinel:
+                break
+            yield chunk
+        finished = True
+    finally:
+        if not finished and cancel is not None:
+            cancel.cancel("disconnect")
@@ -0,0 +1,308 @@
+import json
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+
+logger = logging.getLogger("telemetry")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_families(families):
+    """Prometheus text format for (name, kind, help, samples) families; families without samples are left out.
+
+    Each sample is (sample name, labels dict, value).
+    """
+    lines = []
+    for name, kind, help_text, samples in families:
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def family(name, kind, help_text, values):
+    """A family whose samples are [(labels dict, value)] read from existing stats at scrape time"""
+    return name, kind, help_text, [(name, labels, value) for labels, value in values]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # {label values: [count per bucket (not cumulative), sum, count]}
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        samples = []
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, count))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Counters and histograms recorded in this process, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def families(self):
+        return [(metric.name, metric.kind, metric.help_text, metric.samples()) for metric in self._metrics]
+
+    def render(self):
+        return render_families(self.families())
+
+
+metrics = MetricsRegistry()
+
+generations = metrics.counter(
+    "ai_generations_total", "Model generations by operation and outcome (ok, cancelled, failed)", ["operation", "outcome"]
+)
+queue_wait_seconds = metrics.histogram(
+    "ai_queue_wait_seconds", "Time a prompt waited in a batch queue before its generation started", ["operation"]
+)
+prompt_tokens = metrics.histogram("ai_prompt_tokens", "Prompt length of each generation", ["operation"], TOKEN_BUCKETS)
+generated_tokens = metrics.histogram("ai_generated_tokens", "Tokens produced by each generation", ["operation"], TOKEN_BUCKETS)
+first_token_seconds = metrics.histogram(
+    "ai_time_to_first_token_seconds", "Time from the start of a generation to its first new token", ["operation"]
+)
+generation_seconds = metrics.histogram("ai_generation_seconds", "Duration of each generation", ["operation"])
+tokens_per_second = metrics.histogram(
+    "ai_tokens_per_second", "Decoding speed of each generation", ["operation"], RATE_BUCKETS
+)
+ai_errors = metrics.counter("ai_errors_total", "AI calls that failed with an error", ["operation"])
+view_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Latency of the instrumented views", ["view", "method", "status"]
+)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def log_event(event, **fields):
+    """Write one telemetry record to the "telemetry" logger as a single JSON line"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False))
+
+
+def record_generation(operation, outcome, prompt_length=None, new_tokens=None, queue_wait=None,
+                      first_token=None, duration=None, prefix_cache_hit=None, batch_size=None):
+    """Record one generation (one prompt, even in a batch) in the metrics and the JSON log"""
+    generations.inc(operation=operation, outcome=outcome)
+    if queue_wait is not None:
+        queue_wait_seconds.observe(queue_wait, operation=operation)
+    if prompt_length is not None:
+        prompt_tokens.observe(prompt_length, operation=operation)
+    if new_tokens is not None:
+        generated_tokens.observe(new_tokens, operation=operation)
+    if first_token is not None:
+        first_token_seconds.observe(first_token, operation=operation)
+    rate = None
+    if duration is not None:
+        generation_seconds.observe(duration, operation=operation)
+        if new_tokens and duration > 0:
+            rate = new_tokens / duration
+            tokens_per_second.observe(rate, operation=operation)
+
+    log_event(
+        "generation",
+        operation=operation,
+        outcome=outcome,
+        batch_size=batch_size,
+        queue_wait_ms=_ms(queue_wait),
+        prompt_tokens=prompt_length,
+        generated_tokens=new_tokens,
+        time_to_first_token_ms=_ms(first_token),
+        duration_ms=_ms(duration),
+        tokens_per_second=None if rate is None else round(rate, 2),
+        prefix_cache_hit=prefix_cache_hit,
+    )
+
+
+def record_error(operation, error):
+    """Count a failed AI call and log it"""
+    ai_errors.inc(operation=operation)
+    log_event("ai_error", operation=operation, error_type=type(error).__name__, error=str(error))
+
+
+def timed_view(name):
+    """Record a view's latency in http_request_duration_seconds and the JSON log"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = view(request, *args, **kwargs)
+                status = response.status_code
+                return response
+            finally:
+                duration = time.perf_counter() - started
+                view_seconds.observe(duration, view=name, method=request.method, status=status)
+                log_event("request", view=name, method=request.method, status=status, duration_ms=_ms(duration))
+        return wrapper
+    return decorator
+
+
+def request_families():
+    """Families read from the stats of the web process (caches in front of the model, cancelled requests)"""
+    from .cancellation import cancellation_stats
+    from .single_flight import ai_requests
+    from .translation_cache import translation_cache
+    from .translation_memory import translation_memory
+
+    cache = translation_cache.stats()
+    memory = translation_memory.stats()
+    coalesced = ai_requests.stats()
+    return [
+        family("ai_translation_cache_lookups_total", "counter", "Translation cache lookups by result", [
+            ({"result": "memory_hit"}, cache["memory_hits"]),
+            ({"result": "db_hit"}, cache["db_hits"]),
+            ({"result": "miss"}, cache["misses"]),
+        ]),
+        family("ai_translation_memory_lookups_total", "counter", "Translation memory sentence lookups by result", [
+            ({"result": "exact_hit"}, memory["exact_hits"]),
+            ({"result": "fuzzy_hit"}, memory["fuzzy_hits"]),
+            ({"result": "miss"}, memory["misses"]),
+        ]),
+        family("ai_coalesced_requests_total", "counter", "Requests that waited for an identical generation already running", [
+            ({}, coalesced["coalesced"]),
+        ]),
+        family("ai_cancelled_requests_total", "counter", "AI requests whose caller went away, by reason", [
+            ({"reason": reason}, count) for reason, count in sorted(cancellation_stats.snapshot()["requests"].items())
+        ]),
+    ]
+
+
+def model_families():
+    """Families read from the stats of the process that runs the model (this one or the inference server)"""
+    from .assisted_decoding import prompt_lookup_stats
+    from .cancellation import cancellation_stats
+    from .model_registry import registry
+    from .prefix_cache import prefix_cache
+    from .scheduler import answer_scheduler, translation_scheduler
+
+    prefixes = prefix_cache.stats()
+    lookup = prompt_lookup_stats.snapshot()
+    cancellations = cancellation_stats.snapshot()
+    schedulers = (translation_scheduler, answer_scheduler)
+    return [
+        family("ai_model_ready", "gauge", "Whether the model is loaded", [({}, registry.is_ready)]),
+        family("ai_model_load_seconds", "gauge", "Duration of the last model load", [
+            ({}, registry.load_seconds)
+        ] if registry.load_seconds is not None else []),
+        family("ai_prefix_cache_lookups_total", "counter", "Prompt prefix KV cache lookups by result", [
+            ({"result": "hit"}, prefixes["hits"]),
+            ({"result": "miss"}, prefixes["misses"]),
+        ]),
+        family("ai_batches_total", "counter", "Batched generate calls by queue", [
+            ({"operation": scheduler.name}, scheduler.batches_run) for scheduler in schedulers
+        ]),
+        family("ai_prompt_lookup_draft_tokens_total", "counter", "Prompt-lookup draft tokens by result", [
+            ({"result": "accepted"}, lookup["accepted_tokens"]),
+            ({"result": "rejected"}, lookup["drafted_tokens"] - lookup["accepted_tokens"]),
+        ]),
+        family("ai_stopped_generations_total", "counter", "Generations stopped early because their caller went away", [
+            ({}, cancellations["stopped_generations"]),
+        ]),
+        family("ai_skipped_tokens_total", "counter", "Token budget left unused by stopped generations", [
+            ({}, cancellations["tokens_skipped"]),
+        ]),
+    ]
+
+
+def render_metrics(model=True, requests=True):
+    """Everything recorded in this process, in Prometheus text format.
+
+    A web worker that uses an inference server leaves out the model families
+    (the server reports them); the server leaves out the request families.
+    """
+    families = metrics.families()
+    if requests:
+        families += request_families()
+    if model:
+        families += model_families()
+    return render_families(families)
@@ -10,5 +10,6 @@ def filter_by_status(queryset, status):
 @register.filter
 def unique_students(queryset):
     """Get unique students from questions"""
-    student_ids = queryset.values_list('student', flat=True).distinct()
+    # Clear the default ordering, otherwise created_at joins the DISTINCT
+    student_ids = queryset.order_by().values_list('student', flat=True).distinct()
     return student_ids
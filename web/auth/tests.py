@@ -1,3 +1,2230 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import QuerySet
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .assisted_decoding import find_draft, prompt_lookup_generate
+from .db import apply_sqlite_pragmas
+from .cancellation import CancelToken, GenerationCancelled, cancellation_stats, run_cancellable
+from .embeddings import EmbeddingIndex, question_index
+from .inference_client import InferenceClient
+from .jobs import claim_next_job, run_job
+from .model_registry import ModelRegistry
+from .inference_server import InferenceServer
+from .generation_limits import (
+    CancelledRows, RowTokenBudget, StopAtNewline, answer_token_budget, split_into_chunks, translation_token_budget,
+)
+from .models import (
+    AIAnswerJob, Answer, CachedTranslation, ContentTranslation, DashboardStats, Question, TranslationMemorySegment, UserProfile,
+)
+from .pagination import keyset_page
+from .prefix_cache import PrefixCache
+from .pretranslation import TARGET_LANGUAGES, invalidate_stale_translations, pretranslate, pretranslated_texts
+from .scheduler import BatchScheduler, translation_scheduler
+from .single_flight import SingleFlight, ai_requests
+from .search import rebuild_search_index, search_question_ids
+from .streaming import aiter_sync, sse_stream, stream_generate
+from .stats import rebuild_answer_counts, rebuild_dashboard_stats
+from .translation_cache import TranslationCache, text_hash, translation_cache
+from .translation_memory import levenshtein, safe_to_reuse, segment_text, stitch, translation_memory
+from .telemetry import Counter, Histogram, metrics, render_families
+from .ui_translations import UI_STRINGS, _bundle, _catalog, ui_bundle, ui_catalog
+
+
+# Synthetic dataset size
+STUDENTS = 2000
+MENTORS = 50
+QUESTIONS = 5000
+ANSWERS = 8000
+
+# Timed requests per view after the query-counted one
+TIMED_RUNS = int(os.environ.get("VIEW_BENCHMARK_RUNS", "10"))
+
+REPORT_PATH = os.environ.get("VIEW_BENCHMARK_REPORT", os.path.join(settings.BASE_DIR, "view_benchmark_report.json"))
+
+PASSWORD = "benchmark-password"
+
+# Keep the per-request JSON telemetry lines out of the test output (assertLogs still sees them)
+logging.getLogger("telemetry").setLevel(logging.WARNING)
+
+
+class StubTokenizer:
+    """Just enough of a tokenizer for the prompt builders"""
+
+    pad_token_id = 0
+    eos_token_id = 0
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        return "\n".join(message["content"] for message in messages)
+
+    def __call__(self, text, add_special_tokens=True):
+        # One token per word
+        return SimpleNamespace(input_ids=text.split())
+
+    def decode(self, ids):
+        return " ".join(ids)
+
+
+def stub_generate(scheduler, prompts, budgets=None, cancels=None):
+    """Stands in for the batched model call"""
+    return [f"{scheduler.name} output for prompt of {len(prompt)} chars" for prompt in prompts]
+
+
+def stub_stream_generate(prompt, max_new_tokens, **kwargs):
+    yield from ["Stub ", "streamed ", "answer"]
+
+
+class SharedConnectionExecutor(ThreadPoolExecutor):
+    """Inference executor whose threads use the test's database connection.
+
+    TestCase data sits in a transaction other connections can't see, so the
+    threads borrow the test thread's connection the way LiveServerTestCase's
+    server thread does.
+    """
+
+    def __init__(self):
+        self.shared_connection = connections["default"]
+        self.shared_connection.inc_thread_sharing()
+        super().__init__(max_workers=2, initializer=self._share)
+
+    def _share(self):
+        connections["default"] = self.shared_connection
+
+    def shutdown(self, *args, **kwargs):
+        super().shutdown(*args, **kwargs)
+        self.shared_connection.dec_thread_sharing()
+
+
+def stub_embed_texts(texts, batch_size=16):
+    """Bag-of-words vectors: texts sharing most of their words are close"""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, int(text_hash(word), 16) % 64] += 1
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+def tiny_causal_lm():
+    """A two-layer Qwen2 model with seeded random weights: real attention and KV cache, instant to build"""
+    import torch
+    from transformers import Qwen2Config, Qwen2ForCausalLM
+
+    torch.manual_seed(0)
+    config = Qwen2Config(
+        vocab_size=32, hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, pad_token_id=0, eos_token_id=1
+    )
+    return Qwen2ForCausalLM(config).eval()
+
+
+class IdTokenizer:
+    """Tokenizer for tiny_causal_lm: prompts are space-separated token ids, left-padded with 0"""
+
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def __call__(self, prompts, return_tensors="pt", padding=True):
+        import torch
+
+        rows = [[int(token) for token in prompt.split()] for prompt in prompts]
+        width = max(len(row) for row in rows)
+        return SimpleNamespace(
+            input_ids=torch.tensor([[0] * (width - len(row)) + row for row in rows]),
+            attention_mask=torch.tensor([[0] * (width - len(row)) + [1] * len(row) for row in rows]),
+            to=lambda device: self(prompts),
+        )
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(str(token) for token in ids if token != self.pad_token_id)
+
+    def batch_decode(self, ids, skip_special_tokens=True):
+        return [self.decode(row.tolist(), skip_special_tokens) for row in ids]
+
+
+def seed_dataset():
+    """Bulk-insert users, profiles, questions and answers (signals are bypassed)"""
+    password = make_password(PASSWORD)
+    users = [
+        User(username=f"student{i}", email=f"student{i}@example.com", first_name="Student", password=password)
+        for i in range(STUDENTS)
+    ] + [
+        User(username=f"mentor{i}", email=f"mentor{i}@example.com", first_name="Mentor", password=password)
+        for i in range(MENTORS)
+    ]
+    User.objects.bulk_create(users, batch_size=500)
+    students = list(User.objects.filter(username__startswith="student").order_by("id"))
+    mentors = list(User.objects.filter(username__startswith="mentor").order_by("id"))
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user, role="student") for user in students]
+        + [UserProfile(user=user, role="mentor") for user in mentors],
+        batch_size=500
+    )
+
+    categories = [choice for choice, _ in Question.CATEGORY_CHOICES]
+    Question.objects.bulk_create([
+        Question(
+            student=students[i % STUDENTS],
+            title=f"Question {i} about topic {i % 97}",
+            content=f"Details for question {i}. " * 5,
+            category=categories[i % len(categories)],
+            status="answered" if i % 3 == 0 else "pending",
+        )
+        for i in range(QUESTIONS)
+    ], batch_size=500)
+
+    # Spread created_at so keyset pages have a stable, realistic order
+    now = timezone.now()
+    questions = list(Question.objects.order_by("id"))
+    for i, question in enumerate(questions):
+        question.created_at = now - timedelta(minutes=QUESTIONS - i)
+    Question.objects.bulk_update(questions, ["created_at"], batch_size=500)
+
+    answered = [question for question in questions if question.status == "answered"]
+    Answer.objects.bulk_create([
+        Answer(
+            question=answered[i % len(answered)],
+            mentor=mentors[i % MENTORS],
+            content=f"Answer {i} with some guidance. " * 4,
+        )
+        for i in range(ANSWERS)
+    ], batch_size=500)
+
+    rebuild_answer_counts()
+    rebuild_dashboard_stats()
+    rebuild_search_index()
+    return students, mentors
+
+
+@override_settings(
+    PRETRANSLATE_ON_SAVE=False,
+    EMBED_ON_SAVE=False,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    MENTOR_PAGE_SIZE=20,
+)
+class ViewBudgetTests(TestCase):
+    """Query-count ceilings and render-time percentiles for every view.
+
+    Each view is requested once with queries captured and checked against its
+    budget, then timed over VIEW_BENCHMARK_RUNS more requests. The results of
+    the whole class are written as JSON to VIEW_BENCHMARK_REPORT so runs on
+    different commits can be diffed.
+    """
+
+    results = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        students, mentors = seed_dataset()
+        cls.student = students[0]
+        cls.mentor = mentors[0]
+        cls.question = Question.objects.filter(student=cls.student).first()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # AI endpoints run against a stubbed model: the scheduler, cache and
+        # single-flight code paths are real, only the generate call is faked
+        cls.patchers = [
+            mock.patch("auth.model_registry.ModelRegistry.get", return_value=(object(), StubTokenizer(), "cpu")),
+            mock.patch("auth.model_registry.ModelRegistry.is_ready", new_callable=mock.PropertyMock, return_value=True),
+            mock.patch("auth.scheduler.BatchScheduler.generate", stub_generate),
+            mock.patch("auth.prefix_cache.PrefixCache.add_template"),
+            mock.patch("auth.views.stream_generate", stub_stream_generate),
+            mock.patch("auth.embeddings.embed_texts", stub_embed_texts),
+        ]
+        for patcher in cls.patchers:
+            patcher.start()
+        cls.executor = SharedConnectionExecutor()
+        cls.executor_patcher = mock.patch("auth.cancellation.inference_executor", return_value=cls.executor)
+        cls.executor_patcher.start()
+        cls.embedding_dir = tempfile.TemporaryDirectory()
+        cls.embedding_settings = override_settings(EMBEDDING_INDEX_DIR=cls.embedding_dir.name)
+        cls.embedding_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patcher in cls.patchers:
+            patcher.stop()
+        cls.executor_patcher.stop()
+        cls.executor.shutdown()
+        cls.embedding_settings.disable()
+        cls.embedding_dir.cleanup()
+        super().tearDownClass()
+        cls.write_report()
+
+    @classmethod
+    def write_report(cls):
+        report = {
+            "dataset": {"students": STUDENTS, "mentors": MENTORS, "questions": QUESTIONS, "answers": ANSWERS},
+            "timed_runs": TIMED_RUNS,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "views": dict(sorted(cls.results.items())),
+        }
+        with open(REPORT_PATH, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    def measure(self, name, client, method, path, budget, data=None, content_type=None, expected_status=200):
+        """Check the query budget of one request, then record timings over repeated requests"""
+        kwargs = {}
+        if data is not None:
+            kwargs["data"] = data
+        if content_type:
+            kwargs["content_type"] = content_type
+        send = getattr(client, method)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = send(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        # Read the count now: every later request resets the connection's query log
+        query_count = len(queries)
+        self.assertEqual(response.status_code, expected_status, f"{name}: unexpected status")
+        self.assertLessEqual(
+            query_count, budget,
+            f"{name} ran {query_count} queries (budget {budget}):\n" + "\n".join(q["sql"] for q in queries.captured_queries)
+        )
+
+        timings = []
+        for _ in range(TIMED_RUNS):
+            started = time.perf_counter()
+            response = send(path, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive") if len(timings) > 1 else timings * 99
+        self.results[name] = {
+            "queries": query_count,
+            "query_budget": budget,
+            "p50_ms": round(percentiles[49], 2),
+            "p95_ms": round(percentiles[94], 2),
+            "p99_ms": round(percentiles[98], 2),
+            "max_ms": round(max(timings), 2) if timings else None,
+        }
+        return response
+
+    def logged_in_client(self, user):
+        client = Client()
+        client.force_login(user)
+        # First request stores the role in the session; budgets are for the steady state
+        client.get("/about/")
+        return client
+
+    def mentor_client(self):
+        return self.logged_in_client(self.mentor)
+
+    def student_client(self):
+        return self.logged_in_client(self.student)
+
+    def test_home(self):
+        self.measure("home_anonymous", Client(), "get", "/", budget=0)
+        self.measure("home_authenticated", self.student_client(), "get", "/", budget=2)
+
+    def test_about(self):
+        self.measure("about", self.student_client(), "get", "/about/", budget=2)
+
+    def test_login_page(self):
+        self.measure("login_get", Client(), "get", "/login/", budget=0)
+
+    def test_login_post(self):
+        self.measure(
+            "login_post", Client(), "post", "/login/",
+            data={"email": self.student.email, "password": PASSWORD},
+            budget=11, expected_status=302
+        )
+
+    def test_mentor_dashboard(self):
+        response = self.measure("mentor_first_page", self.mentor_client(), "get", "/mentor/", budget=7)
+        self.assertEqual(len(response.context["questions"]), settings.MENTOR_PAGE_SIZE)
+        self.assertEqual(response.context["stats"].total_questions, QUESTIONS)
+
+    def test_mentor_dashboard_deep_page(self):
+        # Cursor of a row near the end of the list: keyset paging must cost the same as page one
+        questions = Question.objects.order_by("-created_at", "-id")
+        _, cursor = keyset_page(questions, None, QUESTIONS - 2 * settings.MENTOR_PAGE_SIZE)
+        response = self.measure("mentor_deep_page", self.mentor_client(), "get", f"/mentor/?before={cursor}", budget=7)
+        self.assertEqual(len(response.context["questions"]), settings.MENTOR_PAGE_SIZE)
+
+    def test_mentor_dashboard_filtered(self):
+        response = self.measure(
+            "mentor_filtered", self.mentor_client(), "get", "/mentor/?status=answered&category=programming", budget=7
+        )
+        for question in response.context["questions"]:
+            self.assertEqual((question.status, question.category), ("answered", "programming"))
+
+    def test_mentor_answer_post(self):
+        self.measure(
+            "mentor_answer_post", self.mentor_client(), "post", "/mentor/",
+            data={"question_id": self.question.id, "answer_content": "Try breaking the problem down."},
+            budget=12
+        )
+
+    def test_student_dashboard(self):
+        self.measure("student_dashboard", self.student_client(), "get", "/student/", budget=4)
+
+    def test_student_question_post(self):
+        self.measure(
+            "student_question_post", self.student_client(), "post", "/student/",
+            data={"title": "How do decorators work?", "content": "I don't get the syntax.", "category": "programming"},
+            budget=8
+        )
+
+    def test_translate(self):
+        self.measure(
+            "translate", self.student_client(), "post", "/translate/",
+            data=json.dumps({"text": self.question.content, "language": "hindi"}),
+            content_type="application/json", budget=6
+        )
+
+    def test_translate_batch(self):
+        texts = list(Question.objects.values_list("title", flat=True)[:50])
+        response = self.measure(
+            "translate_batch_50", self.student_client(), "post", "/translate/batch/",
+            data=json.dumps({"texts": texts, "language": "japanese"}),
+            content_type="application/json", budget=6
+        )
+        self.assertEqual(len(response.json()["translations"]), 50)
+        # Generated once, then served from the cache on every timed run
+        self.assertEqual(CachedTranslation.objects.filter(language="japanese").count(), 50)
+
+    def test_generate_ai_answer(self):
+        response = self.measure(
+            "generate_ai_answer", self.mentor_client(), "post", "/generate-ai-answer/",
+            data=json.dumps({"question_id": self.question.id}),
+            content_type="application/json", budget=3
+        )
+        self.assertTrue(response.json()["success"])
+
+    def test_generate_ai_answer_stream(self):
+        self.measure(
+            "generate_ai_answer_stream", self.mentor_client(), "post", "/generate-ai-answer/stream/",
+            data=json.dumps({"question_id": self.question.id}),
+            content_type="application/json", budget=3
+        )
+
+    def test_ui_translations(self):
+        response = self.measure("ui_translations", Client(), "get", "/i18n/hindi.json", budget=0)
+        self.assertEqual(response.json()["translations"]["Category"], "श्रेणी")
+
+    @override_settings(MONITORING_TOKEN="scrape-token")
+    def test_ai_health(self):
+        self.measure("ai_health", Client(HTTP_AUTHORIZATION="Bearer scrape-token"), "get", "/ai-health/", budget=0)
+
+    def test_search(self):
+        response = self.measure("search", self.mentor_client(), "get", "/search/?q=42 topic", budget=4)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 20)
+        self.assertTrue(data["has_next"])
+        self.assertTrue(all("topic 42" in result["title"] for result in data["results"]))
+
+
+class MentorFilterTests(TestCase):
+    """Each template filter must stay a single query, however many questions there are"""
+
+    @classmethod
+    def setUpTestData(cls):
+        students = [User.objects.create(username=f"filter-student{i}") for i in range(3)]
+        Question.objects.bulk_create([
+            Question(student=students[i % 3], title=f"Q{i}", content="c", category="general",
+                     status="answered" if i % 2 else "pending")
+            for i in range(30)
+        ])
+
+    def render(self, source):
+        template = Template("{% load mentor_filters %}" + source)
+        return template.render(Context({"questions": Question.objects.all()}))
+
+    def test_filter_by_status(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render("{{ questions|filter_by_status:'answered'|length }}"), "15")
+
+    def test_unique_students(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render("{{ questions|unique_students|length }}"), "3")
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        student = User.objects.create(username="page-student")
+        Question.objects.bulk_create([
+            Question(student=student, title=f"Q{i}", content="c", category="general") for i in range(7)
+        ])
+        # Most rows share a timestamp: only the id tells them apart
+        now = timezone.now()
+        ids = list(Question.objects.order_by("id").values_list("id", flat=True))
+        Question.objects.filter(id__in=ids[:5]).update(created_at=now)
+        Question.objects.filter(id__in=ids[5:]).update(created_at=now - timedelta(minutes=1))
+        cls.newest_first = list(Question.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def walk(self, page_size, queryset=None):
+        pages = []
+        cursor = None
+        while True:
+            rows, cursor = keyset_page(queryset if queryset is not None else Question.objects.all(), cursor, page_size)
+            pages.append([row.id for row in rows])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_equal_timestamps_without_gaps_or_repeats(self):
+        for page_size in (1, 2, 3, 4):
+            pages = self.walk(page_size)
+            self.assertEqual([row for page in pages for row in page], self.newest_first, page_size)
+            self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+    def test_last_page_has_no_cursor(self):
+        # A page that ends exactly on the last row must not promise another one
+        rows, cursor = keyset_page(Question.objects.all(), None, 7)
+        self.assertEqual(len(rows), 7)
+        self.assertIsNone(cursor)
+        self.assertEqual(self.walk(7), [self.newest_first])
+        self.assertEqual(self.walk(10, Question.objects.none()), [[]])
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        _, cursor = keyset_page(Question.objects.all(), None, 3)
+        Question.objects.create(student=User.objects.get(), title="Newer", content="c", category="general")
+        second, _ = keyset_page(Question.objects.all(), cursor, 3)
+        self.assertEqual([row.id for row in second], self.newest_first[3:6])
+
+    def test_malformed_cursor_starts_from_the_first_page(self):
+        first_page = [row.id for row in keyset_page(Question.objects.all(), None, 3)[0]]
+        for cursor in ("", "not-base64!", "bm8gc2VwYXJhdG9y", "MjAyNC0xMy0wMXwx", "MjAyNC0wMS0wMXxhYmM", "__8"):
+            rows, _ = keyset_page(Question.objects.all(), cursor, 3)
+            self.assertEqual([row.id for row in rows], first_page, cursor)
+
+
+@override_settings(PRETRANSLATE_ON_SAVE=False, EMBED_ON_SAVE=False)
+class DashboardStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [User.objects.create(username=f"stats-student{i}") for i in range(2)]
+        cls.mentor = User.objects.create(username="stats-mentor")
+
+    def ask(self, student, status="pending"):
+        return Question.objects.create(student=student, title="Q", content="c", category="general", status=status)
+
+    def assertStatsMatchTheTable(self):
+        stats = DashboardStats.objects.get(pk=1)
+        self.assertEqual(
+            {field: getattr(stats, field) for field in (
+                "total_questions", "pending_questions", "answered_questions", "closed_questions", "active_students"
+            )},
+            {
+                "total_questions": Question.objects.count(),
+                "pending_questions": Question.objects.filter(status="pending").count(),
+                "answered_questions": Question.objects.filter(status="answered").count(),
+                "closed_questions": Question.objects.filter(status="closed").count(),
+                "active_students": Question.objects.values("student").distinct().count(),
+            }
+        )
+
+    def test_counters_follow_status_changes_and_deletes(self):
+        first = self.ask(self.students[0])
+        second = self.ask(self.students[0], status="answered")
+        third = self.ask(self.students[1])
+        self.assertStatsMatchTheTable()
+
+        first.status = "answered"
+        first.save()
+        # Saving without a status change leaves the counters alone
+        first.save()
+        Question.objects.get(pk=third.pk).save()
+        self.assertStatsMatchTheTable()
+
+        # A status changed in memory is counted as loaded, not as edited
+        second.status = "closed"
+        second.delete()
+        self.assertStatsMatchTheTable()
+
+        # The student's last question going away makes them inactive
+        third.delete()
+        self.assertEqual(DashboardStats.objects.get().active_students, 1)
+        self.assertStatsMatchTheTable()
+
+        self.ask(self.students[1], status="closed")
+        Question.objects.all().delete()
+        self.assertStatsMatchTheTable()
+
+    def test_answer_count_follows_answers(self):
+        question = self.ask(self.students[0])
+        earlier = Answer.objects.create(question=question, mentor=self.mentor, content="a")
+        later = Answer.objects.create(question=question, mentor=self.mentor, content="b")
+        question.refresh_from_db()
+        self.assertEqual((question.answer_count, question.last_answered_at), (2, later.created_at))
+
+        later.delete()
+        question.refresh_from_db()
+        self.assertEqual((question.answer_count, question.last_answered_at), (1, earlier.created_at))
+
+        earlier.delete()
+        question.refresh_from_db()
+        self.assertEqual((question.answer_count, question.last_answered_at), (0, None))
+
+    def test_rebuild_repairs_drift(self):
+        question = self.ask(self.students[0])
+        answer = Answer.objects.create(question=question, mentor=self.mentor, content="a")
+        self.ask(self.students[1], status="closed")
+        # Writes that bypass the signals
+        Question.objects.filter(pk=question.pk).update(answer_count=5, last_answered_at=None)
+        DashboardStats.objects.update(total_questions=99, closed_questions=0, active_students=7)
+
+        output = StringIO()
+        call_command("rebuild_dashboard_stats", stdout=output)
+        self.assertIn("1 questions had drifted", output.getvalue())
+        self.assertStatsMatchTheTable()
+        question.refresh_from_db()
+        self.assertEqual((question.answer_count, question.last_answered_at), (1, answer.created_at))
+        self.assertEqual(rebuild_answer_counts(), 0)
+
+    def test_stats_row_is_built_on_first_use(self):
+        self.ask(self.students[0])
+        DashboardStats.objects.all().delete()
+        self.ask(self.students[1])
+        self.assertStatsMatchTheTable()
+        DashboardStats.objects.all().delete()
+        self.assertEqual(rebuild_dashboard_stats().total_questions, 2)
+
+
+class UserRoleMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="role-user")
+        cls.profile = UserProfile.objects.create(user=cls.user, role="student")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def profile_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [q["sql"] for q in queries.captured_queries if "custom_auth_userprofile" in q["sql"]]
+
+    def test_role_is_read_once_per_session(self):
+        response, queries = self.profile_queries("/student/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context["user_role"], "student")
+
+        response, queries = self.profile_queries("/student/")
+        self.assertEqual(queries, [])
+        self.assertEqual(response.context["user_role"], "student")
+
+    def test_role_change_invalidates_session_copy(self):
+        self.client.get("/student/")
+        self.profile.role = "mentor"
+        self.profile.save()
+
+        response, queries = self.profile_queries("/student/")
+        self.assertEqual(len(queries), 1)
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+        self.assertEqual(self.client.get("/mentor/").status_code, 200)
+
+    @override_settings(USER_ROLE_MAX_AGE=0)
+    def test_session_copy_expires(self):
+        self.client.get("/student/")
+        _, queries = self.profile_queries("/student/")
+        self.assertEqual(len(queries), 1)
+
+    def test_role_required_redirects_wrong_role(self):
+        response = self.client.get("/mentor/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_role_required_redirects_anonymous_to_login(self):
+        self.client.logout()
+        response = self.client.get("/mentor/")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response["Location"])
+
+
+@override_settings(PRETRANSLATE_ON_SAVE=False)
+class SearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create(username="search-student")
+        cls.mentor = User.objects.create(username="search-mentor")
+        UserProfile.objects.create(user=cls.student, role="student")
+        UserProfile.objects.create(user=cls.mentor, role="mentor")
+
+    def ids(self, query):
+        return search_question_ids(query)[0]
+
+    def test_index_follows_question_and_answer_changes(self):
+        question = Question.objects.create(student=self.student, title="Recursion depth", content="Stack overflow in my tree walk")
+        self.assertEqual(self.ids("recursion"), [question.id])
+        self.assertEqual(self.ids("memoization"), [])
+
+        question.title = "Memoization help"
+        question.save()
+        self.assertEqual(self.ids("recursion"), [])
+        self.assertEqual(self.ids("memo"), [question.id])
+
+        answer = Answer.objects.create(question=question, mentor=self.mentor, content="Use functools.lru_cache")
+        self.assertEqual(self.ids("lru_cache"), [question.id])
+        answer.delete()
+        self.assertEqual(self.ids("lru_cache"), [])
+
+        question.delete()
+        self.assertEqual(self.ids("memoization"), [])
+
+    def test_title_matches_rank_first(self):
+        in_answer = Question.objects.create(student=self.student, title="Loops", content="How do I iterate?")
+        Answer.objects.create(question=in_answer, mentor=self.mentor, content="A generator works here")
+        in_title = Question.objects.create(student=self.student, title="Generator basics", content="What is yield?")
+        self.assertEqual(self.ids("generator"), [in_title.id, in_answer.id])
+
+    def test_query_syntax_is_escaped(self):
+        Question.objects.create(student=self.student, title="C++ pointers", content="What does * mean?")
+        self.assertEqual(len(self.ids('c++ "pointers')), 1)
+        self.assertEqual(self.ids("***"), [])
+
+    def test_only_mentors_can_search(self):
+        Question.objects.create(student=self.student, title="Recursion question", content="My tree walk overflows")
+
+        self.client.force_login(self.student)
+        response = self.client.get("/search/?q=recursion")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+        self.client.force_login(self.mentor)
+        response = self.client.get("/search/?q=recursion")
+        self.assertEqual(len(response.json()["results"]), 1)
+
+
+class EmbeddingIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.index = EmbeddingIndex(tmp.name)
+
+    def test_nearest_rows_by_cosine(self):
+        vectors = stub_embed_texts(["python list sort", "python list sorting order", "career interview tips"])
+        for question_id, vector in zip([3, 7, 12], vectors):
+            self.index.add(question_id, vector)
+
+        matches = self.index.search(vectors[0], k=3)
+        self.assertEqual([question_id for question_id, _ in matches][:2], [3, 7])
+        self.assertAlmostEqual(matches[0][1], 1.0, places=5)
+        self.assertEqual(self.index.search(vectors[0], k=3, min_score=0.99), [matches[0]])
+
+        self.index.remove(3)
+        self.assertNotIn(3, [question_id for question_id, _ in self.index.search(vectors[0], k=3)])
+
+    def test_removing_from_an_empty_index_writes_nothing(self):
+        index = EmbeddingIndex(os.path.join(self.index.directory, "unused"))
+        index.remove(3)
+        self.assertFalse(os.path.exists(index.directory))
+
+    def test_grows_past_capacity_and_is_shared_through_the_file(self):
+        vector = stub_embed_texts(["recursion depth"])[0]
+        self.index.add(1, vector)
+        self.index.add(5000, vector)
+        self.assertGreater(self.index.stats()["rows"], 5000)
+
+        other_process = EmbeddingIndex(self.index.directory)
+        self.assertEqual(sorted(question_id for question_id, _ in other_process.search(vector, k=2)), [1, 5000])
+
+    def test_concurrent_writers_keep_every_row(self):
+        # Two instances stand in for two processes: only the file lock orders their writes
+        vector = stub_embed_texts(["recursion depth"])[0]
+        writers = [self.index, EmbeddingIndex(self.index.directory)]
+
+        def write(offset):
+            for question_id in range(offset, 6000, 20):
+                writers[offset % 2].add(question_id, vector)
+
+        threads = [threading.Thread(target=write, args=(offset,)) for offset in (0, 1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        matrix = np.load(self.index.path)
+        written = sorted(list(range(0, 6000, 20)) + list(range(1, 6000, 20)))
+        self.assertTrue(np.all(matrix[written].any(axis=1)))
+
+
+@override_settings(PRETRANSLATE_ON_SAVE=False, EMBED_ON_SAVE=False, DUPLICATE_SIMILARITY=0.8)
+class DuplicateSuggestionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create(username="dup-student")
+        UserProfile.objects.create(user=cls.student, role="student")
+        mentor = User.objects.create(username="dup-mentor")
+        cls.answered = Question.objects.create(
+            student=cls.student, title="How do I reverse a list in Python",
+            content="I want the items of my list in reverse order", status="answered"
+        )
+        Answer.objects.create(question=cls.answered, mentor=mentor, content="Use reversed() or slicing")
+        cls.pending = Question.objects.create(
+            student=cls.student, title="How do I reverse a list in Python?",
+            content="I want the items of my list in reverse order"
+        )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(EMBEDDING_INDEX_DIR=tmp.name))
+        self.enterContext(mock.patch("auth.embeddings.embed_texts", stub_embed_texts))
+        self.is_ready = self.enterContext(
+            mock.patch("auth.model_registry.ModelRegistry.is_ready", new_callable=mock.PropertyMock, return_value=True)
+        )
+        for question in (self.answered, self.pending):
+            question_index.add(question.id, stub_embed_texts([f"{question.title}\n{question.content}"])[0])
+        self.client.force_login(self.student)
+
+    def post_question(self, title, **extra):
+        data = {"title": title, "content": "I want the items of my list in reverse order", "category": "programming"}
+        return self.client.post("/student/", {**data, **extra})
+
+    def test_answered_match_is_suggested_instead_of_posting(self):
+        response = self.post_question("Reverse a list in Python")
+        data = response.json()
+        self.assertFalse(data["success"])
+        # Only the answered question is suggested, with its answer
+        self.assertEqual([match["id"] for match in data["similar_questions"]], [self.answered.id])
+        self.assertEqual(data["similar_questions"][0]["answer"], "Use reversed() or slicing")
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_post_anyway_creates_the_question(self):
+        response = self.post_question("Reverse a list in Python", post_anyway="1")
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(Question.objects.count(), 3)
+
+    def test_check_is_skipped_while_the_model_is_not_loaded(self):
+        self.is_ready.return_value = False
+        with mock.patch("auth.embeddings.embed_texts") as embed_texts:
+            response = self.post_question("Reverse my list in Python")
+        self.assertTrue(response.json()["success"])
+        embed_texts.assert_not_called()
+
+    @override_settings(DUPLICATE_CHECK_TIMEOUT=0.05)
+    def test_slow_check_does_not_hold_up_posting(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_embed_texts(texts, batch_size=16):
+            release.wait(5)
+            return stub_embed_texts(texts)
+
+        with mock.patch("auth.embeddings.embed_texts", slow_embed_texts), mock.patch("builtins.print"):
+            response = self.post_question("Reverse this list in Python")
+        self.assertTrue(response.json()["success"])
+
+    def test_unrelated_question_is_posted(self):
+        response = self.client.post(
+            "/student/", {"title": "Preparing for a job interview", "content": "What should my resume include", "category": "career"}
+        )
+        self.assertTrue(response.json()["success"])
+
+
+class TranslationCacheTests(TestCase):
+
+    def test_memory_tier_then_table(self):
+        cache = TranslationCache(max_entries=10)
+        cache.set("How do I  sort a list?", "Hindi", "<sorted>")
+        # Trivially different copies share the entry
+        self.assertEqual(cache.get("How do I sort a list?", "hindi"), "<sorted>")
+
+        # Another worker only has the table
+        other_worker = TranslationCache(max_entries=10)
+        self.assertEqual(other_worker.get_many(["How do I sort a list?", "Unseen"], "hindi"), {"How do I sort a list?": "<sorted>"})
+        self.assertIsNone(other_worker.get("How do I sort a list?", "japanese"))
+        self.assertEqual(
+            {key: other_worker.stats()[key] for key in ("memory_hits", "db_hits", "misses")},
+            {"memory_hits": 0, "db_hits": 1, "misses": 2}
+        )
+        self.assertEqual(CachedTranslation.objects.count(), 1)
+
+
+@override_settings(PRETRANSLATE_ON_SAVE=False, EMBED_ON_SAVE=False)
+class PretranslationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create(username="pretranslate-student")
+
+    def setUp(self):
+        self.translated = []
+
+        def translate_texts_with_qwen(texts, target_language, cancel=None):
+            self.translated.append((target_language, list(texts)))
+            return [f"[{target_language}] {text}" for text in texts]
+
+        self.enterContext(mock.patch("auth.views.translate_texts_with_qwen", translate_texts_with_qwen))
+        # pretranslate closes its thread's connection; here that is the test's own
+        self.enterContext(mock.patch("auth.pretranslation.connection"))
+
+    def test_pretranslate_fills_missing_target_languages(self):
+        question = Question.objects.create(student=self.student, title="Loops", content="Why does it never end?")
+        pretranslate(Question, question.pk)
+
+        self.assertEqual([language for language, _ in self.translated], TARGET_LANGUAGES)
+        rows = ContentTranslation.objects.filter(question=question)
+        self.assertEqual(rows.count(), 2 * len(TARGET_LANGUAGES))
+        self.assertEqual(rows.get(field="title", language="hindi").translated_text, "[hindi] Loops")
+
+        # Nothing is left to translate
+        self.translated.clear()
+        pretranslate(Question, question.pk)
+        self.assertEqual(self.translated, [])
+
+    def test_edit_invalidates_only_the_edited_field(self):
+        question = Question.objects.create(student=self.student, title="Loops", content="Why does it never end?")
+        pretranslate(Question, question.pk)
+
+        question.content = "Why does my while loop never end?"
+        question.save()
+        fresh = invalidate_stale_translations(question)
+        self.assertEqual(fresh, {("title", language) for language in TARGET_LANGUAGES})
+        self.assertFalse(ContentTranslation.objects.filter(question=question, field="content").exists())
+
+        self.translated.clear()
+        pretranslate(Question, question.pk)
+        self.assertEqual(self.translated, [(language, [question.content]) for language in TARGET_LANGUAGES])
+
+    def test_save_queues_pretranslation_after_commit(self):
+        with override_settings(PRETRANSLATE_ON_SAVE=True), \
+                mock.patch("auth.pretranslation._executor.submit", lambda fn, *args: fn(*args)), \
+                self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(student=self.student, title="Loops", content="Why does it never end?")
+        self.assertEqual(ContentTranslation.objects.filter(question=question).count(), 2 * len(TARGET_LANGUAGES))
+
+    def test_pretranslated_texts_leave_out_stale_rows(self):
+        question = Question.objects.create(student=self.student, title="Loops", content="Why  does it\nnever end?")
+        answer = Answer.objects.create(question=question, mentor=self.student, content="Add a break")
+        pretranslate(Question, question.pk)
+        pretranslate(Answer, answer.pk)
+
+        # Edited behind the signals' back, e.g. by a bulk update
+        Question.objects.filter(pk=question.pk).update(title="Infinite loops")
+        question.refresh_from_db()
+
+        texts = pretranslated_texts([question], [answer])
+        self.assertEqual(sorted(texts), sorted(TARGET_LANGUAGES))
+        # Keys are normalized the way the pages normalize the text they look up
+        self.assertEqual(texts["hindi"], {
+            "Why does it never end?": "[hindi] Why  does it\nnever end?",
+            "Add a break": "[hindi] Add a break",
+        })
+        self.assertEqual(pretranslated_texts([], []), {})
+
+
+class TranslationMemoryTests(TestCase):
+
+    def setUp(self):
+        translation_cache.clear()
+        translation_memory.clear()
+        self.addCleanup(translation_cache.clear)
+        self.addCleanup(translation_memory.clear)
+        self.prompts = []
+        self.budgets = []
+
+        def generate(scheduler, prompts, budgets=None, cancels=None):
+            self.prompts.extend(prompts)
+            self.budgets.extend(budgets)
+            return [f"<{prompt.splitlines()[-1].split(': ', 1)[-1]}>" for prompt in prompts]
+
+        for patcher in (
+            mock.patch("auth.model_registry.ModelRegistry.get", return_value=(object(), StubTokenizer(), "cpu")),
+            mock.patch("auth.scheduler.BatchScheduler.generate", generate),
+            mock.patch("auth.prefix_cache.PrefixCache.add_template"),
+        ):
+            self.enterContext(patcher)
+
+    def translate(self, text, language="hindi"):
+        from .views import translate_text_with_qwen
+        self.prompts = []
+        self.budgets = []
+        return translate_text_with_qwen(text, language)
+
+    def test_segments_join_back_to_the_text(self):
+        text = "Hi!  My loop fails. Why?\n```\nfor i in x:\n    pass\n```\n42\nThanks"
+        parts = segment_text(text)
+        self.assertEqual("".join(part for part, _ in parts), text)
+        self.assertEqual(
+            [part for part, is_segment in parts if is_segment],
+            ["Hi!", "My loop fails.", "Why?", "Thanks"]
+        )
+
+    def test_stitch_drops_spaces_between_sentences_for_unspaced_languages(self):
+        parts = segment_text("One. Two.\nThree.")
+        translations = {"One.": "一。", "Two.": "二。", "Three.": "三。"}
+        self.assertEqual(stitch(parts, translations, "chinese"), "一。二。\n三。")
+        self.assertEqual(stitch(parts, translations, "hindi"), "一。 二。\n三。")
+        self.assertIsNone(stitch(parts, {"One.": "一。"}, "chinese"))
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertGreater(levenshtein("short", "a much longer string", max_distance=2), 2)
+
+    def test_only_unseen_sentences_reach_the_model(self):
+        self.translate("Hello everyone. How do I sort a list in Python?")
+        self.assertEqual(len(self.prompts), 2)
+        self.assertEqual(TranslationMemorySegment.objects.count(), 2)
+
+        translated = self.translate("Hello everyone. Why is my loop so slow?")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertTrue(translated.startswith("<Hello everyone.> "))
+
+    def test_fuzzy_reuse_is_opt_in(self):
+        self.translate("I get 3 errors when I run the test suite.")
+        self.translate("I get 3 errors when I run the test-suite")
+        self.assertEqual(len(self.prompts), 1)
+
+    @override_settings(TRANSLATION_MEMORY_FUZZY=0.9)
+    def test_fuzzy_match_is_reused_only_when_numbers_agree(self):
+        self.translate("I get 3 errors when I run the test suite.")
+
+        translated = self.translate("I get 3 errors when I run the test-suite")
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(translated, "<I get 3 errors when I run the test suite.>")
+
+        self.translate("I get 4 errors when I run the test suite.")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertEqual(translation_memory.stats()["fuzzy_hits"], 1)
+
+    @override_settings(TRANSLATION_MEMORY_FUZZY=0.9)
+    def test_fuzzy_match_never_differs_in_negations_or_identifiers(self):
+        self.assertTrue(safe_to_reuse("The test suite fails.", "The test-suite fails"))
+        self.assertFalse(safe_to_reuse("You should not use it.", "You should now use it."))
+        self.assertFalse(safe_to_reuse("I don't see output.", "I do see output."))
+        self.assertFalse(safe_to_reuse("Call list.sort() here.", "Call list.sorted() here."))
+        self.assertFalse(safe_to_reuse("Set max_size first.", "Set min_size first."))
+        self.assertFalse(safe_to_reuse("Use getValue first.", "Use setValue first."))
+
+        self.translate("You should not use a global variable here.")
+        self.translate("You should now use a global variable here.")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertEqual(translation_memory.stats()["fuzzy_hits"], 0)
+
+    @override_settings(TRANSLATION_MEMORY_CACHE_SEGMENTS=2)
+    def test_in_process_copy_is_bounded(self):
+        self.translate("First sentence. Second sentence. Third sentence.")
+        self.translate("Fourth sentence.")
+        self.assertLessEqual(translation_memory.stats()["segments"], 2)
+
+        # Sentences dropped from memory are still found in the table
+        translated = self.translate("First sentence. Fourth sentence.")
+        self.assertEqual(self.prompts, [])
+        self.assertEqual(translated, "<First sentence.> <Fourth sentence.>")
+
+        # A fresh process loads only the newest rows
+        translation_memory.clear()
+        translation_cache.clear()
+        self.translate("Second sentence.")
+        self.assertEqual(self.prompts, [])
+        self.assertLessEqual(translation_memory.stats()["segments"], 2)
+
+    @override_settings(TRANSLATION_CHUNK_TOKENS=8)
+    def test_long_sentence_is_translated_in_ordered_chunks(self):
+        sentence = "When I run the server, the page loads slowly, the logs show many queries, and the CPU stays busy."
+        translated = self.translate(sentence, "japanese")
+        self.assertEqual(len(self.prompts), 4)
+        self.assertEqual(
+            translated,
+            "<When I run the server,><the page loads slowly,><the logs show many queries,><and the CPU stays busy.>"
+        )
+        # Budgets follow each chunk's length and the target language
+        self.assertEqual(self.budgets, [translation_token_budget(n, "japanese") for n in (5, 4, 5, 5)])
+
+    def test_memory_is_shared_through_the_table(self):
+        self.translate("Where should I start with recursion?")
+        # A fresh process only has the table
+        translation_memory.clear()
+        translation_cache.clear()
+        self.translate("Where should I start with recursion?")
+        self.assertEqual(self.prompts, [])
+
+
+class GenerationLimitTests(SimpleTestCase):
+
+    def test_translation_budget_follows_length_and_language(self):
+        self.assertLess(translation_token_budget(10, "chinese"), translation_token_budget(10, "hindi"))
+        self.assertLess(translation_token_budget(10, "hindi"), translation_token_budget(40, "hindi"))
+        self.assertEqual(translation_token_budget(10000, "hindi"), settings.QWEN_TRANSLATION_MAX_TOKENS)
+
+    def test_answer_budget(self):
+        self.assertEqual(answer_token_budget(), settings.QWEN_ANSWER_MAX_TOKENS)
+        self.assertEqual(answer_token_budget(20), 256)
+        self.assertEqual(answer_token_budget(200), 600)
+
+    def test_split_prefers_clauses_then_words(self):
+        tokenizer = StubTokenizer()
+        self.assertEqual(split_into_chunks(tokenizer, "short text", 5), ["short text"])
+        self.assertEqual(
+            split_into_chunks(tokenizer, "one two three, four five six seven eight nine", 4),
+            ["one two three,", "four five six seven", "eight nine"]
+        )
+
+    def test_row_budgets_and_newline_stop(self):
+        import torch
+
+        input_ids = torch.zeros((2, 7), dtype=torch.long)
+        self.assertEqual(RowTokenBudget(4, [3, 5])(input_ids, None).tolist(), [True, False])
+
+        class CharTokenizer:
+            def decode(self, ids):
+                return "".join(chr(i) for i in ids.tolist())
+
+        stop = StopAtNewline(CharTokenizer(), [True, True])
+        # A leading newline doesn't end a row; one after some text does
+        self.assertEqual(stop(torch.tensor([[ord("\n")], [ord("a")]]), None).tolist(), [False, False])
+        self.assertEqual(stop(torch.tensor([[ord("b")], [ord("\n")]]), None).tolist(), [False, True])
+
+
+class PromptLookupTests(SimpleTestCase):
+
+    def test_draft_continues_the_earliest_ngram_match(self):
+        tokens = [1, 2, 3, 4, 5, 9, 2, 3, 7, 1, 2, 3]
+        # The trailing trigram 1 2 3 first appears at the start
+        self.assertEqual(find_draft(tokens, 3, 10), [4, 5, 9, 2, 3, 7, 1, 2, 3])
+        # Without a trigram match, the longest shorter n-gram is used
+        self.assertEqual(find_draft([7, 8, 9, 4, 8, 9], 3, 10), [4, 8, 9])
+
+    def test_no_match_gives_no_draft(self):
+        self.assertEqual(find_draft([1, 2, 3, 4], 3, 10), [])
+        self.assertEqual(find_draft([1], 3, 10), [])
+
+    def test_draft_length_is_capped(self):
+        self.assertEqual(find_draft(list(range(20)) + [0, 1], 2, 5), [2, 3, 4, 5, 6])
+
+    def test_output_matches_greedy_generate(self):
+        import torch
+
+        model = tiny_causal_lm()
+        input_ids = torch.tensor([[5, 6, 7, 8, 9, 5, 6, 7, 8, 9, 10, 11, 5, 6, 7]])
+        expected = model.generate(
+            input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=40, do_sample=False,
+            eos_token_id=None, pad_token_id=0
+        )[0, input_ids.shape[1]:].tolist()
+        self.assertEqual(len(expected), 40)
+
+        new_tokens, stats = prompt_lookup_generate(model, input_ids, 40, [])
+        self.assertEqual(new_tokens, expected)
+        # Both accepted and rejected drafts were exercised, in fewer forward passes than tokens
+        self.assertGreater(stats["accepted"], 0)
+        self.assertLess(stats["accepted"], stats["drafted"])
+        self.assertLess(stats["steps"], len(new_tokens))
+
+        # Stops on an end-of-sequence token, which is kept like generate keeps it
+        stop = expected[10]
+        new_tokens, _ = prompt_lookup_generate(model, input_ids, 40, [stop])
+        self.assertEqual(new_tokens, expected[:expected.index(stop) + 1])
+
+
+class PrefixCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        import torch
+
+        self.torch = torch
+        self.model = tiny_causal_lm()
+        # Prompts are written as space-separated token ids
+        self.tokenizer = lambda text, return_tensors="pt": SimpleNamespace(
+            input_ids=torch.tensor([[int(token) for token in text.split()]])
+        )
+        self.cache = PrefixCache(min_tokens=8)
+        self.cache.add(self.model, self.tokenizer, "cpu", " ".join(str(token) for token in range(2, 12)))
+        self.cache.add(self.model, self.tokenizer, "cpu", " ".join(str(token) for token in range(2, 18)))
+
+    def ids(self, tokens):
+        return self.torch.tensor([tokens])
+
+    def last_logits(self, input_ids, past_key_values=None):
+        cached = past_key_values.get_seq_length() if past_key_values is not None else 0
+        with self.torch.inference_mode():
+            return self.model(input_ids[:, cached:], past_key_values=past_key_values, use_cache=True).logits[0, -1]
+
+    def test_longest_prefix_is_matched(self):
+        prompt = self.ids(list(range(2, 24)))
+        past_key_values = self.cache.match(self.model, prompt)
+        self.assertEqual(past_key_values.get_seq_length(), 16)
+        # Prefilling only the rest gives the same next-token logits as the whole prompt
+        self.assertTrue(self.torch.allclose(self.last_logits(prompt, past_key_values), self.last_logits(prompt), atol=1e-5))
+
+    def test_cache_is_cropped_where_the_prompt_diverges(self):
+        prompt = self.ids(list(range(2, 14)) + [30, 31])
+        past_key_values = self.cache.match(self.model, prompt)
+        self.assertEqual(past_key_values.get_seq_length(), 12)
+        self.assertTrue(self.torch.allclose(self.last_logits(prompt, past_key_values), self.last_logits(prompt), atol=1e-5))
+
+        # A prompt that is the prefix itself still leaves one token to prefill
+        self.assertEqual(self.cache.match(self.model, self.ids(list(range(2, 18)))).get_seq_length(), 15)
+
+    def test_stored_cache_is_not_changed_by_generation(self):
+        prompt = self.ids(list(range(2, 24)))
+        expected = self.last_logits(prompt)
+        past_key_values = self.cache.match(self.model, prompt)
+        self.model.generate(
+            prompt, attention_mask=self.torch.ones_like(prompt), past_key_values=past_key_values,
+            max_new_tokens=5, do_sample=False, pad_token_id=0
+        )
+        self.assertGreater(past_key_values.get_seq_length(), 16)
+
+        again = self.cache.match(self.model, prompt)
+        self.assertEqual(again.get_seq_length(), 16)
+        self.assertTrue(self.torch.allclose(self.last_logits(prompt, again), expected, atol=1e-5))
+
+    def test_short_overlap_or_other_model_is_a_miss(self):
+        # Only the first five prefix tokens are shared: less than min_tokens
+        self.assertIsNone(self.cache.match(self.model, self.ids([2, 3, 4, 5, 6, 30, 31, 30, 31, 30])))
+        self.assertIsNone(self.cache.match(tiny_causal_lm(), self.ids(list(range(2, 24)))))
+        self.assertEqual(self.cache.stats(), {"prefixes": 2, "hits": 0, "misses": 2})
+
+
+class UiTranslationTests(TestCase):
+
+    def test_catalogs_cover_every_ui_string(self):
+        for language in ("chinese", "japanese", "hindi"):
+            catalog = ui_catalog(language)
+            self.assertEqual(set(catalog), set(UI_STRINGS))
+            self.assertTrue(all(catalog[text] != text for text in UI_STRINGS), language)
+        self.assertEqual(ui_catalog("english")["Post Question"], "Post Question")
+        self.assertIsNone(ui_catalog("klingon"))
+
+    def test_unknown_languages_are_not_cached(self):
+        ui_bundle("Japanese")
+        cached = (_catalog.cache_info().currsize, _bundle.cache_info().currsize)
+        for language in ("klingon", "elvish", "x" * 500):
+            self.assertIsNone(ui_bundle(language))
+            self.assertIsNone(ui_catalog(language))
+        # Names are cached by language code, whatever their case
+        self.assertIs(ui_bundle("JAPANESE"), ui_bundle("japanese"))
+        self.assertEqual((_catalog.cache_info().currsize, _bundle.cache_info().currsize), cached)
+
+    def test_bundle_is_cacheable(self):
+        client = Client()
+        response = client.get("/i18n/japanese.json")
+        self.assertEqual(response.json()["translations"]["Post Question"], "質問を投稿")
+        self.assertIn("max-age", response["Cache-Control"])
+        not_modified = client.get("/i18n/japanese.json", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(client.get("/i18n/klingon.json").status_code, 404)
+
+    def test_ui_strings_never_reach_the_model(self):
+        user = User.objects.create_user("student", password=PASSWORD)
+        UserProfile.objects.create(user=user, role="student")
+        client = Client()
+        client.force_login(user)
+        with mock.patch("auth.views.translate_texts_with_qwen", return_value=["<translated>"]) as translate:
+            response = client.post(
+                "/translate/batch/",
+                data=json.dumps({"texts": ["Ask Your Mentor", "My loop never ends"], "language": "chinese"}),
+                content_type="application/json"
+            )
+        self.assertEqual(response.json()["translations"], ["询问您的导师", "<translated>"])
+        translate.assert_called_once_with(["My loop never ends"], "chinese")
+
+
+@skipUnless(shutil.which("node"), "node is needed to parse the page scripts")
+@override_settings(PRETRANSLATE_ON_SAVE=False, EMBED_ON_SAVE=False)
+class PageScriptTests(TestCase):
+    """The inline scripts of every page must parse; one syntax error disables the whole dashboard"""
+
+    def assertScriptsParse(self, response):
+        scripts = re.findall(r"<script(?![^>]*\bsrc=)[^>]*>(.*?)</script>", response.content.decode(), re.S)
+        self.assertTrue(scripts)
+        with tempfile.TemporaryDirectory() as directory:
+            for index, script in enumerate(scripts):
+                path = os.path.join(directory, f"script{index}.js")
+                with open(path, "w") as f:
+                    f.write(script)
+                checked = subprocess.run(["node", "--check", path], capture_output=True, text=True)
+                self.assertEqual(checked.returncode, 0, f"{response.request['PATH_INFO']}: {checked.stderr}")
+
+    def test_page_scripts_parse(self):
+        mentor = User.objects.create_user("mentor", password=PASSWORD)
+        UserProfile.objects.create(user=mentor, role="mentor")
+        student = User.objects.create_user("student", password=PASSWORD)
+        UserProfile.objects.create(user=student, role="student")
+        Question.objects.create(student=student, title="Loops", content="Why does it never end?", category="programming")
+
+        self.assertScriptsParse(self.client.get("/login/"))
+        self.assertScriptsParse(self.client.get("/register/"))
+        self.client.force_login(mentor)
+        self.assertScriptsParse(self.client.get("/mentor/"))
+        self.client.force_login(student)
+        self.assertScriptsParse(self.client.get("/student/"))
+
+
+class BatchTranslationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("student", password=PASSWORD)
+        UserProfile.objects.create(user=user, role="student")
+        self.client = Client()
+        self.client.force_login(user)
+        # /translate/ runs the model call on the inference executor
+        executor = SharedConnectionExecutor()
+        self.addCleanup(executor.shutdown)
+        self.enterContext(mock.patch("auth.cancellation.inference_executor", return_value=executor))
+
+    def test_duplicates_are_translated_once_then_cached(self):
+        from .views import translate_texts_with_qwen
+
+        generated = []
+
+        def generate_translations(model, tokenizer, device, texts, target_language, cancel=None):
+            generated.append(sorted(texts.values()))
+            return {key: f"<{text}>" for key, text in texts.items()}
+
+        texts = ["Why does my batch loop stall?", "Why does my  batch loop stall?", "Why does my batch loop stall?"]
+        with mock.patch("auth.views.load_qwen_model", return_value=(object(), StubTokenizer(), "cpu")), \
+                mock.patch("auth.views.generate_translations", generate_translations):
+            first = translate_texts_with_qwen(texts, "japanese")
+            second = translate_texts_with_qwen(texts[:1], "japanese")
+
+        self.assertEqual(first, ["<Why does my batch loop stall?>"] * 3)
+        self.assertEqual(second, first[:1])
+        # Whitespace variants share one generation and the second request is served from the cache
+        self.assertEqual(generated, [["Why does my batch loop stall?"]])
+
+    def test_texts_come_back_untranslated_without_the_model(self):
+        with mock.patch("auth.views.load_qwen_model", return_value=(None, None, None)):
+            batch = self.client.post(
+                "/translate/batch/",
+                data=json.dumps({"texts": ["Ask Your Mentor", " ", "Recursion keeps overflowing"], "language": "hindi"}),
+                content_type="application/json"
+            ).json()
+            single = self.client.post(
+                "/translate/",
+                data=json.dumps({"text": "Recursion keeps overflowing", "language": "hindi"}),
+                content_type="application/json"
+            ).json()
+
+        # Interface text still comes from the catalog; user content is passed through
+        self.assertEqual(batch["translations"], [ui_catalog("hindi")["Ask Your Mentor"], " ", "Recursion keeps overflowing"])
+        self.assertTrue(batch["fallback"])
+        self.assertEqual(single["translated_text"], "Recursion keeps overflowing")
+        self.assertTrue(single["fallback"])
+
+    def test_catalog_text_needs_no_model(self):
+        with mock.patch("auth.views.load_qwen_model") as load:
+            response = self.client.post(
+                "/translate/",
+                data=json.dumps({"text": "Post Question", "language": "japanese"}),
+                content_type="application/json"
+            ).json()
+        self.assertEqual(response["translated_text"], "質問を投稿")
+        self.assertNotIn("fallback", response)
+        load.assert_not_called()
+
+    def test_invalid_batches_are_rejected(self):
+        for body in ({"texts": []}, {"texts": "not a list"}, {"texts": ["ok", 3]}):
+            response = self.client.post("/translate/batch/", data=json.dumps(body), content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        with override_settings(TRANSLATE_BATCH_MAX_TEXTS=2):
+            response = self.client.post(
+                "/translate/batch/", data=json.dumps({"texts": ["a", "b", "c"]}), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchSchedulerTests(SimpleTestCase):
+
+    def scheduler(self, **kwargs):
+        scheduler = BatchScheduler("test", "QWEN_ANSWER_MAX_TOKENS", **kwargs)
+        self.batches = []
+
+        def generate(prompts, budgets=None, cancels=None):
+            self.batches.append((list(prompts), list(budgets)))
+            return [f"out:{prompt}" for prompt in prompts]
+
+        scheduler.generate = generate
+        return scheduler
+
+    def test_concurrent_prompts_share_one_batch(self):
+        scheduler = self.scheduler(max_batch_size=8, max_wait_ms=500)
+        prompts = [f"prompt {i}" for i in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            outputs = list(pool.map(scheduler.submit, prompts))
+
+        # Every caller gets the output of its own prompt
+        self.assertEqual(outputs, [f"out:{prompt}" for prompt in prompts])
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(sorted(self.batches[0][0]), prompts)
+
+    def test_batches_are_capped_and_keep_submission_order(self):
+        scheduler = self.scheduler(max_batch_size=2, max_wait_ms=50)
+        outputs = scheduler.submit_many(["a", "b", "c", "d", "e"], max_new_tokens=[1, 2, 3, 4, 5])
+        self.assertEqual(outputs, ["out:a", "out:b", "out:c", "out:d", "out:e"])
+        self.assertEqual(self.batches, [(["a", "b"], [1, 2]), (["c", "d"], [3, 4]), (["e"], [5])])
+
+        # Prompts submitted without a budget get the scheduler's setting
+        scheduler.submit("f")
+        self.assertEqual(self.batches[-1][1], [settings.QWEN_ANSWER_MAX_TOKENS])
+
+    def test_failed_batch_reaches_every_caller_and_the_worker_keeps_going(self):
+        scheduler = self.scheduler(max_batch_size=8, max_wait_ms=50)
+        working = scheduler.generate
+        scheduler.generate = mock.Mock(side_effect=RuntimeError("CUDA out of memory"))
+        with mock.patch("builtins.print"), self.assertRaisesMessage(RuntimeError, "CUDA out of memory"):
+            scheduler.submit_many(["a", "b"])
+
+        scheduler.generate = working
+        self.assertEqual(scheduler.submit("c"), "out:c")
+
+    @override_settings(QWEN_DETERMINISTIC=True)
+    def test_rows_stop_at_their_own_budget(self):
+        model = tiny_causal_lm()
+        # An end-of-sequence id this model doesn't produce here: only the budgets end rows
+        model.generation_config.eos_token_id = 31
+        scheduler = BatchScheduler("test", "QWEN_ANSWER_MAX_TOKENS")
+        with mock.patch("auth.model_registry.ModelRegistry.get", return_value=(model, IdTokenizer(), "cpu")):
+            batched = scheduler.generate(["5 6 7 8", "9 10"], [3, 6])
+            self.assertEqual([row["new_tokens"] for row in scheduler.batch_telemetry], [3, 6])
+            alone = [scheduler.generate(["5 6 7 8"], [3])[0], scheduler.generate(["9 10"], [6])[0]]
+
+        self.assertEqual(batched, alone)
+        self.assertEqual([len(output.split()) for output in batched], [3, 6])
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def run_concurrently(self, flights, calls, fn):
+        """Start calls (key per caller) together, holding the leaders until every follower has joined"""
+        release = threading.Event()
+        followers = len(calls) - len(set(calls))
+
+        def held(key, cancel=None):
+            release.wait(5)
+            return fn(key)
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            futures = [pool.submit(flights.do, key, held, key) for key in calls]
+            for _ in range(100):
+                if flights.stats()["coalesced"] == followers:
+                    break
+                time.sleep(0.01)
+            release.set()
+            return [future.exception() or future.result() for future in futures]
+
+    def test_identical_calls_share_one_run(self):
+        flights = SingleFlight()
+        runs = []
+        results = self.run_concurrently(flights, ["a", "a", "a", "b"], lambda key: runs.append(key) or f"<{key}>")
+
+        self.assertEqual(results, ["<a>", "<a>", "<a>", "<b>"])
+        # Different keys don't coalesce
+        self.assertEqual(sorted(runs), ["a", "b"])
+        self.assertEqual(flights.stats(), {"in_flight": 0, "leaders": 2, "coalesced": 2})
+
+        # Finished keys are forgotten: a later call runs again
+        self.assertEqual(flights.do("a", lambda cancel=None: "again"), "again")
+
+    def test_leader_error_reaches_every_caller(self):
+        flights = SingleFlight()
+
+        def fail(key):
+            raise RuntimeError("CUDA out of memory")
+
+        results = self.run_concurrently(flights, ["a", "a"], fail)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_identical_answers_reach_the_scheduler_once(self):
+        from .views import generate_ai_answer
+
+        release = threading.Event()
+        prompts = []
+
+        def submit(prompt, max_new_tokens=None, cancel=None):
+            prompts.append(prompt)
+            release.wait(5)
+            return "Use a set"
+
+        with mock.patch("auth.views.load_qwen_model", return_value=(object(), StubTokenizer(), "cpu")), \
+                mock.patch("auth.views.cache_answer_prefix"), \
+                mock.patch("auth.views.answer_scheduler.submit", submit), \
+                ThreadPoolExecutor(max_workers=3) as pool:
+            coalesced = ai_requests.stats()["coalesced"]
+            futures = [
+                pool.submit(generate_ai_answer, "Dedupe a list", "Which way keeps the order?"),
+                pool.submit(generate_ai_answer, "Dedupe a list", "Which way keeps the order?"),
+            ]
+            for _ in range(100):
+                if ai_requests.stats()["coalesced"] > coalesced:
+                    break
+                time.sleep(0.01)
+            release.set()
+            answers = [future.result() for future in futures]
+            other = generate_ai_answer("Sort a list", "Which way keeps the order?")
+
+        self.assertEqual(answers, ["Use a set", "Use a set"])
+        self.assertEqual(other, "Use a set")
+        self.assertEqual(len(prompts), 2)
+        self.assertEqual(ai_requests.stats()["coalesced"], coalesced + 1)
+
+
+class CancellationTests(SimpleTestCase):
+
+    def test_shared_cancellation_waits_for_every_caller(self):
+        flights = SingleFlight()
+        first, second = CancelToken(), CancelToken()
+        with mock.patch("builtins.print"):
+            flights.claim("key", first)
+            flights.claim("key", second)
+            first.cancel("disconnect")
+            self.assertFalse(flights.cancellation("key").cancelled)
+            second.cancel("disconnect")
+            self.assertTrue(flights.cancellation("key").cancelled)
+
+            # A caller without a token keeps the generation alive
+            flights.claim("other", None)
+            flights.claim("other", first)
+            self.assertFalse(flights.cancellation("other").cancelled)
+
+    def test_cancelled_rows_stop(self):
+        import torch
+
+        running, cancelled = CancelToken(), CancelToken()
+        with mock.patch("builtins.print"):
+            cancelled.cancel("timeout")
+        criterion = CancelledRows([running, None, cancelled])
+        self.assertEqual(criterion(torch.zeros((3, 4), dtype=torch.long), None).tolist(), [False, False, True])
+
+    def test_cancelled_prompt_stops_its_row(self):
+        scheduler = BatchScheduler("test", "QWEN_ANSWER_MAX_TOKENS", max_batch_size=1, max_wait_ms=0)
+        started = threading.Event()
+        stopped = threading.Event()
+
+        def generate(prompts, budgets=None, cancels=None):
+            # Stands in for generate with CancelledRows: decodes until its row is cancelled
+            started.set()
+            while not all(cancel.cancelled for cancel in cancels):
+                time.sleep(0.01)
+            stopped.set()
+            return ["partial output"]
+
+        scheduler.generate = generate
+        cancel = CancelToken()
+
+        def disconnect():
+            started.wait()
+            cancel.cancel("disconnect")
+
+        threading.Thread(target=disconnect).start()
+        with mock.patch("builtins.print"), self.assertRaises(GenerationCancelled):
+            scheduler.submit("prompt", cancel=cancel)
+        self.assertTrue(stopped.wait(1))
+
+    def test_timeout_and_disconnect_cancel_the_call(self):
+        tokens = []
+        started = threading.Event()
+
+        def blocking_call(cancel):
+            tokens.append(cancel)
+            started.set()
+            while not cancel.cancelled:
+                time.sleep(0.01)
+
+        async def disconnect():
+            task = asyncio.ensure_future(run_cancellable(blocking_call))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        before = cancellation_stats.snapshot()["requests"]
+        with mock.patch("builtins.print") as log:
+            with self.assertRaises(TimeoutError):
+                asyncio.run(run_cancellable(blocking_call, timeout=0.05))
+            # Wait for the second call itself, not the first one, before disconnecting
+            started.clear()
+            asyncio.run(disconnect())
+
+        self.assertEqual([token.reason for token in tokens], ["timeout", "disconnect"])
+        after = cancellation_stats.snapshot()["requests"]
+        self.assertEqual(after["timeout"], before.get("timeout", 0) + 1)
+        self.assertEqual(after["disconnect"], before.get("disconnect", 0) + 1)
+        self.assertIn("AI request cancelled (timeout)", log.call_args_list[0].args[0])
+
+
+class AsyncAIViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mentor = User.objects.create_user("mentor", password=PASSWORD)
+        UserProfile.objects.create(user=cls.mentor, role="mentor")
+        cls.question = Question.objects.create(student=cls.mentor, title="Loops", content="Why does it never end?")
+
+    def setUp(self):
+        executor = SharedConnectionExecutor()
+        self.addCleanup(executor.shutdown)
+        self.enterContext(mock.patch("auth.cancellation.inference_executor", return_value=executor))
+        self.client.force_login(self.mentor)
+
+    def test_answer_view_runs_on_the_executor(self):
+        def generate_ai_answer(title, content, context_prompt="", cancel=None, draft=""):
+            self.assertIsNotNone(cancel)
+            self.assertTrue(threading.current_thread().name.startswith("ThreadPoolExecutor"))
+            return f"Answer to {title}"
+
+        with mock.patch("auth.views.generate_ai_answer", generate_ai_answer):
+            response = self.client.post(
+                "/generate-ai-answer/", data=json.dumps({"question_id": self.question.id}),
+                content_type="application/json"
+            )
+        self.assertEqual(response.json()["ai_answer"], "Answer to Loops")
+
+    @override_settings(QWEN_PROMPT_LOOKUP=False)
+    def test_answer_budget_comes_from_the_draft_only(self):
+        budgets = []
+
+        def submit(prompt, max_new_tokens=None, cancel=None):
+            budgets.append(max_new_tokens)
+            return "Answer"
+
+        def stream_generate(prompt, max_new_tokens, **kwargs):
+            budgets.append(max_new_tokens)
+            yield "Answer"
+
+        draft = " ".join(["word"] * 20)
+        # What the mentor page sends for a fresh answer, then for a short draft wrapped in instructions
+        bodies = [
+            {"question_id": self.question.id, "context_prompt": "", "draft": ""},
+            {
+                "question_id": self.question.id,
+                "context_prompt": f'Please improve and expand the following mentor response: "{draft}" ' + "please " * 300,
+                "draft": draft,
+            },
+        ]
+        with mock.patch("auth.model_registry.ModelRegistry.get", return_value=(object(), StubTokenizer(), "cpu")), \
+                mock.patch("auth.prefix_cache.PrefixCache.add_template"), \
+                mock.patch("auth.views.answer_scheduler.submit", submit), \
+                mock.patch("auth.views.stream_generate", stream_generate):
+            for path in ("/generate-ai-answer/", "/generate-ai-answer/stream/"):
+                for body in bodies:
+                    response = self.client.post(path, data=json.dumps(body), content_type="application/json")
+                    self.assertEqual(response.status_code, 200)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+        self.assertEqual(budgets, [settings.QWEN_ANSWER_MAX_TOKENS, 256] * 2)
+
+    @override_settings(AI_REQUEST_TIMEOUT=0.05)
+    def test_timeout_cancels_generation(self):
+        reasons = []
+
+        def translate_text_with_qwen(text, target_language, cancel=None):
+            while not cancel.cancelled:
+                time.sleep(0.01)
+            reasons.append(cancel.reason)
+            return None
+
+        with mock.patch("auth.views.translate_text_with_qwen", translate_text_with_qwen), mock.patch("builtins.print"):
+            response = self.client.post(
+                "/translate/", data=json.dumps({"text": "My loop never ends", "language": "hindi"}),
+                content_type="application/json"
+            )
+            deadline = time.monotonic() + 1
+            while not reasons and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(reasons, ["timeout"])
+
+
+@override_settings(
+    PRETRANSLATE_ON_SAVE=False,
+    EMBED_ON_SAVE=False,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class StreamingTests(TestCase):
+
+    def frames(self, body):
+        """(event, payload) for each server-sent event in a response body"""
+        frames = []
+        for message in body.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in message.split("\n"))
+            frames.append((lines.get("event"), json.loads(lines["data"])))
+        return frames
+
+    def test_chunks_become_token_frames_and_a_done_event(self):
+        events = list(sse_stream(iter(["Use ", "a ", "set "]), question_title="Dedupe"))
+        self.assertEqual(events[0], 'data: {"token": "Use "}\n\n')
+        self.assertEqual(self.frames("".join(events)), [
+            (None, {"token": "Use "}),
+            (None, {"token": "a "}),
+            (None, {"token": "set "}),
+            ("done", {"success": True, "ai_answer": "Use a set", "question_title": "Dedupe"}),
+        ])
+
+    def test_failure_mid_stream_ends_with_an_error_event(self):
+        def chunks():
+            yield "Use "
+            raise RuntimeError("CUDA out of memory")
+
+        with mock.patch("builtins.print"):
+            frames = self.frames("".join(sse_stream(chunks())))
+        self.assertEqual(frames[0], (None, {"token": "Use "}))
+        self.assertEqual(frames[1][0], "error")
+        self.assertFalse(frames[1][1]["success"])
+        self.assertNotIn("CUDA", frames[1][1]["error"])
+
+    def test_stream_view_framing(self):
+        mentor = User.objects.create_user("mentor", password=PASSWORD)
+        UserProfile.objects.create(user=mentor, role="mentor")
+        question = Question.objects.create(student=mentor, title="Loops", content="Why does it never end?")
+        self.client.force_login(mentor)
+        with mock.patch("auth.views.load_qwen_model", return_value=(object(), StubTokenizer(), "cpu")), \
+                mock.patch("auth.views.cache_answer_prefix"), \
+                mock.patch("auth.views.stream_generate", stub_stream_generate):
+            response = self.client.post(
+                "/generate-ai-answer/stream/", data=json.dumps({"question_id": question.id}), content_type="application/json"
+            )
+            body = b"".join(response.streaming_content).decode()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        frames = self.frames(body)
+        self.assertEqual([payload["token"] for event, payload in frames[:-1]], ["Stub ", "streamed ", "answer"])
+        self.assertEqual(frames[-1], ("done", {
+            "success": True, "ai_answer": "Stub streamed answer",
+            "question_title": "Loops", "question_content": "Why does it never end?",
+        }))
+
+    def test_disconnect_cancels_the_generation(self):
+        cancel = CancelToken()
+
+        async def read_one_frame():
+            events = aiter_sync(sse_stream(iter(["Use ", "a ", "set "])), cancel)
+            first = await events.__anext__()
+            # What Django does with the response iterator when the client goes away
+            await events.aclose()
+            return first
+
+        with mock.patch("builtins.print"):
+            self.assertEqual(asyncio.run(read_one_frame()), 'data: {"token": "Use "}\n\n')
+        self.assertEqual(cancel.reason, "disconnect")
+
+        # A stream read to the end leaves the token alone
+        cancel = CancelToken()
+
+        async def read_all():
+            return [event async for event in aiter_sync(sse_stream(iter(["ok"])), cancel)]
+
+        self.assertEqual(len(asyncio.run(read_all())), 2)
+        self.assertFalse(cancel.cancelled)
+
+    @override_settings(QWEN_DETERMINISTIC=True)
+    def test_closing_the_stream_stops_decoding(self):
+        model = tiny_causal_lm()
+        model.generation_config.eos_token_id = 31
+        cancel = CancelToken()
+        with mock.patch("auth.streaming.registry.get", return_value=(model, IdTokenizer(), "cpu")), \
+                mock.patch("auth.streaming.remote_inference_enabled", return_value=False), \
+                mock.patch("auth.streaming.record_generation") as record, \
+                mock.patch("builtins.print"):
+            chunks = stream_generate("5 6 7 8", 200, cancel=cancel)
+            self.assertTrue(next(chunks))
+            chunks.close()
+            # The generation thread records its outcome once decoding has stopped
+            for _ in range(100):
+                if record.called:
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(cancel.reason, "disconnect")
+        self.assertEqual(record.call_args.args[:2], ("stream", "cancelled"))
+        self.assertLess(record.call_args.kwargs["new_tokens"], 200)
+
+
+class AIJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mentor = User.objects.create_user("job-mentor", password=PASSWORD)
+        cls.other_mentor = User.objects.create_user("job-other-mentor", password=PASSWORD)
+        cls.question = Question.objects.create(student=cls.mentor, title="Loops", content="Why does it never end?")
+
+    def submit(self, **body):
+        response = self.client.post(
+            "/ai-jobs/", data=json.dumps({"question_id": self.question.id, **body}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 202)
+        return response.json()["job_id"]
+
+    def test_duplicate_submission_reuses_the_open_job(self):
+        self.client.force_login(self.mentor)
+        job_id = self.submit(context_prompt="Expand: use a counter", draft="use a counter")
+        job = AIAnswerJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.requested_by, job.draft), ("queued", self.mentor, "use a counter"))
+
+        self.assertEqual(self.submit(context_prompt="Expand: use a counter", draft="use a counter"), job_id)
+        self.assertNotEqual(self.submit(), job_id)
+
+        job.status = "done"
+        job.save()
+        self.assertNotEqual(self.submit(context_prompt="Expand: use a counter", draft="use a counter"), job_id)
+        self.assertEqual(AIAnswerJob.objects.count(), 3)
+
+    def test_each_job_is_claimed_by_one_worker(self):
+        jobs = [AIAnswerJob.objects.create(question=self.question, requested_by=self.mentor) for _ in range(3)]
+        first = claim_next_job("worker-a")
+        self.assertEqual((first.id, first.status, first.worker), (jobs[0].id, "running", "worker-a"))
+
+        # worker-b read the queue before worker-a's claim landed: its update must miss and move on
+        real_first = QuerySet.first
+        stale = [jobs[0]]
+        with mock.patch.object(QuerySet, "first", lambda queryset: stale.pop() if stale else real_first(queryset)):
+            second = claim_next_job("worker-b")
+        self.assertEqual(second.id, jobs[1].id)
+        jobs[0].refresh_from_db()
+        self.assertEqual(jobs[0].worker, "worker-a")
+
+        self.assertEqual(claim_next_job("worker-a").id, jobs[2].id)
+        self.assertIsNone(claim_next_job("worker-b"))
+
+    def test_run_job_records_the_outcome(self):
+        outcomes = [("An answer", None), (None, None), (None, RuntimeError("CUDA out of memory"))]
+        for result, error in outcomes:
+            AIAnswerJob.objects.create(question=self.question, requested_by=self.mentor, draft="my draft")
+            job = claim_next_job("worker")
+            generate = mock.Mock(return_value=result, side_effect=error)
+            with mock.patch("auth.views.generate_ai_answer", generate):
+                job = run_job(job)
+            generate.assert_called_once_with("Loops", "Why does it never end?", "", draft="my draft")
+            job.refresh_from_db()
+            self.assertIsNotNone(job.finished_at)
+            if result:
+                self.assertEqual((job.status, job.result), ("done", "An answer"))
+            else:
+                self.assertEqual(job.status, "failed")
+                self.assertEqual(job.error, str(error) if error else "Failed to generate AI answer.")
+
+    def test_status_is_only_visible_to_the_requester(self):
+        job = AIAnswerJob.objects.create(question=self.question, requested_by=self.mentor)
+        self.client.force_login(self.other_mentor)
+        self.assertEqual(self.client.get(f"/ai-jobs/{job.id}/").status_code, 404)
+        self.client.force_login(self.mentor)
+        self.assertEqual(self.client.get(f"/ai-jobs/{job.id}/").json()["status"], "queued")
+
+
+class AIWorkerTests(TransactionTestCase):
+    """Runs outside a test transaction: a failed save would otherwise poison the rest of the test"""
+
+    def run_worker(self):
+        from .management.commands.run_ai_worker import Command
+
+        command = Command(stdout=StringIO(), stderr=StringIO())
+        # The worker closes its connections; the test's must stay open
+        with mock.patch("auth.management.commands.run_ai_worker.close_old_connections"), \
+                mock.patch("auth.management.commands.run_ai_worker.connection"):
+            command.work("worker", 0, once=True)
+        return command.stderr.getvalue()
+
+    def test_worker_survives_failing_jobs(self):
+        mentor = User.objects.create_user("worker-mentor", password=PASSWORD)
+        question = Question.objects.create(student=mentor, title="Loops", content="Why does it never end?")
+        doomed = Question.objects.create(student=mentor, title="Doomed", content="Deleted mid-run")
+        deleted = AIAnswerJob.objects.create(question=doomed, requested_by=mentor)
+        broken = AIAnswerJob.objects.create(question=question, requested_by=mentor)
+        fine = AIAnswerJob.objects.create(question=question, requested_by=mentor, draft="fine")
+
+        def generate(title, content, context_prompt="", draft=""):
+            if title == "Doomed":
+                # The job row goes with its question
+                doomed.delete()
+            return "An answer"
+
+        real_run_job = run_job
+
+        def flaky_run_job(job):
+            if job.id == broken.id:
+                raise django.db.OperationalError("database is locked")
+            return real_run_job(job)
+
+        with mock.patch("auth.views.generate_ai_answer", generate), \
+                mock.patch("auth.management.commands.run_ai_worker.run_job", flaky_run_job):
+            errors = self.run_worker()
+
+        self.assertIn(f"job {deleted.id} error", errors)
+        self.assertFalse(AIAnswerJob.objects.filter(id=deleted.id).exists())
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.error), ("failed", "database is locked"))
+        fine.refresh_from_db()
+        self.assertEqual((fine.status, fine.result), ("done", "An answer"))
+
+
+class InferenceServerTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "inference.sock")
+        # The server marks its process as serving locally; undo that for the rest of the suite
+        self.enterContext(mock.patch("auth.inference_client._serving", False))
+        self.server = InferenceServer(self.path, threads=4, poll_interval=0.01)
+        self.server.bind()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 1)
+        self.addCleanup(self.server.shutdown)
+        self.client = InferenceClient(self.path, pool_size=2, poll_interval=0.01)
+        self.addCleanup(self.client.close)
+
+    def test_generate_reuses_a_pooled_connection(self):
+        def generate(prompts, budgets=None, cancels=None):
+            return [f"{prompt}:{budget}" for prompt, budget in zip(prompts, budgets)]
+
+        with mock.patch.object(translation_scheduler, "generate", generate):
+            first = self.client.generate("translation", ["a", "b"], [5, 7])
+            second = self.client.generate("translation", ["c"], [3])
+        self.assertEqual(first, ["a:5", "b:7"])
+        self.assertEqual(second, ["c:3"])
+        self.assertEqual(self.client.connects, 1)
+
+    def test_embeddings_travel_as_raw_floats(self):
+        vectors = np.arange(6, dtype=np.float32).reshape(2, 3)
+        with mock.patch("auth.inference_server.embed_texts", return_value=vectors):
+            result = self.client.embed(["one", "two"])
+        np.testing.assert_array_equal(result, vectors)
+
+    def test_stream_yields_chunks(self):
+        def stream_generate(prompt, max_new_tokens, prompt_lookup=False, cancel=None, **kwargs):
+            yield from ["Hel", "lo"]
+
+        with mock.patch("auth.inference_server.stream_generate", stream_generate):
+            self.assertEqual(list(self.client.stream("prompt", 10)), ["Hel", "lo"])
+
+    def test_cancelled_request_stops_server_generation(self):
+        started = threading.Event()
+        reasons = []
+
+        def generate(prompts, budgets=None, cancels=None):
+            started.set()
+            while not all(cancel.cancelled for cancel in cancels):
+                time.sleep(0.01)
+            reasons.append(cancels[0].reason)
+            return [""]
+
+        cancel = CancelToken()
+
+        def disconnect():
+            started.wait()
+            cancel.cancel("disconnect")
+
+        threading.Thread(target=disconnect).start()
+        with mock.patch.object(translation_scheduler, "generate", generate), mock.patch("builtins.print"):
+            with self.assertRaises(GenerationCancelled):
+                self.client.generate("translation", ["prompt"], [10], [cancel])
+            deadline = time.monotonic() + 1
+            while not reasons and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(reasons, ["disconnect"])
+
+    def test_scheduler_routes_to_the_server(self):
+        client = mock.Mock()
+        client.generate.return_value = ["remote output"]
+        with mock.patch("auth.scheduler.remote_inference_enabled", return_value=True), \
+                mock.patch("auth.scheduler.inference_client", client):
+            self.assertEqual(translation_scheduler.submit("prompt", max_new_tokens=4), "remote output")
+        client.generate.assert_called_once_with("translation", ["prompt"], [4], [None], None)
+
+    def test_server_reports_model_metrics(self):
+        text = self.client.metrics()
+        self.assertIn("ai_model_ready", text)
+        # Request-side families come from the web worker, not the server
+        self.assertNotIn("ai_translation_cache_lookups_total", text)
+
+    def test_health_reports_an_unreachable_server(self):
+        health = InferenceClient(self.path + ".missing").health()
+        self.assertFalse(health["reachable"])
+        self.assertFalse(health["ready"])
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        self.model_path = model_dir.name
+        self.enterContext(mock.patch("auth.model_registry.remote_inference_enabled", return_value=False))
+        self.enterContext(mock.patch("transformers.AutoTokenizer.from_pretrained", return_value=mock.Mock()))
+        self.loads = self.enterContext(mock.patch("transformers.AutoModelForCausalLM.from_pretrained"))
+        self.loads.side_effect = lambda *args, **kwargs: mock.Mock(name=f"model{self.loads.call_count}")
+
+    def registry(self, **kwargs):
+        return ModelRegistry(self.model_path, quantization="none", **kwargs)
+
+    def test_loads_once(self):
+        registry = self.registry()
+        model, tokenizer, device = registry.get()
+        self.assertIsNotNone(model)
+        self.assertEqual(registry.get(), (model, tokenizer, device))
+        self.assertEqual(self.loads.call_count, 1)
+        self.assertEqual(registry.health()["status"], "ready")
+
+    def test_failure_is_remembered_until_retry_after(self):
+        registry = self.registry(retry_after=60)
+        self.loads.side_effect = OSError("weights are corrupt")
+        now = [1000.0]
+        with mock.patch("auth.model_registry.time.monotonic", lambda: now[0]), mock.patch("builtins.print"):
+            self.assertEqual(registry.get(), (None, None, None))
+            now[0] += 59
+            self.assertEqual(registry.get(), (None, None, None))
+            self.assertEqual(self.loads.call_count, 1)
+            self.assertEqual((registry.health()["status"], registry.error), ("failed", "weights are corrupt"))
+
+            self.loads.side_effect = None
+            now[0] += 2
+            self.assertIsNotNone(registry.get()[0])
+        self.assertEqual(self.loads.call_count, 2)
+        self.assertIsNone(registry.error)
+
+    def test_reload_replaces_the_model(self):
+        registry = self.registry()
+        first = registry.get()[0]
+        self.assertTrue(registry.reload())
+        self.assertIsNot(registry.get()[0], first)
+        self.assertEqual(self.loads.call_count, 2)
+
+        # A failed reload drops the old model instead of serving it
+        self.loads.side_effect = OSError("gone")
+        with mock.patch("builtins.print"):
+            self.assertFalse(registry.reload())
+        self.assertEqual(registry.get(), (None, None, None))
+
+    def test_concurrent_first_requests_load_once(self):
+        registry = self.registry()
+        load = self.loads.side_effect
+
+        def slow_load(*args, **kwargs):
+            time.sleep(0.2)
+            return load(*args, **kwargs)
+
+        self.loads.side_effect = slow_load
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            models = [model for model, _, _ in pool.map(lambda _: registry.get(), range(8))]
+        self.assertEqual(self.loads.call_count, 1)
+        self.assertTrue(all(model is models[0] for model in models))
+
+    def test_int8_quantizes_the_decoder(self):
+        import torch
+        from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+        self.loads.side_effect = lambda *args, **kwargs: tiny_causal_lm()
+        registry = ModelRegistry(self.model_path, quantization="int8")
+        with warnings.catch_warnings():
+            # torch deprecates the quantized tensor constructors quantize_dynamic uses
+            warnings.simplefilter("ignore", UserWarning)
+            model, _, device = registry.get()
+        self.assertEqual(self.loads.call_args.kwargs["torch_dtype"], torch.float32)
+        self.assertEqual(str(device), "cpu")
+
+        linears = [module for module in model.model.modules() if isinstance(module, torch.nn.Linear)]
+        quantized = [module for module in model.model.modules() if isinstance(module, DynamicLinear)]
+        self.assertEqual(linears, [])
+        # q, k, v, o, gate, up and down projections of both layers
+        self.assertEqual(len(quantized), 14)
+        self.assertEqual(type(model.lm_head), torch.nn.Linear)
+        self.assertEqual(model.lm_head.weight.dtype, torch.float32)
+
+        with torch.inference_mode():
+            output = model.generate(torch.tensor([[5, 6, 7]]), max_new_tokens=4, do_sample=False, pad_token_id=0)
+        self.assertEqual(output.shape, (1, 7))
+
+    def test_pickle_checkpoints_still_load(self):
+        import torch
+        from transformers import Qwen2ForCausalLM
+
+        # Only the older pickle format, as some exported checkpoints still ship
+        model = tiny_causal_lm()
+        model.config.save_pretrained(self.model_path)
+        torch.save(model.state_dict(), os.path.join(self.model_path, "pytorch_model.bin"))
+        self.loads.side_effect = Qwen2ForCausalLM.from_pretrained
+        registry = self.registry()
+        with mock.patch("builtins.print"):
+            model = registry.get()[0]
+        self.assertIsNotNone(model, registry.error)
+        self.assertIsNone(self.loads.call_args.kwargs["use_safetensors"])
+
+    def test_missing_model_directory_fails(self):
+        registry = ModelRegistry(os.path.join(self.model_path, "missing"), quantization="none")
+        with mock.patch("builtins.print"):
+            self.assertEqual(registry.get(), (None, None, None))
+        self.assertIn("Model directory not found", registry.error)
+        self.loads.assert_not_called()
+
+
+class SqlitePragmaTests(SimpleTestCase):
+    # The connections opened here go to throwaway files, not the test database
+    databases = {"default"}
+
+    def open_connection(self):
+        """A new connection to a file database, set up through connection_created like any other"""
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({**connection.settings_dict, "NAME": os.path.join(directory.name, "db.sqlite3")})
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragmas(self, wrapper):
+        with wrapper.cursor() as cursor:
+            return {
+                pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                for pragma in ("journal_mode", "busy_timeout", "synchronous")
+            }
+
+    @override_settings(SQLITE_PRAGMAS={"journal_mode": "WAL", "busy_timeout": 1234, "synchronous": "NORMAL"})
+    def test_new_connections_get_the_configured_pragmas(self):
+        # synchronous reads back as a number: NORMAL is 1
+        self.assertEqual(self.pragmas(self.open_connection()), {"journal_mode": "wal", "busy_timeout": 1234, "synchronous": 1})
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_no_pragmas_leaves_sqlite_defaults(self):
+        self.assertEqual(self.pragmas(self.open_connection())["journal_mode"], "delete")
+        other_vendor = mock.Mock(vendor="postgresql")
+        apply_sqlite_pragmas(None, other_vendor)
+        other_vendor.cursor.assert_not_called()
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_urlconf_does_not_import_the_ml_stack(self):
+        # Run in a fresh interpreter: tests in this process import torch
+        code = (
+            "import sys, django; django.setup(); import projectname.urls; "
+            "print(sorted(name for name in ('torch', 'transformers') if name in sys.modules))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "projectname.settings", "QWEN_EAGER_LOAD": "0"}
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertEqual(completed.stdout.strip().splitlines()[-1], "[]")
+
+
+class TelemetryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create(username="telemetry-student")
+        UserProfile.objects.create(user=cls.student, role="student")
+        cls.staff = User.objects.create(username="telemetry-staff", is_staff=True)
+
+    @override_settings(MONITORING_TOKEN="scrape-token", MONITORING_ALLOWED_IPS=["10.0.0.5"])
+    def test_monitoring_endpoints_are_restricted(self):
+        for path in ("/metrics", "/ai-health/"):
+            self.client.logout()
+            self.assertEqual(self.client.get(path).status_code, 403)
+            self.assertEqual(self.client.get(path, HTTP_AUTHORIZATION="Bearer wrong-token").status_code, 403)
+            self.client.force_login(self.student)
+            self.assertEqual(self.client.get(path).status_code, 403)
+
+            self.client.logout()
+            allowed = [
+                self.client.get(path, HTTP_AUTHORIZATION="Bearer scrape-token"),
+                self.client.get(path, REMOTE_ADDR="10.0.0.5"),
+            ]
+            self.client.force_login(self.staff)
+            allowed.append(self.client.get(path))
+            # /ai-health/ answers 503 while the model is not loaded
+            self.assertTrue(all(response.status_code in (200, 503) for response in allowed))
+
+        health = allowed[-1].json()
+        self.assertNotIn("model_path", health)
+        self.assertNotIn("path", health["question_embeddings"])
+
+    def test_prometheus_text_format(self):
+        counter = Counter("test_total", "A counter", ["result"])
+        counter.inc(result='say "hi"\n')
+        counter.inc(2, result="ok")
+        histogram = Histogram("test_seconds", "A histogram", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+
+        text = render_families([
+            (metric.name, metric.kind, metric.help_text, metric.samples()) for metric in (counter, histogram)
+        ])
+        self.assertIn("# TYPE test_total counter", text)
+        self.assertIn('test_total{result="ok"} 2', text)
+        self.assertIn('test_total{result="say \\"hi\\"\\n"} 1', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("test_seconds_sum 5.55", text)
+        self.assertIn("test_seconds_count 3", text)
+
+    def test_scheduler_records_each_prompt(self):
+        scheduler = BatchScheduler("telemetry-test", "QWEN_ANSWER_MAX_TOKENS", max_batch_size=1, max_wait_ms=0)
+
+        def generate(prompts, budgets=None, cancels=None):
+            scheduler.batch_telemetry = [
+                {"prompt_length": 12, "new_tokens": 4, "first_token": 0.01, "prefix_cache_hit": True}
+            ]
+            return ["output"]
+
+        scheduler.generate = generate
+        with self.assertLogs("telemetry", "INFO") as logs:
+            self.assertEqual(scheduler.submit("prompt"), "output")
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["event"], "generation")
+        self.assertEqual(record["operation"], "telemetry-test")
+        self.assertEqual(record["outcome"], "ok")
+        self.assertEqual((record["prompt_tokens"], record["generated_tokens"]), (12, 4))
+        self.assertGreaterEqual(record["queue_wait_ms"], 0)
+        text = metrics.render()
+        self.assertIn('ai_generations_total{operation="telemetry-test",outcome="ok"} 1', text)
+        self.assertIn('ai_generated_tokens_count{operation="telemetry-test"} 1', text)
+
+    def test_metrics_endpoint(self):
+        from .views import translate_text_with_qwen
+
+        self.client.force_login(self.student)
+        with self.assertLogs("telemetry", "INFO") as logs:
+            self.assertEqual(self.client.get("/student/").status_code, 200)
+        self.assertEqual(json.loads(logs.records[-1].getMessage())["view"], "student")
+
+        with mock.patch.object(translation_cache, "get_many", side_effect=RuntimeError("cache down")), \
+                mock.patch("builtins.print"), self.assertLogs("telemetry", "INFO"):
+            self.assertIsNone(translate_text_with_qwen("Hello", "hindi"))
+
+        with override_settings(MONITORING_ALLOWED_IPS=["127.0.0.1"]):
+            response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertRegex(text, r'http_request_duration_seconds_count\{view="student",method="GET",status="200"\} \d+')
+        self.assertRegex(text, r'ai_errors_total\{operation="translate"\} \d+')
+        self.assertIn("ai_translation_cache_lookups_total", text)
+        self.assertIn("ai_model_ready", text)
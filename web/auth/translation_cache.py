@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .model_registry import registry
+from .models import CachedTranslation
+
+
+def normalize_text(text):
+    """Normalize text so trivially different copies share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Two-tier cache of model translations.
+
+    Lookups go to a bounded in-process LRU first, then to the
+    ``CachedTranslation`` table, which is shared by every worker and survives
+    restarts. Entries are keyed on (normalized text hash, target language,
+    model revision) so a new model never serves stale output.
+    """
+
+    def __init__(self, max_entries=None):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self):
+        return self._max_entries or settings.TRANSLATION_CACHE_SIZE
+
+    def make_key(self, text, language):
+        return (text_hash(text), language.lower(), registry.revision)
+
+    def get(self, text, language):
+        """Return the cached translation, or None on a miss"""
+        return self.get_many([text], language).get(text)
+
+    def get_many(self, texts, language):
+        """Look up several texts at once; returns {text: translation} for the hits"""
+        keys = {text: self.make_key(text, language) for text in texts}
+        found = {}
+        missing = {}
+
+        with self._lock:
+            for text, key in keys.items():
+                translated = self._entries.get(key)
+                if translated is not None:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    found[text] = translated
+                else:
+                    missing[key[0]] = text
+
+        if not missing:
+            return found
+
+        # One query for everything the LRU tier doesn't hold
+        language, revision = language.lower(), registry.revision
+        try:
+            rows = dict(CachedTranslation.objects.filter(
+                text_hash__in=list(missing), language=language, model_revision=revision
+            ).values_list('text_hash', 'translated_text'))
+        except DatabaseError as e:
+            print(f"Translation cache lookup error: {e}")
+            rows = {}
+
+        with self._lock:
+            for hash_, text in missing.items():
+                translated = rows.get(hash_)
+                if translated is None:
+                    self.misses += 1
+                    continue
+                self.db_hits += 1
+                self._remember((hash_, language, revision), translated)
+                found[text] = translated
+        return found
+
+    def set_many(self, translations, language):
+        """Store {text: translation} pairs in both tiers with one INSERT"""
+        rows = {}
+        with self._lock:
+            for text, translated in translations.items():
+                key = self.make_key(text, language)
+                self._remember(key, translated)
+                rows[key] = CachedTranslation(
+                    text_hash=key[0], language=key[1], model_revision=key[2], translated_text=translated
+                )
+        try:
+            # Rows another worker stored first are skipped
+            CachedTranslation.objects.bulk_create(list(rows.values()), ignore_conflicts=True)
+        except DatabaseError as e:
+            print(f"Translation cache write error: {e}")
+
+    def set(self, text, language, translated):
+        """Store a translation in both tiers"""
+        self.set_many({text: translated}, language)
+
+    def _remember(self, key, translated):
+        """Insert into the LRU tier; must be called with the lock held"""
+        self._entries[key] = translated
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empty the in-process tier and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+            }
+
+
+translation_cache = TranslationCache()
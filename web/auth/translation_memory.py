@@ -0,0 +1,316 @@
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .model_registry import registry
+from .models import TranslationMemorySegment
+from .translation_cache import normalize_text, text_hash
+
+
+# Fenced code is never translated; everything else is split into sentences and lines
+CODE_FENCE = re.compile(r"```.*?(?:```|$)", re.S)
+SENTENCE_BREAK = re.compile(r"((?<=[.!?])[ \t]+|(?<=[。！？])[ \t]*|[ \t]*\n\s*)")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+# Words a fuzzy match may not differ in: they flip or change what the sentence says
+NEGATIONS = {"no", "not", "never", "none", "nothing", "nobody", "neither", "nor", "without", "cannot"}
+CODE_IDENTIFIER = re.compile(r"[_`()\[\]{}<>=/\\.]|[a-z][A-Z]")
+
+# Languages written without spaces between sentences
+UNSPACED_LANGUAGES = {'chinese', 'japanese'}
+
+
+def segment_text(text):
+    """Split text into [(part, is_segment)]; joining the parts gives the text back.
+
+    Segments are sentences or lines worth translating; the other parts
+    (whitespace between sentences, code blocks, lines without letters) are
+    kept as they are.
+    """
+    parts = []
+    position = 0
+    for fence in CODE_FENCE.finditer(text):
+        parts.extend(_split_sentences(text[position:fence.start()]))
+        parts.append((fence.group(), False))
+        position = fence.end()
+    parts.extend(_split_sentences(text[position:]))
+    return [(part, is_segment) for part, is_segment in parts if part]
+
+
+def _split_sentences(chunk):
+    parts = []
+    for i, piece in enumerate(SENTENCE_BREAK.split(chunk)):
+        if i % 2:
+            parts.append((piece, False))
+            continue
+        stripped = piece.strip()
+        if not stripped:
+            parts.append((piece, False))
+            continue
+        # Keep the piece's own leading/trailing whitespace out of the segment
+        start = piece.index(stripped)
+        parts.append((piece[:start], False))
+        parts.append((stripped, any(ch.isalpha() for ch in stripped)))
+        parts.append((piece[start + len(stripped):], False))
+    return parts
+
+
+def stitch(parts, translations, language):
+    """Reassemble segmented text from {segment: translation}; None if any segment is missing"""
+    output = []
+    for part, is_segment in parts:
+        if is_segment:
+            translated = translations.get(normalize_text(part))
+            if translated is None:
+                return None
+            output.append(translated)
+        elif language.lower() in UNSPACED_LANGUAGES and part and not part.strip(" \t"):
+            # Drop the space between sentences, keep line breaks
+            continue
+        else:
+            output.append(part)
+    return "".join(output)
+
+
+def levenshtein(a, b, max_distance=None):
+    """Edit distance between two strings, or max_distance + 1 once it is known to be larger"""
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is None:
+        max_distance = len(a)
+    if len(a) - len(b) > max_distance:
+        return max_distance + 1
+
+    # Only cells within max_distance of the diagonal can stay under the limit
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low, high = max(1, i - max_distance), min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        for j in range(low, high + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1])
+            )
+        if min(current[low - 1:high + 1]) > max_distance:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def _words(text):
+    return Counter(word.strip(".,;:!?\"'") for word in text.split())
+
+
+def safe_to_reuse(source, candidate):
+    """False when the words two near-identical segments differ in include a negation or code identifier"""
+    source_words, candidate_words = _words(source), _words(candidate)
+    for word in (source_words - candidate_words) + (candidate_words - source_words):
+        lowered = word.lower()
+        if lowered in NEGATIONS or lowered.endswith(("n't", "n’t")) or CODE_IDENTIFIER.search(word):
+            return False
+    return True
+
+
+def trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SegmentIndex:
+    """Translated segments of one language and model revision, with a trigram index for fuzzy lookups"""
+
+    def __init__(self, last_id=0, truncated=False):
+        self.exact = {}
+        self.sources = []
+        self.translations = []
+        self.postings = {}
+        self.last_id = last_id
+        # Older segments of the table were left out to bound memory
+        self.truncated = truncated
+
+    def add(self, source, translated):
+        if source in self.exact:
+            return
+        self.exact[source] = translated
+        row = len(self.sources)
+        self.sources.append(source)
+        self.translations.append(translated)
+        for gram in trigrams(source):
+            self.postings.setdefault(gram, []).append(row)
+
+    def fuzzy(self, source, min_similarity, candidates=5):
+        """Closest stored segment as (translation, similarity), or None below min_similarity"""
+        # An edit changes at most 3 trigrams, so a segment within max_edits edits
+        # shares at least one of the query's 3 * max_edits + 1 rarest trigrams;
+        # only those (short) posting lists need to be read
+        max_edits = int(len(source) / min_similarity * (1 - min_similarity))
+        grams = sorted(trigrams(source), key=lambda gram: len(self.postings.get(gram, ())))
+        shared = Counter()
+        for gram in grams[:3 * max_edits + 1]:
+            shared.update(self.postings.get(gram, ()))
+        if not shared:
+            return None
+
+        numbers = NUMBER.findall(source)
+        best = None
+        for row, _ in shared.most_common(candidates):
+            candidate = self.sources[row]
+            # Numbers can't be patched into a reused translation, so they must agree
+            if NUMBER.findall(candidate) != numbers or not safe_to_reuse(source, candidate):
+                continue
+            length = max(len(source), len(candidate))
+            max_distance = int(length * (1 - min_similarity))
+            distance = levenshtein(source, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            similarity = 1 - distance / length
+            if best is None or similarity > best[1]:
+                best = (self.translations[row], similarity)
+        return best
+
+
+class TranslationMemory:
+    """Sentence-level translation memory shared by every worker.
+
+    Segments are persisted in ``TranslationMemorySegment``. Each process keeps
+    an in-memory copy per language and loads the rows other workers added
+    since its last lookup (one query), so exact lookups are dict hits and
+    fuzzy lookups go through a trigram index. A copy holds at most
+    ``TRANSLATION_MEMORY_CACHE_SEGMENTS`` segments; when it is full it starts
+    over empty, and exact lookups it misses are then read from the table.
+
+    Fuzzy matches are opt-in: with ``TRANSLATION_MEMORY_FUZZY`` below 1, a
+    segment is reused when its edit-distance similarity is at least that
+    much, both contain the same numbers and the words they differ in are no
+    negations or code identifiers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    def _index(self, language, revision, room=0):
+        """The segment index for a language, replaced by an empty one unless it has room; must hold the lock"""
+        key = (language, revision)
+        index = self._indexes.get(key)
+        if index is None:
+            # Copies made for an earlier model are never read again
+            for stale in [other for other in self._indexes if other[1] != revision]:
+                del self._indexes[stale]
+            index = self._indexes[key] = SegmentIndex()
+        elif len(index.sources) + room > settings.TRANSLATION_MEMORY_CACHE_SEGMENTS:
+            index = self._indexes[key] = SegmentIndex(index.last_id, truncated=True)
+        return index
+
+    def _sync(self, language):
+        """The segment index for a language, with rows added by other workers loaded"""
+        revision, limit = registry.revision, settings.TRANSLATION_MEMORY_CACHE_SEGMENTS
+        with self._lock:
+            last_id = self._index(language, revision).last_id
+        try:
+            # Only the newest rows fit in memory
+            rows = list(TranslationMemorySegment.objects.filter(
+                language=language, model_revision=revision, id__gt=last_id
+            ).order_by('-id').values_list('id', 'source_text', 'translated_text')[:limit])
+        except DatabaseError as e:
+            print(f"Translation memory lookup error: {e}")
+            rows = []
+        rows.reverse()
+        with self._lock:
+            index = self._index(language, revision, room=len(rows))
+            if len(rows) == limit:
+                # There may have been more
+                index.truncated = True
+            for row_id, source, translated in rows:
+                if row_id > index.last_id:
+                    index.add(source, translated)
+                    index.last_id = row_id
+        return index
+
+    def _stored(self, sources, language):
+        """{source: translation} read from the table for segments no longer held in memory"""
+        try:
+            rows = TranslationMemorySegment.objects.filter(
+                language=language, model_revision=registry.revision, source_hash__in=[text_hash(source) for source in sources]
+            ).values_list('source_text', 'translated_text')
+            return {source: translated for source, translated in rows if source in sources}
+        except DatabaseError as e:
+            print(f"Translation memory lookup error: {e}")
+            return {}
+
+    def lookup_many(self, segments, language):
+        """{segment: translation} for the segments the memory can answer"""
+        language = language.lower()
+        min_similarity = settings.TRANSLATION_MEMORY_FUZZY
+        found = {}
+        index = self._sync(language)
+        sources = {segment: normalize_text(segment) for segment in segments}
+        stored = {}
+        if index.truncated:
+            with self._lock:
+                missing = {source for source in sources.values() if source not in index.exact}
+            stored = self._stored(missing, language) if missing else {}
+        with self._lock:
+            for segment, source in sources.items():
+                translated = index.exact.get(source, stored.get(source))
+                if translated is not None:
+                    self.exact_hits += 1
+                    found[segment] = translated
+                    continue
+                match = index.fuzzy(source, min_similarity) if min_similarity < 1 else None
+                if match is not None:
+                    self.fuzzy_hits += 1
+                    found[segment] = match[0]
+                else:
+                    self.misses += 1
+        return found
+
+    def add_many(self, translations, language):
+        """Persist {segment: translation} pairs with one INSERT"""
+        language, revision = language.lower(), registry.revision
+        rows = []
+        with self._lock:
+            index = self._index(language, revision, room=len(translations))
+            for segment, translated in translations.items():
+                source = normalize_text(segment)
+                index.add(source, translated)
+                rows.append(TranslationMemorySegment(
+                    source_hash=text_hash(source),
+                    source_text=source,
+                    language=language,
+                    model_revision=revision,
+                    translated_text=translated
+                ))
+        try:
+            # Segments another worker stored first are skipped
+            TranslationMemorySegment.objects.bulk_create(rows, ignore_conflicts=True)
+        except DatabaseError as e:
+            print(f"Translation memory write error: {e}")
+
+    def clear(self):
+        """Drop the in-process copies and reset the counters"""
+        with self._lock:
+            self._indexes.clear()
+            self.exact_hits = self.fuzzy_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.fuzzy_hits + self.misses
+            return {
+                "segments": sum(len(index.sources) for index in self._indexes.values()),
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.fuzzy_hits) / lookups if lookups else 0.0,
+            }
+
+
+translation_memory = TranslationMemory()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from django.utils import translation
+from django.utils.translation import gettext, gettext_noop
+
+
+# The app names languages ('chinese'); Django's catalogs use language codes
+LANGUAGE_CODES = {
+    'english': 'en',
+    'chinese': 'zh-hans',
+    'japanese': 'ja',
+    'hindi': 'hi',
+}
+LANGUAGE_NAMES = {code: name for name, code in LANGUAGE_CODES.items()}
+
+# Interface text translated from the compiled catalogs in locale/ rather than
+# by the model. New strings go here and into each locale's django.po.
+UI_STRINGS = [
+    gettext_noop('Welcome back'),
+    gettext_noop('Ask Your Mentor'),
+    gettext_noop('Question Title'),
+    gettext_noop('Question Details'),
+    gettext_noop('Category'),
+    gettext_noop('Post Question'),
+    gettext_noop('What would you like to ask?'),
+    gettext_noop('Describe your question in detail...'),
+    gettext_noop('Ready to continue your learning journey? Explore your progress, connect with mentors, and achieve your goals!'),
+]
+
+
+def language_code(language):
+    """The catalog code of a language name, or None for an unknown language"""
+    return LANGUAGE_CODES.get(language.lower())
+
+
+# Cached per known language code: the names come from URLs and request
+# bodies, and caching every junk value would grow without bound
+@lru_cache(maxsize=None)
+def _catalog(code):
+    with translation.override(code):
+        return {text: gettext(text) for text in UI_STRINGS}
+
+
+@lru_cache(maxsize=None)
+def _bundle(code):
+    body = json.dumps({'language': LANGUAGE_NAMES[code], 'translations': _catalog(code)}, ensure_ascii=False)
+    return body, hashlib.sha256(body.encode()).hexdigest()[:16]
+
+
+def ui_catalog(language):
+    """{UI string: translation} for a language name, or None for an unknown language"""
+    code = language_code(language)
+    return _catalog(code) if code else None
+
+
+def ui_bundle(language):
+    """The catalog of a language as (JSON body, ETag), or None for an unknown language"""
+    code = language_code(language)
+    return _bundle(code) if code else None
+
+
+def translate_ui_text(text, language):
+    """The catalog translation of an interface string, or None if the text isn't one"""
+    return (ui_catalog(language) or {}).get(text)
@@ -1,18 +1,41 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login as auth_login
 from django.contrib import messages
-from .models import UserProfile, Question, Answer
+from .models import UserProfile, Question, Answer, AIAnswerJob
+from .model_registry import registry
+from .scheduler import translation_scheduler, answer_scheduler, sampling_kwargs
+from .translation_cache import translation_cache, normalize_text, text_hash
+from .translation_memory import translation_memory, segment_text, stitch, UNSPACED_LANGUAGES
+from .generation_limits import answer_token_budget, count_tokens, split_into_chunks, translation_token_budget
+from .streaming import stream_generate, sse_stream, aiter_sync
+from .prefix_cache import prefix_cache, PROMPT_MARKER
+from .assisted_decoding import generate_with_prompt_lookup, prompt_lookup_stats
+from .single_flight import ai_requests
+from .inference_client import InferenceError, InferenceUnavailable, inference_client, remote_inference_enabled
+from .cancellation import CancelToken, GenerationCancelled, cancellation_stats, run_cancellable, wait_for_result
+from .pretranslation import pretranslated_texts
+from .pagination import keyset_page
+from .stats import get_dashboard_stats
+from .roles import monitoring_required, role_required, resolve_user_role, remember_user_role
+from .search import search_questions
+from .embeddings import similar_answered_questions, question_index
+from .ui_translations import ui_bundle, translate_ui_text
+from .telemetry import record_error, render_families, render_metrics, timed_view
 from django.contrib.auth import logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
+from django.utils.cache import patch_cache_control
+from django.conf import settings
+from django.db import transaction
 import json
-import torch
-import os
 
 
 # Create your views here.
+@timed_view('login')
 def login(request):
     if request.method == "POST":
         email = request.POST.get("email")
@@ -34,18 +57,18 @@ def login(request):
             if user is not None:
                 auth_login(request, user)
                 
-                # Check user role and redirect accordingly
-                try:
-                    user_profile = UserProfile.objects.get(user=user)
-                    if user_profile.role == 'mentor':
-                        messages.success(request, f"Welcome back, {user.first_name}! (Mentor)")
-                        return redirect("mentor")  # Redirect to mentor dashboard
-                    elif user_profile.role == 'student':
-                        messages.success(request, f"Welcome back, {user.first_name}! (Student)")
-                        return redirect("student")  # Redirect to student dashboard
-                except UserProfile.DoesNotExist:
+                # Check user role and redirect accordingly; the role is kept in the new session
+                user_role = resolve_user_role(request)
+                if user_role == 'mentor':
+                    messages.success(request, f"Welcome back, {user.first_name}! (Mentor)")
+                    return redirect("mentor")  # Redirect to mentor dashboard
+                elif user_role == 'student':
+                    messages.success(request, f"Welcome back, {user.first_name}! (Student)")
+                    return redirect("student")  # Redirect to student dashboard
+                elif user_role is None:
                     # If no profile exists, create a default one
                     UserProfile.objects.create(user=user, role='student')
+                    remember_user_role(request, 'student')
                     messages.info(request, "Profile created with default role.")
                     return redirect("student")
                 
@@ -131,18 +154,9 @@ def logout(request):
     return redirect("login")
 
 
-@login_required
+@timed_view('mentor')
+@role_required('mentor')
 def mentor(request):
-    # Check if user has mentor role
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-        if user_profile.role != 'mentor':
-            messages.error(request, "Access denied. Mentor role required.")
-            return redirect("home")
-    except UserProfile.DoesNotExist:
-        messages.error(request, "User profile not found.")
-        return redirect("home")
-    
     # Handle answer submission
     if request.method == 'POST':
         question_id = request.POST.get('question_id')
@@ -150,16 +164,18 @@ def mentor(request):
         
         if question_id and answer_content:
             try:
-                question = Question.objects.get(id=question_id)
-                answer = Answer.objects.create(
-                    question=question,
-                    mentor=request.user,
-                    content=answer_content
-                )
-                
-                # Update question status to answered
-                question.status = 'answered'
-                question.save()
+                # The answer, the question's counters and the dashboard stats change together
+                with transaction.atomic():
+                    question = Question.objects.get(id=question_id)
+                    answer = Answer.objects.create(
+                        question=question,
+                        mentor=request.user,
+                        content=answer_content
+                    )
+                    
+                    # Update question status to answered
+                    question.status = 'answered'
+                    question.save(update_fields=['status', 'updated_at'])
                 
                 return JsonResponse({
                     'success': True,
@@ -186,28 +202,44 @@ def mentor(request):
                 'error': 'Question ID and answer content are required'
             }, status=400)
     
-    # Get all questions with student information
-    questions = Question.objects.select_related('student').prefetch_related('answers__mentor').order_by('-created_at')
+    # Filters are applied in the database and the list is paged by cursor
+    status_filter = request.GET.get('status', 'all')
+    category_filter = request.GET.get('category', 'all')
+    cursor = request.GET.get('before')
+    
+    filtered = Question.objects.all()
+    if status_filter in dict(Question.STATUS_CHOICES):
+        filtered = filtered.filter(status=status_filter)
+    if category_filter in dict(Question.CATEGORY_CHOICES):
+        filtered = filtered.filter(category=category_filter)
+    
+    questions, next_cursor = keyset_page(
+        filtered.select_related('student').prefetch_related('answers__mentor'),
+        cursor,
+        settings.MENTOR_PAGE_SIZE
+    )
+    answers = [answer for question in questions for answer in question.answers.all()]
+    
+    # Header counters are maintained as questions and answers change
+    stats = get_dashboard_stats()
     
     context = {
-        'questions': questions
+        'questions': questions,
+        'stats': stats,
+        'status_filter': status_filter,
+        'category_filter': category_filter,
+        'is_first_page': not cursor,
+        'next_cursor': next_cursor,
+        'ai_jobs_enabled': settings.AI_ANSWER_JOBS,
+        'pretranslations': pretranslated_texts(questions, answers)
     }
     
     return render(request, "Mentor.html", context)
 
 
-@login_required
+@timed_view('student')
+@role_required('student')
 def student(request):
-    # Check if user has student role
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-        if user_profile.role != 'student':
-            messages.error(request, "Access denied. Student role required.")
-            return redirect("home")
-    except UserProfile.DoesNotExist:
-        messages.error(request, "User profile not found.")
-        return redirect("home")
-    
     # Handle question posting
     if request.method == 'POST':
         title = request.POST.get('title')
@@ -215,13 +247,42 @@ def student(request):
         category = request.POST.get('category')
         
         if title and content and category:
+            # Point the student at answered questions that look the same before posting,
+            # unless they have already seen the suggestions and chose to post anyway
+            if request.POST.get('post_anyway') != '1':
+                try:
+                    # Never hold up posting for long: skipped if the model isn't loaded or is slow
+                    similar = similar_answered_questions(title, content, timeout=settings.DUPLICATE_CHECK_TIMEOUT)
+                except Exception as e:
+                    print(f"Duplicate detection error: {e}")
+                    similar = []
+                
+                if similar:
+                    answers = {}
+                    for answer in Answer.objects.filter(question__in=[question for question, _ in similar]).order_by('created_at'):
+                        answers.setdefault(answer.question_id, answer.content)
+                    return JsonResponse({
+                        'success': False,
+                        'similar_questions': [
+                            {
+                                'id': question.id,
+                                'title': question.title,
+                                'content': question.content,
+                                'answer': answers.get(question.id, ''),
+                                'similarity': round(score, 3)
+                            }
+                            for question, score in similar
+                        ]
+                    })
+            
             try:
-                question = Question.objects.create(
-                    student=request.user,
-                    title=title,
-                    content=content,
-                    category=category
-                )
+                with transaction.atomic():
+                    question = Question.objects.create(
+                        student=request.user,
+                        title=title,
+                        content=content,
+                        category=category
+                    )
                 messages.success(request, "Question posted successfully!")
                 return JsonResponse({
                     'success': True,
@@ -246,10 +307,11 @@ def student(request):
             }, status=400)
     
     # Get user's questions for display
-    questions = Question.objects.filter(student=request.user).order_by('-created_at')
+    questions = list(Question.objects.filter(student=request.user).order_by('-created_at'))
     
     context = {
-        'questions': questions
+        'questions': questions,
+        'pretranslations': pretranslated_texts(questions)
     }
     
     return render(request, "Student.html", context)
@@ -257,103 +319,189 @@ def student(request):
 
 # AI Translation Service
 def load_qwen_model():
-    """Load the saved Qwen model for translation"""
+    """Return the resident Qwen model, loading it on first use"""
+    return registry.get()
+
+
+def cache_prompt_prefix(model, tokenizer, device, template_prompt):
+    """Pre-compute the KV cache for the part of a prompt shared by all requests"""
     try:
-        from transformers import AutoModelForCausalLM, AutoTokenizer
-        
+        if remote_inference_enabled():
+            # The prefix caches live next to the model, in the inference server
+            inference_client.add_template(template_prompt)
+        else:
+            prefix_cache.add_template(model, tokenizer, device, template_prompt)
+    except Exception as e:
+        print(f"Prompt prefix cache error: {e}")
+
+
+def cache_answer_prefix(model, tokenizer, device, context_prompt=""):
+    """Cache the shared prefix of the fresh-answer or enhance-answer prompt"""
+    if context_prompt:
+        template_prompt = build_answer_prompt(tokenizer, "", "", PROMPT_MARKER)
+    else:
+        template_prompt = build_answer_prompt(tokenizer, PROMPT_MARKER, PROMPT_MARKER)
+    cache_prompt_prefix(model, tokenizer, device, template_prompt)
+
+
+def build_translation_prompt(tokenizer, text, target_language):
+    """Wrap text in the chat template used for translation"""
+    # Create translation prompt based on target language
+    language_prompts = {
+        "chinese": f"Please translate the following text into Chinese: {text}",
+        "japanese": f"Please translate the following text into Japanese: {text}",
+        "hindi": f"Please translate the following text into Hindi: {text}",
+        "english": f"Please translate the following text into English: {text}"
+    }
     
-        model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "saved_qwen_model")
-        
-        if os.path.exists(model_path):
-            tokenizer = AutoTokenizer.from_pretrained(model_path)
-            model = AutoModelForCausalLM.from_pretrained(
-                model_path,
-                torch_dtype="auto",
-                device_map="auto"
-            )
-            
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            return model, tokenizer, device
+    prompt = language_prompts.get(target_language.lower(), f"Please translate the following text into {target_language}: {text}")
+    
+    messages = [
+        {"role": "system", "content": "You are a helpful AI assistant specialized in translation."},
+        {"role": "user", "content": prompt}
+    ]
+    
+    return tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True
+    )
+
+
+def generate_translations(model, tokenizer, device, texts, target_language, cancel=None):
+    """Translate {key: text} with the model; returns {key: translation} for the ones that succeeded"""
+    # Texts another request is already translating are awaited, not re-generated
+    flight_keys = {key: ('translate',) + translation_cache.make_key(key, target_language) for key in texts}
+    waiting = {}
+    leading = []
+    for key in texts:
+        future, leader = ai_requests.claim(flight_keys[key], cancel)
+        if leader:
+            leading.append(key)
         else:
-            return None, None, None
+            waiting[key] = future
+    
+    translations = {}
+    try:
+        if leading:
+            cache_prompt_prefix(model, tokenizer, device, build_translation_prompt(tokenizer, PROMPT_MARKER, target_language))
+            prompts = [build_translation_prompt(tokenizer, texts[key], target_language) for key in leading]
+            budgets = [translation_token_budget(count_tokens(tokenizer, texts[key]), target_language) for key in leading]
+            
+            # Each text stops generating once everyone waiting for it has gone
+            cancels = [ai_requests.cancellation(flight_keys[key]) for key in leading]
+            
+            # Concurrent translations are batched into a single generate call
+            for key, translated_text in zip(leading, translation_scheduler.submit_many(prompts, max_new_tokens=budgets, cancel=cancels)):
+                if translated_text:
+                    translations[key] = translated_text
+                ai_requests.finish(flight_keys[key], translated_text)
     except Exception as e:
-        print(f"Error loading Qwen model: {e}")
-        return None, None, None
+        for key in leading:
+            ai_requests.finish(flight_keys[key], error=e)
+        raise
+    
+    for key, future in waiting.items():
+        try:
+            translated_text = wait_for_result(future, cancel)
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            print(f"Translation error: {e}")
+            record_error('translate', e)
+            translated_text = None
+        if translated_text:
+            translations[key] = translated_text
+    return translations
 
 
-def translate_text_with_qwen(text, target_language):
-    """Translate text using the Qwen model"""
+def translate_texts_with_qwen(texts, target_language, cancel=None):
+    """Translate a list of texts in one batch; failed items come back as None"""
     try:
-        model, tokenizer, device = load_qwen_model()
-        
-        if not model or not tokenizer:
-            return None
-        
-        # Create translation prompt based on target language
-        language_prompts = {
-            "chinese": f"Please translate the following text into Chinese: {text}",
-            "japanese": f"Please translate the following text into Japanese: {text}",
-            "hindi": f"Please translate the following text into Hindi: {text}",
-            "english": f"Please translate the following text into English: {text}"
-        }
-        
-        prompt = language_prompts.get(target_language.lower(), f"Please translate the following text into {target_language}: {text}")
-        
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant specialized in translation."},
-            {"role": "user", "content": prompt}
-        ]
-        
-        text_input = tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
-        
-        model_inputs = tokenizer([text_input], return_tensors="pt").to(device)
-        
-        generated_ids = model.generate(
-            model_inputs.input_ids,
-            max_new_tokens=512,
-            temperature=0.7,
-            do_sample=True
-        )
-        
-        output_ids = [output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)]
-        
-        output_text = tokenizer.batch_decode(output_ids, skip_special_tokens=True)[0]
-        
-        return output_text.strip()
+        # Identical strings (after whitespace normalization) are translated once
+        unique_texts = {}
+        for text in texts:
+            unique_texts.setdefault(normalize_text(text), text)
+        
+        cached = translation_cache.get_many(list(unique_texts.values()), target_language)
+        translations = {}
+        missing = []
+        for key, text in unique_texts.items():
+            if text in cached:
+                translations[key] = cached[text]
+            else:
+                missing.append(key)
         
+        if missing:
+            model, tokenizer, device = load_qwen_model()
+            
+            if model and tokenizer:
+                # Texts are translated sentence by sentence: sentences found in the
+                # translation memory are reused and only the rest go to the model
+                segmented = {key: segment_text(unique_texts[key]) for key in missing}
+                segments = {}
+                for parts in segmented.values():
+                    for part, is_segment in parts:
+                        if is_segment:
+                            segments.setdefault(normalize_text(part), part)
+                
+                remembered = translation_memory.lookup_many(list(segments.values()), target_language)
+                segment_translations = {normalize_text(segment): translated for segment, translated in remembered.items()}
+                to_generate = {key: segment for key, segment in segments.items() if key not in segment_translations}
+                if to_generate:
+                    # Overlong sentences are split into chunks that go into the same batch
+                    chunked = {key: split_into_chunks(tokenizer, segment, settings.TRANSLATION_CHUNK_TOKENS) for key, segment in to_generate.items()}
+                    chunks = {normalize_text(chunk): chunk for pieces in chunked.values() for chunk in pieces}
+                    generated_chunks = generate_translations(model, tokenizer, device, chunks, target_language, cancel)
+                    
+                    generated = {}
+                    separator = "" if target_language.lower() in UNSPACED_LANGUAGES else " "
+                    for key, pieces in chunked.items():
+                        translated_pieces = [generated_chunks.get(normalize_text(chunk)) for chunk in pieces]
+                        if all(translated_pieces):
+                            generated[key] = separator.join(translated_pieces)
+                    if generated:
+                        translation_memory.add_many({to_generate[key]: translated for key, translated in generated.items()}, target_language)
+                        segment_translations.update(generated)
+                
+                stitched = {}
+                for key, parts in segmented.items():
+                    translated_text = stitch(parts, segment_translations, target_language)
+                    if translated_text:
+                        translations[key] = translated_text
+                        stitched[unique_texts[key]] = translated_text
+                if stitched:
+                    translation_cache.set_many(stitched, target_language)
+        
+        return [translations.get(normalize_text(text)) for text in texts]
+        
+    except GenerationCancelled:
+        return [None] * len(texts)
     except Exception as e:
         print(f"Translation error: {e}")
-        return None
+        record_error('translate', e)
+        return [None] * len(texts)
 
 
-def generate_ai_answer(question_title, question_content, context_prompt=""):
-    """Generate AI answer using the Qwen model for mentoring"""
-    try:
-        model, tokenizer, device = load_qwen_model()
-        
-        if not model or not tokenizer:
-            return None
-        
-        # Create a detailed prompt for generating mentoring answers
-        if context_prompt:
-            # If there's existing content, improve it
-            user_prompt = f"""
+def translate_text_with_qwen(text, target_language, cancel=None):
+    """Translate text using the Qwen model"""
+    return translate_texts_with_qwen([text], target_language, cancel)[0]
+
+
+def build_answer_prompt(tokenizer, question_title, question_content, context_prompt=""):
+    """Wrap a question (or a draft to improve) in the mentoring chat template"""
+    # Create a detailed prompt for generating mentoring answers
+    if context_prompt:
+        # If there's existing content, improve it
+        user_prompt = f"""
 {context_prompt}
 
 Please enhance and expand this response to make it more comprehensive, detailed, and helpful for the student.
 """
-        else:
-            # Generate fresh answer
-            user_prompt = f"""
-A student has asked the following question:
-
-Title: {question_title}
-Question: {question_content}
-
+    else:
+        # Generate fresh answer. The fixed instructions come first so they are
+        # part of the cached prompt prefix and only the question is prefilled.
+        user_prompt = f"""
 Please provide a detailed, comprehensive answer that will help the student learn and understand the topic better. Your response should be:
 1. Educational and thorough
 2. Encouraging and supportive
@@ -361,37 +509,57 @@ Please provide a detailed, comprehensive answer that will help the student learn
 4. Break down complex topics into understandable parts
 5. Provide actionable advice when appropriate
 6. Be written in a mentoring tone
+
+A student has asked the following question:
+
+Title: {question_title}
+Question: {question_content}
 """
+    
+    messages = [
+        {"role": "system", "content": "You are an experienced mentor and educator who provides detailed, helpful, and encouraging answers to students' questions."},
+        {"role": "user", "content": user_prompt}
+    ]
+    
+    return tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True
+    )
+
+
+def generate_ai_answer(question_title, question_content, context_prompt="", cancel=None, draft=""):
+    """Generate AI answer using the Qwen model for mentoring.
+
+    draft is the mentor's own text inside context_prompt; it alone sets the
+    token budget, so a fresh answer (no draft) gets QWEN_ANSWER_MAX_TOKENS.
+    """
+    try:
+        model, tokenizer, device = load_qwen_model()
         
-        messages = [
-            {"role": "system", "content": "You are an experienced mentor and educator who provides detailed, helpful, and encouraging answers to students' questions."},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        text_input = tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
+        if not model or not tokenizer:
+            return None
         
-        model_inputs = tokenizer([text_input], return_tensors="pt").to(device)
+        cache_answer_prefix(model, tokenizer, device, context_prompt)
+        text_input = build_answer_prompt(tokenizer, question_title, question_content, context_prompt)
         
-        generated_ids = model.generate(
-            model_inputs.input_ids,
-            max_new_tokens=1024,  # Longer response for detailed answers
-            temperature=0.7,
-            do_sample=True,
-            pad_token_id=tokenizer.eos_token_id
-        )
+        # Identical prompts in flight at the same time share one generation
+        flight_key = ('answer', text_hash(text_input), registry.revision)
         
-        output_ids = [output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)]
+        max_new_tokens = answer_token_budget(count_tokens(tokenizer, draft) if draft else 0)
         
-        output_text = tokenizer.batch_decode(output_ids, skip_special_tokens=True)[0]
+        if context_prompt and settings.QWEN_PROMPT_LOOKUP:
+            # Enhancing a draft mostly copies it, so draft tokens from the prompt
+            return ai_requests.do(flight_key, generate_with_prompt_lookup, text_input, max_new_tokens=max_new_tokens, cancel=cancel)
         
-        return output_text.strip()
+        # Answers get their own queue so they don't hold up translations
+        return ai_requests.do(flight_key, answer_scheduler.submit, text_input, max_new_tokens=max_new_tokens, cancel=cancel)
         
+    except GenerationCancelled:
+        return None
     except Exception as e:
         print(f"AI answer generation error: {e}")
+        record_error('answer', e)
         return None
 
 
@@ -401,8 +569,9 @@ def delete_question(request, question_id):
     """Handle question deletion"""
     if request.method == 'DELETE':
         try:
-            question = Question.objects.get(id=question_id, student=request.user)
-            question.delete()
+            with transaction.atomic():
+                question = Question.objects.get(id=question_id, student=request.user)
+                question.delete()
             return JsonResponse({'success': True, 'message': 'Question deleted successfully'})
         except Question.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Question not found'}, status=404)
@@ -414,29 +583,43 @@ def delete_question(request, question_id):
 
 @csrf_exempt
 @login_required
-def generate_ai_answer_view(request):
-    """Handle AI answer generation requests"""
+async def generate_ai_answer_view(request):
+    """Handle AI answer generation requests.
+
+    Generation runs on the inference executor and stops early when the
+    client disconnects (under ASGI) or AI_REQUEST_TIMEOUT passes.
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             question_id = data.get('question_id')
             context_prompt = data.get('context_prompt', '')
+            draft = data.get('draft', '')
             
             if not question_id:
                 return JsonResponse({'error': 'Question ID is required'}, status=400)
             
             # Get the question
             try:
-                question = Question.objects.get(id=question_id)
+                question = await Question.objects.aget(id=question_id)
             except Question.DoesNotExist:
                 return JsonResponse({'error': 'Question not found'}, status=404)
             
             # Generate AI answer
-            ai_answer = generate_ai_answer(
-                question.title, 
-                question.content, 
-                context_prompt
-            )
+            try:
+                ai_answer = await run_cancellable(
+                    generate_ai_answer,
+                    question.title,
+                    question.content,
+                    context_prompt,
+                    draft=draft,
+                    timeout=settings.AI_REQUEST_TIMEOUT
+                )
+            except TimeoutError:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'AI answer generation timed out. Please try again.'
+                }, status=504)
             
             if ai_answer:
                 return JsonResponse({
@@ -459,8 +642,204 @@ def generate_ai_answer_view(request):
 
 @csrf_exempt
 @login_required
-def translate_content(request):
-    """Handle AJAX requests for content translation"""
+def generate_ai_answer_stream(request):
+    """Stream an AI answer token by token as server-sent events"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    question_id = data.get('question_id')
+    context_prompt = data.get('context_prompt', '')
+    draft = data.get('draft', '')
+    
+    if not question_id:
+        return JsonResponse({'error': 'Question ID is required'}, status=400)
+    
+    try:
+        question = Question.objects.get(id=question_id)
+    except Question.DoesNotExist:
+        return JsonResponse({'error': 'Question not found'}, status=404)
+    
+    model, tokenizer, device = load_qwen_model()
+    if not model or not tokenizer:
+        return JsonResponse({
+            'success': False,
+            'error': 'Failed to generate AI answer. Please try again.'
+        }, status=503)
+    
+    cache_answer_prefix(model, tokenizer, device, context_prompt)
+    text_input = build_answer_prompt(tokenizer, question.title, question.content, context_prompt)
+    max_new_tokens = answer_token_budget(count_tokens(tokenizer, draft) if draft else 0)
+    # Set when the client goes away, so decoding stops with it
+    cancel = CancelToken()
+    if context_prompt and settings.QWEN_PROMPT_LOOKUP:
+        chunks = stream_generate(text_input, max_new_tokens=max_new_tokens, prompt_lookup=True, cancel=cancel)
+    else:
+        chunks = stream_generate(text_input, max_new_tokens=max_new_tokens, cancel=cancel, **sampling_kwargs())
+    events = sse_stream(
+        chunks,
+        question_title=question.title,
+        question_content=question.content
+    )
+    
+    # Under ASGI the blocking iterator is driven from worker threads
+    if isinstance(request, ASGIRequest):
+        events = aiter_sync(events, cancel)
+    
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@login_required
+def create_ai_job(request):
+    """Queue an AI answer for the background worker and return its job id"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            question_id = data.get('question_id')
+            context_prompt = data.get('context_prompt', '')
+            draft = data.get('draft', '')
+            
+            if not question_id:
+                return JsonResponse({'error': 'Question ID is required'}, status=400)
+            
+            try:
+                question = Question.objects.get(id=question_id)
+            except Question.DoesNotExist:
+                return JsonResponse({'error': 'Question not found'}, status=404)
+            
+            # A repeated submission while the same job is still open polls that job
+            job = AIAnswerJob.objects.filter(
+                question=question,
+                requested_by=request.user,
+                context_prompt=context_prompt,
+                draft=draft,
+                status__in=['queued', 'running']
+            ).first()
+            if job is None:
+                job = AIAnswerJob.objects.create(
+                    question=question,
+                    requested_by=request.user,
+                    context_prompt=context_prompt,
+                    draft=draft
+                )
+            
+            return JsonResponse({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status
+            }, status=202)
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+@login_required
+def ai_job_status(request, job_id):
+    """Report the status, timings and result of an AI answer job"""
+    if request.method == 'GET':
+        try:
+            job = AIAnswerJob.objects.select_related('question').get(id=job_id, requested_by=request.user)
+        except AIAnswerJob.DoesNotExist:
+            return JsonResponse({'error': 'Job not found'}, status=404)
+        
+        return JsonResponse({
+            'success': job.status != 'failed',
+            'job_id': job.id,
+            'status': job.status,
+            'ai_answer': job.result,
+            'error': job.error,
+            'question_id': job.question_id,
+            'question_title': job.question.title,
+            'created_at': job.created_at.isoformat(),
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'wait_seconds': job.wait_seconds,
+            'run_seconds': job.run_seconds
+        })
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+@role_required('mentor')
+def search_questions_view(request):
+    """Full-text search over question titles, bodies and answers, best matches first.
+
+    Results span every student's questions, so only mentors may search.
+    """
+    if request.method == 'GET':
+        query = request.GET.get('q', '').strip()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        
+        if not query:
+            return JsonResponse({'success': False, 'error': 'Search query is required'}, status=400)
+        
+        try:
+            questions, has_next = search_questions(query, page, settings.MENTOR_PAGE_SIZE)
+        except Exception as e:
+            print(f"Search error: {e}")
+            return JsonResponse({'success': False, 'error': 'Search failed. Please try again.'}, status=500)
+        
+        return JsonResponse({
+            'success': True,
+            'query': query,
+            'page': page,
+            'has_next': has_next,
+            'results': [
+                {
+                    'id': question.id,
+                    'title': question.title,
+                    'content': question.content,
+                    'category': question.category,
+                    'status': question.status,
+                    'answer_count': question.answer_count,
+                    'student_name': f"{question.student.first_name} {question.student.last_name}".strip() or question.student.username,
+                    'created_at': question.created_at.strftime('%B %d, %Y at %I:%M %p')
+                }
+                for question in questions
+            ]
+        })
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+def ui_translations_etag(request, language):
+    bundle = ui_bundle(language)
+    return bundle[1] if bundle else None
+
+
+@etag(ui_translations_etag)
+def ui_translations(request, language):
+    """Interface translations for one language as a JSON bundle browsers can cache"""
+    bundle = ui_bundle(language)
+    if bundle is None:
+        return JsonResponse({'success': False, 'error': f'Unsupported language: {language}'}, status=404)
+    
+    response = HttpResponse(bundle[0], content_type='application/json')
+    patch_cache_control(response, public=True, max_age=settings.UI_TRANSLATIONS_MAX_AGE)
+    return response
+
+
+@csrf_exempt
+@login_required
+async def translate_content(request):
+    """Handle AJAX requests for content translation.
+
+    The model runs on the inference executor and stops early when the
+    client disconnects (under ASGI) or AI_REQUEST_TIMEOUT passes.
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -470,8 +849,18 @@ def translate_content(request):
             if not text:
                 return JsonResponse({'error': 'No text provided'}, status=400)
             
-            # Use the Qwen model for translation
-            translated_text = translate_text_with_qwen(text, target_language)
+            # Interface text comes from the compiled catalogs, not the model
+            translated_text = translate_ui_text(text, target_language)
+            if not translated_text:
+                try:
+                    translated_text = await run_cancellable(
+                        translate_text_with_qwen,
+                        text,
+                        target_language,
+                        timeout=settings.AI_REQUEST_TIMEOUT
+                    )
+                except TimeoutError:
+                    return JsonResponse({'success': False, 'error': 'Translation timed out. Please try again.'}, status=504)
             
             if translated_text:
                 return JsonResponse({
@@ -481,48 +870,10 @@ def translate_content(request):
                     'target_language': target_language
                 })
             else:
-                # Fallback translations if model fails
-                fallback_translations = {
-                    'chinese': {
-                        'Welcome back': '欢迎回来',
-                        'Ask Your Mentor': '询问您的导师',
-                        'Question Title': '问题标题',
-                        'Question Details': '问题详情',
-                        'Category': '类别',
-                        'Post Question': '发布问题',
-                        'What would you like to ask?': '您想问什么？',
-                        'Describe your question in detail...': '详细描述您的问题...',
-                        'Ready to continue your learning journey? Explore your progress, connect with mentors, and achieve your goals!': '准备继续您的学习之旅？探索您的进步，与导师联系，实现您的目标！'
-                    },
-                    'japanese': {
-                        'Welcome back': 'おかえりなさい',
-                        'Ask Your Mentor': 'メンターに質問する',
-                        'Question Title': '質問のタイトル',
-                        'Question Details': '質問の詳細',
-                        'Category': 'カテゴリー',
-                        'Post Question': '質問を投稿',
-                        'What would you like to ask?': '何を質問したいですか？',
-                        'Describe your question in detail...': '質問を詳しく説明してください...',
-                        'Ready to continue your learning journey? Explore your progress, connect with mentors, and achieve your goals!': '学習の旅を続ける準備はできていますか？進歩を探り、メンターとつながり、目標を達成しましょう！'
-                    },
-                    'hindi': {
-                        'Welcome back': 'वापसी पर स्वागत है',
-                        'Ask Your Mentor': 'अपने मेंटर से पूछें',
-                        'Question Title': 'प्रश्न का शीर्षक',
-                        'Question Details': 'प्रश्न का विवरण',
-                        'Category': 'श्रेणी',
-                        'Post Question': 'प्रश्न पोस्ट करें',
-                        'What would you like to ask?': 'आप क्या पूछना चाहते हैं?',
-                        'Describe your question in detail...': 'अपने प्रश्न का विस्तार से वर्णन करें...',
-                        'Ready to continue your learning journey? Explore your progress, connect with mentors, and achieve your goals!': 'अपनी सीखने की यात्रा जारी रखने के लिए तैयार हैं? अपनी प्रगति देखें, मेंटर्स से जुड़ें, और अपने लक्ष्य हासिल करें!'
-                    }
-                }
-                
-                translated = fallback_translations.get(target_language.lower(), {}).get(text, text)
-                
+                # Without the model the text is returned untranslated
                 return JsonResponse({
                     'success': True,
-                    'translated_text': translated,
+                    'translated_text': text,
                     'original_text': text,
                     'target_language': target_language,
                     'fallback': True
@@ -532,3 +883,98 @@ def translate_content(request):
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+@csrf_exempt
+@login_required
+def translate_batch(request):
+    """Translate a list of texts into one language in a single request"""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            texts = data.get('texts')
+            target_language = data.get('language', 'english')
+            
+            if not isinstance(texts, list) or not texts:
+                return JsonResponse({'error': 'No texts provided'}, status=400)
+            
+            if not all(isinstance(text, str) for text in texts):
+                return JsonResponse({'error': 'Texts must be strings'}, status=400)
+            
+            if len(texts) > settings.TRANSLATE_BATCH_MAX_TEXTS:
+                return JsonResponse({
+                    'error': f'At most {settings.TRANSLATE_BATCH_MAX_TEXTS} texts can be translated per request'
+                }, status=400)
+            
+            # Blank strings are passed through untouched and interface text comes
+            # from the compiled catalogs; only user content reaches the model
+            catalog = {text: translate_ui_text(text, target_language) for text in texts}
+            to_translate = [text for text in texts if text.strip() and not catalog[text]]
+            translated_texts = iter(translate_texts_with_qwen(to_translate, target_language) if to_translate else [])
+            
+            translations = []
+            fallback = False
+            for text in texts:
+                if not text.strip():
+                    translations.append(text)
+                    continue
+                if catalog[text]:
+                    translations.append(catalog[text])
+                    continue
+                translated = next(translated_texts)
+                if not translated:
+                    # Without the model the text is returned untranslated
+                    translated = text
+                    fallback = True
+                translations.append(translated)
+            
+            return JsonResponse({
+                'success': True,
+                'translations': translations,
+                'target_language': target_language,
+                'fallback': fallback
+            })
+            
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Invalid request method'}, status=405)
+
+
+@monitoring_required
+def ai_health(request):
+    """Report whether the Qwen model is loaded and ready to serve"""
+    health = registry.health()
+    health['translation_cache'] = translation_cache.stats()
+    health['translation_memory'] = translation_memory.stats()
+    health['prefix_cache'] = prefix_cache.stats()
+    health['prompt_lookup'] = prompt_lookup_stats.snapshot()
+    health['single_flight'] = ai_requests.stats()
+    health['cancellations'] = cancellation_stats.snapshot()
+    if remote_inference_enabled():
+        # The model runs in the inference server; this process only holds the tokenizer
+        health['inference_server'] = inference_client.health()
+        health['ready'] = health['ready'] and health['inference_server']['ready']
+    health['deterministic'] = settings.QWEN_DETERMINISTIC
+    health['question_embeddings'] = question_index.stats()
+    return JsonResponse(health, status=200 if health['ready'] else 503)
+
+
+@monitoring_required
+def metrics(request):
+    """AI and view telemetry in the Prometheus text format"""
+    if not remote_inference_enabled():
+        body = render_metrics()
+    else:
+        # Generations and the model-side caches are counted in the inference server
+        body = render_metrics(model=False)
+        try:
+            body += inference_client.metrics()
+            up = 1
+        except (InferenceUnavailable, InferenceError, TimeoutError) as e:
+            print(f"Inference server metrics error: {e}")
+            up = 0
+        body += render_families([
+            ('ai_inference_server_up', 'gauge', 'Whether the inference server answered the scrape', [('ai_inference_server_up', {}, up)])
+        ])
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,19 +1,14 @@
-from auth.models import UserProfile
+from auth.roles import resolve_user_role
 
 
 def user_role(request):
     """
     Context processor to add user role to all templates
     """
-    context = {
-        'user_role': None,
-    }
-    
-    if request.user.is_authenticated:
-        try:
-            user_profile = UserProfile.objects.get(user=request.user)
-            context['user_role'] = user_profile.role
-        except UserProfile.DoesNotExist:
-            context['user_role'] = None
+    # Resolved once per request by auth.middleware.UserRoleMiddleware
+    if not hasattr(request, 'user_role'):
+        request.user_role = resolve_user_role(request)
     
-    return context
+    return {
+        'user_role': request.user_role,
+    }
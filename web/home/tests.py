@@ -1,3 +1,56 @@
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from auth.models import UserProfile
+
+from .context_processors import user_role
+
+
+class UserRoleContextProcessorTests(TestCase):
+    """user_role runs on every rendered page, so its query count is part of every view's budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.mentor = User.objects.create(username="mentor")
+        UserProfile.objects.create(user=cls.mentor, role="mentor")
+        cls.no_profile = User.objects.create(username="no-profile")
+
+    def request_for(self, user):
+        request = RequestFactory().get("/")
+        request.user = user
+        request.session = SessionStore()
+        return request
+
+    def test_uses_role_resolved_by_middleware(self):
+        request = self.request_for(self.mentor)
+        request.user_role = "mentor"
+        with self.assertNumQueries(0):
+            self.assertEqual(user_role(request), {"user_role": "mentor"})
+
+    def test_anonymous_user_needs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(user_role(self.request_for(AnonymousUser())), {"user_role": None})
+
+    def test_falls_back_to_one_query_without_middleware(self):
+        request = self.request_for(self.mentor)
+        with self.assertNumQueries(1):
+            self.assertEqual(user_role(request), {"user_role": "mentor"})
+        # Kept in the session afterwards
+        del request.user_role
+        with self.assertNumQueries(0):
+            self.assertEqual(user_role(request), {"user_role": "mentor"})
+
+    def test_missing_profile(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(user_role(self.request_for(self.no_profile)), {"user_role": None})
+
+
+class PageTests(TestCase):
+
+    def test_home_and_about_render(self):
+        for path, template in [("/", "Home.html"), ("/about/", "About.html")]:
+            with self.assertNumQueries(0):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertTemplateUsed(response, template)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "auth.middleware.UserRoleMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -56,7 +58,8 @@ ROOT_URLCONF = "projectname.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [],
+        # home keeps its templates in "Templates", which APP_DIRS misses on case-sensitive filesystems
+        "DIRS": [BASE_DIR / "home" / "Templates"],
         "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
@@ -75,12 +78,55 @@ WSGI_APPLICATION = "projectname.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# DATABASE_PROFILE=sqlite (default) or postgres. Connections are kept open for
+# DB_CONN_MAX_AGE seconds instead of being reopened on every request.
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "sqlite")
+
+if DATABASE_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "mentor"),
+            "USER": os.environ.get("POSTGRES_USER", "mentor"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+        }
     }
-}
+    if os.environ.get("DB_POOL", "0") == "1":
+        # psycopg 3 connection pool (psycopg[pool], see requirements.txt); pooled
+        # connections replace persistent ones
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            }
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        }
+    }
+    if os.environ.get("SQLITE_TUNING", "1") == "1":
+        # Take the write lock when a transaction starts, so concurrent writers
+        # queue on busy_timeout instead of failing with "database is locked"
+        DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE"}
+
+# Applied to every new SQLite connection by auth.db.apply_sqlite_pragmas
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+} if DATABASE_PROFILE != "postgres" and os.environ.get("SQLITE_TUNING", "1") == "1" else {}
 
 
 # Password validation
@@ -107,6 +153,17 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = "en-us"
 
+# Languages the interface is translated into; the catalogs live in locale/
+# (edit the .po files, then run `python manage.py compilemessages`)
+LANGUAGES = [
+    ("en", "English"),
+    ("zh-hans", "Chinese"),
+    ("ja", "Japanese"),
+    ("hi", "Hindi"),
+]
+
+LOCALE_PATHS = [BASE_DIR / "locale"]
+
 TIME_ZONE = "UTC"
 
 USE_I18N = True
@@ -123,3 +180,127 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Qwen model used for translation and AI answers
+
+QWEN_MODEL_PATH = os.environ.get("QWEN_MODEL_PATH", str(BASE_DIR.parent / "saved_qwen_model"))
+
+# "none" loads the weights as shipped; "int8" loads them for CPU with the
+# decoder's linear layers dynamically quantized to int8
+QWEN_QUANTIZATION = os.environ.get("QWEN_QUANTIZATION", "none")
+
+# Load the model in the background at startup instead of on the first AI request
+QWEN_EAGER_LOAD = os.environ.get("QWEN_EAGER_LOAD", "0") == "1"
+
+# Seconds to wait before retrying after a failed model load
+QWEN_LOAD_RETRY_SECONDS = int(os.environ.get("QWEN_LOAD_RETRY_SECONDS", "300"))
+
+# Micro-batching of concurrent generate calls: the largest batch and how long
+# the first request in a batch waits for others to join it
+QWEN_BATCH_MAX_SIZE = int(os.environ.get("QWEN_BATCH_MAX_SIZE", "8"))
+QWEN_BATCH_WAIT_MS = int(os.environ.get("QWEN_BATCH_WAIT_MS", "20"))
+
+# Number of translations kept in each worker's in-memory cache; older entries
+# are still served from the CachedTranslation table
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", "5000"))
+
+# Largest list accepted by the /translate/batch/ endpoint
+TRANSLATE_BATCH_MAX_TEXTS = int(os.environ.get("TRANSLATE_BATCH_MAX_TEXTS", "200"))
+
+# Queue AI answers as background jobs (processed by `manage.py run_ai_worker`)
+# instead of streaming them from the web process
+AI_ANSWER_JOBS = os.environ.get("AI_ANSWER_JOBS", "0") == "1"
+
+# Greedy prompt-lookup decoding for "enhance answer" requests: draft tokens are
+# copied from n-gram matches in the mentor's text and verified in one pass
+QWEN_PROMPT_LOOKUP = os.environ.get("QWEN_PROMPT_LOOKUP", "0") == "1"
+
+# Greedy decoding for translations and AI answers, so identical requests get
+# identical (and therefore cacheable) output
+QWEN_DETERMINISTIC = os.environ.get("QWEN_DETERMINISTIC", "0") == "1"
+
+# Translate new and edited questions/answers into every target language in
+# the background, so dashboards can show translations without waiting. Off by
+# default: the translations run in a thread of the saving process, which loads
+# the model there unless INFERENCE_SOCKET points at an inference server
+PRETRANSLATE_ON_SAVE = os.environ.get("PRETRANSLATE_ON_SAVE", "0") == "1"
+
+# Questions per page on the mentor dashboard
+MENTOR_PAGE_SIZE = int(os.environ.get("MENTOR_PAGE_SIZE", "20"))
+
+# Seconds a user's role cached in the session is trusted before it is re-read
+# (role changes also invalidate it through the cache, when the cache is shared)
+USER_ROLE_MAX_AGE = int(os.environ.get("USER_ROLE_MAX_AGE", "300"))
+
+# Question embeddings for duplicate detection: new and edited questions are
+# embedded in the background and stored in a memory-mapped matrix under
+# EMBEDDING_INDEX_DIR. Before a question is posted, answered questions at or
+# above DUPLICATE_SIMILARITY (cosine) are suggested to the student. The check
+# is skipped when the model isn't loaded and gives up after
+# DUPLICATE_CHECK_TIMEOUT seconds. EMBED_ON_SAVE is off by default: its thread
+# loads the model into the saving process unless INFERENCE_SOCKET is set.
+# Without it, refresh the index with `manage.py rebuild_question_embeddings`.
+EMBED_ON_SAVE = os.environ.get("EMBED_ON_SAVE", "0") == "1"
+EMBEDDING_INDEX_DIR = os.environ.get("EMBEDDING_INDEX_DIR", str(BASE_DIR / "embeddings"))
+EMBEDDING_MAX_TOKENS = int(os.environ.get("EMBEDDING_MAX_TOKENS", "256"))
+DUPLICATE_SIMILARITY = float(os.environ.get("DUPLICATE_SIMILARITY", "0.9"))
+DUPLICATE_SUGGESTIONS = int(os.environ.get("DUPLICATE_SUGGESTIONS", "3"))
+DUPLICATE_CHECK_TIMEOUT = float(os.environ.get("DUPLICATE_CHECK_TIMEOUT", "2"))
+
+# Translations are split into sentences kept in a translation memory. With
+# TRANSLATION_MEMORY_FUZZY below 1 (the default reuses exact matches only), a
+# stored sentence is also reused for a new one when their edit-distance
+# similarity is at least this much, their numbers match and they don't differ
+# in a negation or code identifier; 0.97 or more is recommended. Each process
+# keeps at most TRANSLATION_MEMORY_CACHE_SEGMENTS sentences per language in memory
+TRANSLATION_MEMORY_FUZZY = float(os.environ.get("TRANSLATION_MEMORY_FUZZY", "1"))
+TRANSLATION_MEMORY_CACHE_SEGMENTS = int(os.environ.get("TRANSLATION_MEMORY_CACHE_SEGMENTS", "50000"))
+
+# Upper bounds on generated tokens. Each request gets a budget derived from its
+# input (see auth/generation_limits.py) and capped by these; sentences longer
+# than TRANSLATION_CHUNK_TOKENS are translated in pieces
+QWEN_TRANSLATION_MAX_TOKENS = int(os.environ.get("QWEN_TRANSLATION_MAX_TOKENS", "512"))
+QWEN_ANSWER_MAX_TOKENS = int(os.environ.get("QWEN_ANSWER_MAX_TOKENS", "1024"))
+TRANSLATION_CHUNK_TOKENS = int(os.environ.get("TRANSLATION_CHUNK_TOKENS", "128"))
+
+# Seconds browsers may reuse the interface translation bundle (/i18n/<language>.json)
+# before revalidating it with its ETag
+UI_TRANSLATIONS_MAX_AGE = int(os.environ.get("UI_TRANSLATIONS_MAX_AGE", "86400"))
+
+# The translate and AI answer views are async: inference runs on at most
+# AI_VIEW_WORKERS threads, and a generation is cancelled (its rows stop
+# decoding) when the client disconnects or AI_REQUEST_TIMEOUT seconds pass
+AI_VIEW_WORKERS = int(os.environ.get("AI_VIEW_WORKERS", "4"))
+AI_REQUEST_TIMEOUT = float(os.environ.get("AI_REQUEST_TIMEOUT", "180"))
+
+# Out-of-process inference: with INFERENCE_SOCKET set, web workers load only the
+# tokenizer and send generate/embed requests to `manage.py run_inference_server`,
+# which owns the model, over this Unix socket. Each web worker keeps up to
+# INFERENCE_POOL_SIZE idle connections; the server runs at most
+# INFERENCE_SERVER_THREADS requests at once
+INFERENCE_SOCKET = os.environ.get("INFERENCE_SOCKET", "")
+INFERENCE_POOL_SIZE = int(os.environ.get("INFERENCE_POOL_SIZE", "8"))
+INFERENCE_SERVER_THREADS = int(os.environ.get("INFERENCE_SERVER_THREADS", "32"))
+
+# Telemetry: every generation (queue wait, prompt and generated tokens, time to
+# first token, tokens/sec, prefix cache hit, outcome) and the latency of the
+# login/mentor/student views are exposed at /metrics in the Prometheus text
+# format and, with TELEMETRY_LOG=1, written to stdout as one JSON object per line
+TELEMETRY_LOG = os.environ.get("TELEMETRY_LOG", "1") == "1"
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"json": {"format": "%(message)s"}},
+    "handlers": {"telemetry": {"class": "logging.StreamHandler", "formatter": "json"}},
+    "loggers": {
+        "telemetry": {"handlers": ["telemetry"], "level": "INFO" if TELEMETRY_LOG else "WARNING", "propagate": False},
+    },
+}
+
+# /metrics and /ai-health/ expose internals, so they only answer staff users,
+# clients in MONITORING_ALLOWED_IPS (comma-separated; behind a reverse proxy
+# every client has the proxy's address) and requests sending
+# "Authorization: Bearer <MONITORING_TOKEN>"
+MONITORING_TOKEN = os.environ.get("MONITORING_TOKEN", "")
+MONITORING_ALLOWED_IPS = [ip.strip() for ip in os.environ.get("MONITORING_ALLOWED_IPS", "").split(",") if ip.strip()]
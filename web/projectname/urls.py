@@ -31,6 +31,14 @@ urlpatterns = [
     path("mentor/", mentor, name="mentor"),
     path("student/", student, name="student"),
     path("translate/", translate_content, name="translate_content"),
+    path("translate/batch/", translate_batch, name="translate_batch"),
+    path("i18n/<str:language>.json", ui_translations, name="ui_translations"),
     path("generate-ai-answer/", generate_ai_answer_view, name="generate_ai_answer"),
+    path("generate-ai-answer/stream/", generate_ai_answer_stream, name="generate_ai_answer_stream"),
+    path("ai-jobs/", create_ai_job, name="create_ai_job"),
+    path("ai-jobs/<int:job_id>/", ai_job_status, name="ai_job_status"),
     path("delete-question/<int:question_id>/", delete_question, name="delete_question"),
+    path("search/", search_questions_view, name="search_questions"),
+    path("ai-health/", ai_health, name="ai_health"),
+    path("metrics", metrics, name="metrics"),
 ]